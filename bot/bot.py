@@ -6,7 +6,7 @@ import os
 import re
 import sys
 import traceback
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from functools import wraps, partial
 
@@ -24,7 +24,6 @@ from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.client.telegram import TelegramAPIServer
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
-from argon2 import PasswordHasher
 
 import config
 import utils
@@ -40,11 +39,15 @@ from db import engine
 from models import Order
 from crud.orders_crud import OrdersCRUD
 from schemas.android_app_permission import AndroidAppPermission
+from schemas.build_phase import BuildPhase
 from crud.workers_crud import WorkersCRUD
 from schemas.order_status import OrderStatus, STATUSES_BUILDING, STATUSES_CONFIGURING, \
     get_next_status, STATUSES_FINISHED, STATUSES_GETTING_SOURCES
 from src.localisation.localisation import Localisation
 from src.localisation.native_lang_translations import translations
+from user_id_hasher import user_id_hasher
+from storage.build_result_store import BuildResultStore
+from .bot_files import open_bot_file
 from .order_status_observer import OrderStatusObserver
 from .messages_deleter import MessagesDeleter
 from .temporary_info import add_media_group_token, TemporaryInfo, \
@@ -65,12 +68,13 @@ dp = Dispatcher()
 orders = OrdersCRUD(engine)
 workers = WorkersCRUD(engine)
 user_build_stats_crud = UserBuildStatsCRUD(engine)
+build_result_store = BuildResultStore(utils.make_build_results_dir_path(), config.BUILD_RESULT_MAX_BYTES,
+                                      config.BUILD_RESULT_MAX_AGE_SEC)
 
 status_observer: Optional[OrderStatusObserver] = None
 error_logs_observer: Optional[ErrorLogsObserver] = None
 stats_sender: Optional[StatsSender] = None
 
-password_hasher = PasswordHasher()
 graceful_shutdown_in_progress = False
 temporary_maintenance = False
 
@@ -97,6 +101,7 @@ def on_all_user_messages_deleted(user_id: int):
                              and order.status != OrderStatus.update_queued)
         if need_remove_order:
             orders.remove_order(order.id)
+            status_observer.speculative_builds.on_order_removed(order)
     if graceful_shutdown_in_progress and orders.get_orders_count() == 0:
         gracefully_stop_bot()
 
@@ -126,6 +131,7 @@ async def on_startup(*args, **kwargs):
     if config.SKIP_UPDATES:
         await bot.delete_webhook(True)
     asyncio.create_task(status_observer.observe())
+    asyncio.create_task(status_observer.delivery_queue.run())
     asyncio.create_task(error_logs_observer.run(send_error))
     asyncio.create_task(stats_sender.run(send_stats))
     asyncio.create_task(MessagesDeleter.deleter.run())
@@ -133,9 +139,9 @@ async def on_startup(*args, **kwargs):
 
 def log_exceptions(fun: Callable):
     @wraps(fun)
-    async def wrapper(message: Union[types.Message, types.CallbackQuery], *args):
+    async def wrapper(message: Union[types.Message, types.CallbackQuery], *args, **kwargs):
         try:
-            return await fun(message, *args)
+            return await fun(message, *args, **kwargs)
         except Exception as e:
             user_id = message.from_user.id
             order = orders.get_user_order(user_id)
@@ -169,14 +175,14 @@ async def send_error(error_text: str):
 
 def auto_delete_messages(fun: Callable):
     @wraps(fun)
-    async def wrapper(message: Union[types.Message, types.CallbackQuery], *args):
+    async def wrapper(message: Union[types.Message, types.CallbackQuery], *args, **kwargs):
         if isinstance(message, types.Message):
             MessagesDeleter.deleter.add_message(message)
         elif isinstance(message, types.CallbackQuery):
             MessagesDeleter.deleter.add_message(message.message)
         else:
             raise Exception(f'auto_delete_messages attached to an invalid function. Invalid argument type {type(message)}')
-        response_message: types.Message = await fun(message, *args)
+        response_message: types.Message = await fun(message, *args, **kwargs)
         if response_message:
             MessagesDeleter.deleter.add_message(response_message)
             if response_message.reply_markup:
@@ -209,7 +215,8 @@ def on_order_not_exists(
     return queue.order_for_user_not_exists(user_id)
 
 
-async def validate_update_build_request(message: types.Message) -> bool:
+async def validate_update_build_request(message: types.Message) -> Union[bool, dict[str, Order]]:
+    """Filter function for update requests. The parsed order is passed to the handler as `update_order`."""
     if not config.UPDATES_ALLOWED:
         return False
     try:
@@ -220,17 +227,14 @@ async def validate_update_build_request(message: types.Message) -> bool:
         if not good_file_metadata:
             return False
 
-        file = await bot.get_file(message.document.file_id)
-        with open(file.file_path, 'r') as f:
-            order_str = f.read()
-
-        order_json = json.loads(order_str)
+        async with open_bot_file(bot, message.document.file_id) as f:
+            order_json = json.load(f)
         temp_order = Order.create_order_from_dict(order_json)
         if temp_order.id is not None or not isinstance(temp_order.update_tag, str) or temp_order.sources_only:
             return False
         if not validate_order(temp_order):
             return False
-        return True
+        return {"update_order": temp_order}
     except:
         return False
 
@@ -278,10 +282,42 @@ async def send_stats(chat_id: int) -> types.Message:
                          f"- Building: {count_of_orders_building}\n" + \
                          f"- Finished: {count_of_orders_finished}"
     stats_text = f"<b>Stats</b>:\n{format_stats()}"
-    text = "\n\n".join([current_stats_text, stats_text])
+    build_result_usage = build_result_store.get_usage()
+    build_results_text = f"Build results stored: {build_result_usage.result_count}, " + \
+                         f"{build_result_usage.total_bytes / 1024 ** 2:.1f} MB"
+    text = "\n\n".join([current_stats_text, build_results_text, format_build_timing_stats(), stats_text])
     return await bot.send_message(chat_id, text)
 
 
+def format_build_timing_stats() -> str:
+    since = utils.utc_now() - timedelta(seconds=config.STATS_PERIOD)
+    build_stats = status_observer.build_timings.get_build_timing_stats(since)
+    builds_per_hour = status_observer.eta_estimator.get_builds_per_hour()
+    return f"<b>Builds for the stats period</b>: {build_stats.build_count} (failed: {build_stats.failed_build_count})\n" + \
+           f"- Queue wait: {format_duration(build_stats.median_queue_wait_sec)}\n" + \
+           f"- Build: {format_duration(build_stats.median_build_sec)} " + \
+           f"(p90: {format_duration(build_stats.p90_build_sec)})\n" + \
+           f"- Upload: {format_duration(build_stats.median_upload_sec)}\n" + \
+           f"- Send: {format_duration(build_stats.median_send_sec)}\n" + \
+           f"Workers online: {status_observer.eta_estimator.get_worker_count()}, " + \
+           f"capacity: {f'{builds_per_hour:.1f}' if builds_per_hour is not None else '-'} builds/hour\n" + \
+           format_build_phase_durations(since) + \
+           f"<i>Durations are medians.</i>"
+
+
+def format_build_phase_durations(since: datetime) -> str:
+    durations = status_observer.build_phase_events.get_median_phase_durations(since)
+    if not durations:
+        return ""
+    return "<b>Build phases</b>:\n" + "".join(
+        f"- {phase}: {format_duration(durations[phase])}\n" for phase in BuildPhase if phase in durations
+    )
+
+
+def format_duration(duration_sec: Optional[float]) -> str:
+    return f"{duration_sec / 60:.1f} min" if duration_sec is not None else "-"
+
+
 async def clear_buttons_from_messages(user_id: int):
     messages = get_messages_with_buttons(user_id)
     for message in messages:
@@ -335,8 +371,12 @@ async def get_order_status(message: types.Message) -> types.Message:
     if order.status in STATUSES_CONFIGURING:
         return await message.answer(localisation.get_message_text("status-configuring"))
     elif order.status == OrderStatus.queued or order.status == OrderStatus.update_queued:
-        queue_order_count = orders.get_order_queue_position(order)
-        return await message.answer(localisation.get_message_text("status-queued").format(queue_order_count))
+        queue_order_count = status_observer.queue_position_tracker.get_position(order)
+        if queue_order_count is None:
+            return await message.answer(localisation.get_message_text("status-building"))
+        text = localisation.get_message_text("status-queued").format(queue_order_count)
+        text += status_observer.format_queue_eta(queue_order_count, localisation)
+        return await message.answer(text)
     elif order.status in STATUSES_BUILDING:
         return await message.answer(localisation.get_message_text("status-building"))
     elif order.status in STATUSES_GETTING_SOURCES:
@@ -372,6 +412,7 @@ async def cancel_order(message: types.Message) -> types.Message:
         return await message.answer(localisation.get_message_text("cannot-cancel"))
     increase_cancel_count()
     orders.remove_order(order.id)
+    status_observer.speculative_builds.on_order_removed(order)
     result = await send_cancelled_message(message, order)
     await MessagesDeleter.deleter.delete_all_messages(message.chat.id)
     return result
@@ -394,13 +435,13 @@ async def create_order(call: types.CallbackQuery) -> types.Message:
         return await call.message.answer(localisation.get_message_text("bot-maintenance"))
 
     increase_configuration_start_count()
-    priority = get_order_priority(user_id)
+    priority = await get_order_priority(user_id)
     orders.create_order(user_id, priority)
     return await status_observer.on_status_changed(orders.get_user_order(user_id), localisation)
 
 
-def get_order_priority(user_id: int) -> int:
-    user_id_hash = password_hasher.hash(str(user_id), salt=config.USER_ID_HASH_SALT.encode())
+async def get_order_priority(user_id: int) -> int:
+    user_id_hash = await user_id_hasher.hash_async(user_id)
     stats = user_build_stats_crud.get_user_build_stats(user_id_hash)
     if stats is None:
         return 1
@@ -423,7 +464,7 @@ def remove_previous_order_if_finished(user_id: int):
 )
 @log_exceptions
 @auto_delete_messages
-async def create_order_for_app_update_with_file(message: types.Message) -> types.Message:
+async def create_order_for_app_update_with_file(message: types.Message, update_order: Order) -> types.Message:
     # If the validation fails by validate_update_build_request, the message will be handled by the fallback_documents.
     user_id = message.from_user.id
     localisation = TemporaryInfo.get_localisation(message)
@@ -431,12 +472,7 @@ async def create_order_for_app_update_with_file(message: types.Message) -> types
 
     increase_update_start_count()
 
-    file = await bot.get_file(message.document.file_id)
-    with open(file.file_path, 'r') as f:
-        order_str = f.read()
-
-    order_json = json.loads(order_str)
-    order = Order.create_order_from_dict(order_json)
+    order = update_order
 
     remove_previous_order_if_finished(user_id)
     if orders.order_for_user_exists(user_id):
@@ -447,7 +483,7 @@ async def create_order_for_app_update_with_file(message: types.Message) -> types
         return await message.answer(message_prefix + localisation.get_message_text("suggest-cancel"))
 
     order.app_version_code += 1
-    order.priority = get_order_priority(user_id)
+    order.priority = await get_order_priority(user_id)
     orders.insert_configured_order(user_id, order)
     order = orders.get_user_order(user_id)
     return await status_observer.on_status_changed(order, localisation)
@@ -541,7 +577,7 @@ async def add_worker_command(message: types.Message) -> types.Message:
     else:
         return await message.answer("Invalid usage")
 
-    user_id_hash = password_hasher.hash(str(user_id), salt=config.USER_ID_HASH_SALT.encode())
+    user_id_hash = await user_id_hasher.hash_async(user_id)
     if user_build_stats_crud.get_user_build_stats(user_id_hash) is None:
         return await message.answer("User build stats not exist")
 
@@ -777,7 +813,16 @@ async def confirm_order(call: types.CallbackQuery) -> types.Message:
     else:
         return None
     order.status = get_next_status(order, transition_name)
-    orders.update_order(order)
+    if transition_name == "confirm":
+        if status_observer.speculative_builds.confirm_order(order):
+            user_id_hash = await user_id_hasher.hash_async(user_id)
+            user_build_stats_crud.increase_user_build_stats(user_id_hash, True, datetime.now().astimezone(pytz.utc))
+    else:
+        status_observer.speculative_builds.on_order_customized(order)
+        orders.update_order_status(order, order.status)
+    if order.status in STATUSES_BUILDING:
+        # The speculative build is used. The status observer notifies the user like for regular builds.
+        return None
     return await status_observer.on_status_changed(order, localisation)
 
 
@@ -933,11 +978,8 @@ async def validate_icon_message(message: types.Message) -> bool:
 
 
 async def read_bot_file(file_id: str) -> bytes:
-    icon_file = await bot.get_file(file_id)
-    with open(icon_file.file_path, 'rb') as f:
-        icon_bytes = f.read()
-    os.remove(icon_file.file_path)
-    return icon_bytes
+    async with open_bot_file(bot, file_id) as f:
+        return f.read()
 
 
 async def validate_and_resize_icon(order: Order, icon_bytes: bytes, localisation: Localisation) -> Optional[bytes]:
@@ -1131,7 +1173,7 @@ async def process_failure(call: types.CallbackQuery) -> types.Message:
     if call.data == 'retry_build':
         order.status = get_next_status(order, "retry")
         order.record_created = datetime.now().astimezone(pytz.utc)
-        order.priority = get_order_priority(user_id)
+        order.priority = await get_order_priority(user_id)
         orders.update_order(order)
         return await status_observer.on_status_changed(order, localisation)
     else:
@@ -0,0 +1,22 @@
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, BinaryIO
+
+from aiogram import Bot
+
+
+@asynccontextmanager
+async def open_bot_file(bot: Bot, file_id: str) -> AsyncIterator[BinaryIO]:
+    """Opens a file downloaded by the local Bot API server and removes it when it is closed.
+
+    The local server stores the files in the shared volume and returns their paths, so nothing is sent over HTTP.
+    """
+    file = await bot.get_file(file_id)
+    try:
+        with open(file.file_path, 'rb') as f:
+            yield f
+    finally:
+        try:
+            os.remove(file.file_path)
+        except FileNotFoundError:
+            pass
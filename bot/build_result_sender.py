@@ -2,23 +2,18 @@ import logging
 import os
 import asyncio
 import shutil
-import traceback
 
 from aiogram import types, Bot
-from aiogram.exceptions import TelegramForbiddenError
+from aiogram.exceptions import TelegramBadRequest
 
 import config
 import utils
 from utils import normalize_name
 from models import Order
 from crud.orders_crud import OrdersCRUD
-from schemas.order_status import get_next_status
 
 from .messages_deleter import MessagesDeleter
 from . import order_status_observer
-from .temporary_info import get_sending_apk_attempt_count, increase_sending_apk_attempt_count, \
-    delete_sending_apk_attempt_count
-
 
 class BuildResultSender:
     def __init__(self, bot: Bot, orders: OrdersCRUD, status_observer: 'order_status_observer.OrderStatusObserver'):
@@ -27,47 +22,11 @@ class BuildResultSender:
         self.status_observer = status_observer
 
     async def send_build_result(self, order: Order):
+        """Uploads the build result. Retries and the order status are handled by DeliveryQueue."""
         logging.info(f"Sending build result for order #{order.id}")
-        try:
-            await self.try_send_build_result(order)
-            order.status = get_next_status(order)
-            self.orders.update_order(order)
-            MessagesDeleter.deleter.add_message(await self.status_observer.on_status_changed(order))
-            delete_sending_apk_attempt_count(order.id)
-        except TelegramForbiddenError:
-            self.orders.remove_order(order.id)
-        except BaseException as e:
-            from .bot import send_error
-            logging.error(f"Failed to send build result for order #{order.id}: {e}")
-            exception_text = traceback.format_exc()
-            await send_error(f"Failed to send build result#{order.id}:\n\n{exception_text}")
-            traceback.print_exc()
-            increase_sending_apk_attempt_count(order.id)
-            await self.check_attempt_count(order)
-
-    async def check_attempt_count(self, order: Order):
-        count = get_sending_apk_attempt_count(order.id)
-        if count < config.APK_SEND_MAX_RETRY_COUNT:
-            order.status = get_next_status(order, "repeat")
-            self.orders.update_order(order)
-            MessagesDeleter.deleter.add_message(await self.status_observer.on_status_changed(order))
-        else:
-            delete_sending_apk_attempt_count(order.id)
-            order.status = get_next_status(order, "fail")
-            self.orders.update_order(order)
-            MessagesDeleter.deleter.add_message(await self.status_observer.on_status_changed(order))
-            from .bot import send_error
-            await send_error(f"Apk didn't sent after {config.APK_SEND_MAX_RETRY_COUNT} attempts")
-
-    async def try_send_build_result(self, order: Order) -> bool:
-        order.status = get_next_status(order, "send_result")
         await self.bot.send_chat_action(order.user_id, "upload_document")
-        self.orders.update_order(order)
-        MessagesDeleter.deleter.add_message(await self.status_observer.on_status_changed(order))
-        filepath = os.path.join(
-            utils.make_order_build_result_dir_path(order.id),
-            "sources.zip" if order.sources_only else "app.apk",
-        )
+        build_result_dir = utils.make_order_build_result_dir_path(order.id)
+        filepath = os.path.join(build_result_dir, "sources.zip" if order.sources_only else "app.apk")
 
         if order.sources_only:
             tg_filename = 'sources.zip'
@@ -76,15 +35,28 @@ class BuildResultSender:
         else:
             tg_filename = f'update-{order.update_tag}.apk'  # clients will expect a filename in this format
 
-        future = asyncio.create_task(self.bot.send_document(
-            order.user_id,
-            document=types.FSInputFile(path=filepath, filename=tg_filename)
-        ))
-        sending_result = await asyncio.wait((future,), timeout=1800)
-        response = next(iter(sending_result[0])).result()
+        response = await self.send_document(order.user_id, filepath, tg_filename)
         MessagesDeleter.deleter.add_message(response)
+        if not order.sources_only:
+            self.status_observer.build_timings.set_build_sent(order.id, utils.utc_now())
         self.delete_order_dir(order)
-        return True
+
+    async def send_document(self, chat_id: int, filepath: str, tg_filename: str) -> types.Message:
+        if config.TELEGRAM_LOCAL_FILES:
+            try:
+                return await self.bot.send_document(chat_id, document=self.make_local_file_uri(filepath, tg_filename))
+            except TelegramBadRequest as e:
+                # The request may have failed for another reason, so only this file is uploaded.
+                logging.error(f"Failed to send a local file, falling back to uploading: {e}")
+        return await self.bot.send_document(chat_id, document=types.FSInputFile(path=filepath, filename=tg_filename))
+
+    @staticmethod
+    def make_local_file_uri(filepath: str, tg_filename: str) -> str:
+        """Returns the uri of the file for the local Bot API server, which uses the name of the file as is."""
+        link_path = os.path.join(os.path.dirname(filepath), tg_filename)
+        if link_path != filepath and not os.path.exists(link_path):
+            os.link(filepath, link_path)
+        return "file://" + os.path.abspath(link_path)
 
     @staticmethod
     def delete_order_dir(order: Order):
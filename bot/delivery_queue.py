@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import traceback
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError
+
+import config
+import db
+from crud.deliveries_crud import DeliveriesCRUD, PendingDelivery
+from crud.error_logs_crud import ErrorLogsCRUD
+from crud.orders_crud import OrdersCRUD
+from models import Order
+from schemas.order_status import OrderStatus, get_next_status
+
+from .build_result_sender import BuildResultSender
+from .messages_deleter import MessagesDeleter
+from . import order_status_observer
+
+STATUSES_SENDING = [OrderStatus.sending_apk, OrderStatus.sending_sources]
+
+
+class DeliveryQueue:
+    """Sends the build results to the users in the background.
+
+    The deliveries are stored in the database, so the attempt counts survive restarts of the bot. At most
+    `upload_slots` results are uploaded at the same time, so a big apk doesn't hold the others back. An upload that
+    takes longer than `timeout_sec` is cancelled, and a failed delivery is retried with exponential backoff.
+    """
+
+    def __init__(self, bot: Bot, orders: OrdersCRUD, status_observer: 'order_status_observer.OrderStatusObserver',
+                 upload_slots: int, timeout_sec: int):
+        self.bot = bot
+        self.orders = orders
+        self.deliveries = DeliveriesCRUD(orders.session)
+        self.status_observer = status_observer
+        self.upload_slots = upload_slots
+        self.timeout_sec = timeout_sec
+        self.uploads: dict[int, asyncio.Task] = {}
+
+    def enqueue(self, order: Order):
+        order.status = get_next_status(order, "send_result")
+        self.orders.update_order(order)
+        self.deliveries.add_delivery(order.id, datetime.now())
+        self.start_due_uploads()
+
+    async def run(self):
+        logging.info("Starting delivery queue")
+        # Orders that were being sent before the deliveries were stored.
+        for status in STATUSES_SENDING:
+            for order in self.orders.get_orders_by_status(status):
+                self.deliveries.add_delivery(order.id, datetime.now())
+        while True:
+            try:
+                self.start_due_uploads()
+            except Exception:
+                logging.error(f"During DeliveryQueue the following exception occurred: {traceback.format_exc()}")
+            await asyncio.sleep(1)
+
+    def start_due_uploads(self):
+        free_slots = self.upload_slots - len(self.uploads)
+        if free_slots <= 0:
+            return
+        for delivery in self.deliveries.get_due_deliveries(datetime.now(), list(self.uploads), free_slots):
+            task = asyncio.create_task(self.deliver(delivery))
+            self.uploads[delivery.order_id] = task
+            task.add_done_callback(lambda _, order_id=delivery.order_id: self.uploads.pop(order_id, None))
+
+    async def deliver(self, delivery: PendingDelivery):
+        try:
+            await self.try_deliver(delivery)
+        except TelegramForbiddenError:
+            self.orders.remove_order(delivery.order_id)
+        except Exception:
+            ErrorLogsCRUD(db.engine).add_log(
+                f"During DeliveryQueue the following exception occurred:\n\n{traceback.format_exc()}")
+
+    async def try_deliver(self, delivery: PendingDelivery):
+        order = self.orders.get_order(delivery.order_id)
+        if order is None or order.status not in STATUSES_SENDING:
+            self.deliveries.remove_delivery(delivery.order_id)
+            return
+        sender = BuildResultSender(self.bot, self.orders, self.status_observer)
+        try:
+            # wait_for cancels the upload on timeout.
+            await asyncio.wait_for(sender.send_build_result(order), self.timeout_sec)
+        except TelegramForbiddenError:
+            raise
+        except Exception as e:
+            await self.on_delivery_failed(order, delivery.attempts + 1, e)
+            return
+        self.deliveries.remove_delivery(order.id)
+        order.status = get_next_status(order)
+        self.orders.update_order(order)
+        MessagesDeleter.deleter.add_message(await self.status_observer.on_status_changed(order))
+
+    async def on_delivery_failed(self, order: Order, attempts: int, exception: Exception):
+        from .bot import send_error
+        logging.error(f"Failed to send build result for order #{order.id}: {exception!r}")
+        exception_text = "".join(traceback.format_exception(exception))
+        await send_error(f"Failed to send build result#{order.id}, attempt {attempts}:\n\n{exception_text}")
+        if attempts < config.APK_SEND_MAX_RETRY_COUNT:
+            next_attempt_date = datetime.now() + timedelta(seconds=self.get_retry_delay_sec(attempts))
+            self.deliveries.set_failed_attempt(order.id, attempts, next_attempt_date)
+            return
+        self.deliveries.remove_delivery(order.id)
+        is_sources_delivery = order.status == OrderStatus.sending_sources
+        order.status = get_next_status(order, "fail")
+        self.orders.update_order(order)
+        if is_sources_delivery:
+            message = await self.status_observer.on_sources_delivery_failed(order)
+        else:
+            message = await self.status_observer.on_status_changed(order)
+        MessagesDeleter.deleter.add_message(message)
+        await send_error(f"Build result wasn't sent after {config.APK_SEND_MAX_RETRY_COUNT} attempts")
+
+    @staticmethod
+    def get_retry_delay_sec(attempts: int) -> int:
+        return min(config.DELIVERY_RETRY_DELAY_SEC * 2 ** (attempts - 1), config.DELIVERY_MAX_RETRY_DELAY_SEC)
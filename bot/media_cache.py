@@ -0,0 +1,60 @@
+import hashlib
+import logging
+from typing import Optional, Union
+
+from aiogram import Bot, types
+from aiogram.exceptions import TelegramBadRequest
+
+from crud.telegram_media_crud import TelegramMediaCRUD
+
+
+class MediaCache:
+    """Sends static photos by the Telegram file ids of their first uploads.
+
+    The file ids are stored in the database by the hash of the file, so a changed file is uploaded again. If Telegram
+    doesn't accept a stored file id anymore, the photos are uploaded again and the new file ids are stored.
+    """
+
+    def __init__(self, bot: Bot, telegram_media: TelegramMediaCRUD):
+        self.bot = bot
+        self.telegram_media = telegram_media
+        self.file_hashes: dict[str, str] = {}
+
+    async def send_photo(self, chat_id: int, path: str) -> types.Message:
+        return (await self.send_photos(chat_id, [path]))[0]
+
+    async def send_photos(self, chat_id: int, paths: list[str]) -> list[types.Message]:
+        """Sends one photo or a media group of the photos."""
+        photos = [self.get_file_id(path) for path in paths]
+        try:
+            messages = await self._send(chat_id, paths, photos)
+        except TelegramBadRequest as e:
+            if all(photo is None for photo in photos):
+                raise
+            logging.warning(f"Cached photos are not accepted, uploading them again: {e}")
+            for path in paths:
+                self.telegram_media.remove_file_id(self.get_file_hash(path), self.bot.id)
+            photos = [None] * len(paths)
+            messages = await self._send(chat_id, paths, photos)
+        for path, photo, message in zip(paths, photos, messages):
+            if photo is None and message.photo:
+                self.telegram_media.set_file_id(self.get_file_hash(path), self.bot.id, message.photo[-1].file_id)
+        return messages
+
+    def get_file_id(self, path: str) -> Optional[str]:
+        return self.telegram_media.get_file_id(self.get_file_hash(path), self.bot.id)
+
+    def get_file_hash(self, path: str) -> str:
+        # The resources don't change while the bot is running.
+        if path not in self.file_hashes:
+            with open(path, "rb") as file:
+                self.file_hashes[path] = hashlib.file_digest(file, "sha256").hexdigest()
+        return self.file_hashes[path]
+
+    async def _send(self, chat_id: int, paths: list[str], photos: list[Optional[str]]) -> list[types.Message]:
+        media: list[Union[str, types.FSInputFile]] = [
+            photo if photo is not None else types.FSInputFile(path, filename="") for path, photo in zip(paths, photos)
+        ]
+        if len(media) == 1:
+            return [await self.bot.send_photo(chat_id, photo=media[0])]
+        return await self.bot.send_media_group(chat_id, [types.InputMediaPhoto(media=m) for m in media])
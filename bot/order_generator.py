@@ -23,6 +23,18 @@ from .app_generation_sources import keystore_sources
 from models import Order
 
 
+def _make_country_table(countries: list[str]) -> dict[str, tuple[str, str]]:
+    # CountryInfo parses its JSON data on every construction, so resolve the country codes and capitals only once.
+    table = {}
+    for country in countries:
+        country_info = CountryInfo(country)
+        table[country] = (country_info.iso()["alpha2"], country_info.capital())
+    return table
+
+
+_country_table = _make_country_table(keystore_sources.countries)
+
+
 class OrderGenerator:
     def __init__(self, order: Order, localisation: Localisation):
         self.order = order
@@ -158,8 +170,7 @@ class OrderGenerator:
         self.organization = organization = self.random.choice(keystore_sources.organizations)
         organization_unit = self.random.choice(keystore_sources.organization_units)
         country = self.random.choice(keystore_sources.countries)
-        country_code = CountryInfo(country).iso()["alpha2"]
-        locality = CountryInfo(country).capital()
+        country_code, locality = _country_table[country]
 
         dname = ''
         if self.random.random() < keystore_sources.probability_has_cn:
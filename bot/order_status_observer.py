@@ -1,21 +1,33 @@
 import asyncio
 import logging
+import math
 import traceback
 from typing import Optional
 
 from aiogram import types, Bot
 from aiogram.exceptions import TelegramForbiddenError
 
+import config
 import db
 import utils
+from crud.build_phase_events_crud import BuildPhaseEventsCRUD
+from crud.build_timings_crud import BuildTimingsCRUD
 from crud.error_logs_crud import ErrorLogsCRUD
 from models import Order
 from crud.orders_crud import  OrdersCRUD
+from crud.telegram_media_crud import TelegramMediaCRUD
+from crud.workers_crud import WorkersCRUD
 from schemas.android_app_permission import AndroidAppPermission
+from scheduling.dispatch_policy import make_dispatch_policy
+from scheduling.eta_estimator import EtaEstimator
+from scheduling.order_scheduler import OrderScheduler
+from scheduling.speculative_builds import SpeculativeBuilds
 from schemas.order_status import OrderStatus, get_next_status
 from src.localisation.localisation import Localisation
-from . import build_result_sender
+from . import delivery_queue
+from .media_cache import MediaCache
 from .order_generator import OrderGenerator
+from .queue_position_tracker import QueuePositionTracker
 from .primary_color import PrimaryColor, primary_colors_with_emoji
 from .stats import increase_build_start_count, increase_queued_count, increase_successful_build_count, \
     increase_failed_build_count, increase_sources_count, increase_screen_stats, increase_queued_low_priority_count
@@ -25,10 +37,30 @@ from .messages_deleter import MessagesDeleter
 from .screenshot_maker import ScreenshotMaker
 
 
+class BuildProgressMessage:
+    def __init__(self, message: types.Message, localisation: Localisation):
+        self.message = message
+        self.localisation = localisation
+        self.phase: Optional[str] = None
+
+
 class OrderStatusObserver:
     def __init__(self, bot: Bot, orders: OrdersCRUD):
         self.bot = bot
         self.orders = orders
+        self.scheduler = OrderScheduler(orders, make_dispatch_policy(config.DISPATCH_POLICY,
+                                                                      config.DISPATCH_AGING_INTERVAL_SEC))
+        self.queue_position_tracker = QueuePositionTracker(self.scheduler)
+        self.build_timings = BuildTimingsCRUD(orders.session)
+        self.build_phase_events = BuildPhaseEventsCRUD(orders.session)
+        self.media_cache = MediaCache(bot, TelegramMediaCRUD(orders.session))
+        self.delivery_queue = delivery_queue.DeliveryQueue(bot, orders, self, config.DELIVERY_UPLOAD_SLOTS,
+                                                            config.DELIVERY_TIMEOUT_SEC)
+        # Build started messages that show the current phase, by order id. Lost on restart, then they are not edited.
+        self.progress_messages: dict[int, BuildProgressMessage] = {}
+        self.speculative_builds = SpeculativeBuilds(orders)
+        self.eta_estimator = EtaEstimator(self.build_timings, WorkersCRUD(orders.session),
+                                          config.CONSIDER_WORKER_OFFLINE_AFTER_SEC)
 
     async def observe(self):
         logging.info("Starting order status observer")
@@ -50,6 +82,8 @@ class OrderStatusObserver:
                         ErrorLogsCRUD(db.engine).add_log(
                             f"During OrderStatusObserver the following exception occurred:\n\n{traceback.format_exc()}")
                         logging.error("During OrderStatusObserver the following exception occurred:", e)
+            if config.BUILD_PROGRESS_MESSAGES:
+                await self.update_progress_messages()
             await asyncio.sleep(1)
 
     async def on_status_changed(self, order: Optional[Order], localisation: Localisation = None) -> types.Message:
@@ -118,6 +152,13 @@ class OrderStatusObserver:
             increase_failed_build_count()
             return await self.send_failure_notification(order, localisation)
 
+    async def on_sources_delivery_failed(self, order: Order) -> types.Message:
+        # The order is back in successfully_finished, so the user can request the sources again. It isn't another
+        # successful build, so the stats aren't changed.
+        member = await self.bot.get_chat_member(order.user_id, order.user_id)
+        localisation = TemporaryInfo.get_localisation(member.user)
+        return await self.send_build_finished_successfully_notification(order, localisation)
+
     async def send_masked_screen_options(self, order: Order, localisation: Localisation) -> types.Message:
         await self.bot.send_chat_action(order.user_id, "upload_photo")
         inline_keyboard = [
@@ -147,11 +188,8 @@ class OrderStatusObserver:
         )
         text = "\n\n".join([main_text, advanced_screens_text])
         markup = types.InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
-        screens_examples = [
-            types.InputMediaPhoto(media=types.FSInputFile("resources/calculator_example.png", filename="")),
-            types.InputMediaPhoto(media=types.FSInputFile("resources/note_example.png", filename="")),
-        ]
-        sent_messages = await self.bot.send_media_group(order.user_id, screens_examples)
+        screens_examples = ["resources/calculator_example.png", "resources/note_example.png"]
+        sent_messages = await self.media_cache.send_photos(order.user_id, screens_examples)
         for msg in sent_messages:
             MessagesDeleter.deleter.add_message(msg)
         return await self.bot.send_message(order.user_id, text, reply_markup=markup)
@@ -176,10 +214,7 @@ class OrderStatusObserver:
             localisation.get_message_text("loading-screen-description")
         )
         markup = types.InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
-        photo_message = await self.bot.send_photo(
-            order.user_id,
-            photo=types.FSInputFile("resources/loading_example.png", filename=""),
-        )
+        photo_message = await self.media_cache.send_photo(order.user_id, "resources/loading_example.png")
         MessagesDeleter.deleter.add_message(photo_message)
         return await self.bot.send_message(order.user_id, text, reply_markup=markup)
 
@@ -359,29 +394,72 @@ class OrderStatusObserver:
         )
 
     async def send_order_queued_notification(self, order: Order, localisation: Localisation) -> types.Message:
-        queue_order_count = self.orders.get_order_queue_position(order)
+        queue_order_count = self.queue_position_tracker.get_position(order)
+        if queue_order_count is None:
+            return None # Already taken by a worker, the user is notified when the build starts.
         text = localisation.get_message_text("queued").format(queue_order_count)
+        text += self.format_queue_eta(queue_order_count, localisation)
         if order.priority > 1:
             text += "\n\n"
             text += localisation.get_message_text("low-priority")
         return await self.bot.send_message(order.user_id, text)
 
     async def send_order_update_queued_notification(self, order: Order, localisation: Localisation) -> types.Message:
-        queue_order_count = self.orders.get_order_queue_position(order)
+        queue_order_count = self.queue_position_tracker.get_position(order)
+        if queue_order_count is None:
+            return None # Already taken by a worker, the user is notified when the build starts.
         text = localisation.get_message_text("queued").format(queue_order_count)
+        text += self.format_queue_eta(queue_order_count, localisation)
         if order.priority > 1:
             text += "\n\n" + localisation.get_message_text("low-priority")
         text += "\n\n" + localisation.get_message_text("you-can-change-update-order")
 
         return await self.bot.send_message(order.user_id, text)
 
+    def format_queue_eta(self, queue_position: int, localisation: Localisation) -> str:
+        wait = self.eta_estimator.estimate_wait(queue_position)
+        if wait is None:
+            return ""
+        minutes = max(math.ceil(wait.total_seconds() / 60), 1)
+        return "\n\n" + localisation.get_message_text("queue-eta").format(minutes)
+
     async def send_build_started_notification(self, order: Order, localisation: Localisation) -> types.Message:
         response = await self.bot.send_message(order.user_id, localisation.get_message_text("build-started"))
         self.orders.update_order_status(order, get_next_status(order, "notified"))
+        if config.BUILD_PROGRESS_MESSAGES:
+            self.progress_messages[order.id] = BuildProgressMessage(response, localisation)
         return response
 
+    async def update_progress_messages(self):
+        if not self.progress_messages:
+            return
+        order_ids = list(self.progress_messages.keys())
+        ownerships = self.orders.get_order_ownerships(order_ids)
+        phases = self.build_phase_events.get_current_phases(order_ids)
+        for order_id in order_ids:
+            progress_message = self.progress_messages[order_id]
+            ownership = ownerships.get(order_id)
+            if ownership is None or ownership.status != OrderStatus.building:
+                del self.progress_messages[order_id]
+                continue
+            phase = phases.get(order_id)
+            if phase is None or phase == progress_message.phase:
+                continue
+            progress_message.phase = phase
+            localisation = progress_message.localisation
+            text = "\n\n".join((
+                localisation.get_message_text("build-started"),
+                localisation.get_message_text("build-phase").format(
+                    localisation.get_message_text(f"build-phase-{phase}")
+                ),
+            ))
+            try:
+                await progress_message.message.edit_text(text)
+            except Exception as e:
+                logging.warning(f"Failed to edit the progress message of order #{order_id}: {e}")
+
     async def send_apk(self, order: Order, localisation: Localisation) -> types.Message:
-        await build_result_sender.BuildResultSender(self.bot, self.orders, self).send_build_result(order)
+        self.delivery_queue.enqueue(order)
         return None
 
     async def send_build_finished_successfully_notification(self, order: Order, localisation: Localisation) -> types.Message:
@@ -415,13 +493,15 @@ class OrderStatusObserver:
         )
 
     async def send_get_sources_queued_notification(self, order: Order, localisation: Localisation) -> types.Message:
-        queue_order_count = self.orders.get_order_queue_position(order)
+        queue_order_count = self.queue_position_tracker.get_position(order)
+        if queue_order_count is None:
+            return None # Already sent by a worker, the user gets the sources soon.
         text = localisation.get_message_text("get-sources-queued").format(queue_order_count)
         return await self.bot.send_message(order.user_id, text)
 
     async def send_sources(self, order: Order, localisation: Localisation) -> types.Message:
         logging.info("send_sources")
-        await build_result_sender.BuildResultSender(self.bot, self.orders, self).send_build_result(order)
+        self.delivery_queue.enqueue(order)
         return None
 
     async def send_getting_sources_finished_successfully_notification(self, order: Order, localisation: Localisation) -> types.Message:
@@ -0,0 +1,98 @@
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Callable, Optional
+
+import pytz
+
+from crud.orders_crud import QueuedOrder
+from models import Order
+from scheduling.order_scheduler import OrderScheduler
+from schemas.order_status import OrderStatus
+
+
+class QueueSnapshot:
+    """The queue in the dispatch order at `now`, stored as the sort keys of the orders for binary search."""
+
+    def __init__(self, queue: list[QueuedOrder], make_sort_key: Callable[[QueuedOrder, datetime], tuple],
+                 now: datetime):
+        self.make_sort_key = make_sort_key
+        self.now = now
+        self.keys = [make_sort_key(queued_order, now) for queued_order in queue]
+        self.load_time = time.monotonic()
+
+    def get_age(self) -> float:
+        return time.monotonic() - self.load_time
+
+    def find(self, queued_order: QueuedOrder) -> Optional[int]:
+        key = self.make_sort_key(queued_order, self.now)
+        index = bisect_left(self.keys, key)
+        return index + 1 if index < len(self.keys) and self.keys[index] == key else None
+
+    def insert(self, queued_order: QueuedOrder) -> int:
+        key = self.make_sort_key(queued_order, self.now)
+        index = bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        return index + 1
+
+
+class QueuePositionTracker:
+    """Answers queue position queries from a snapshot of the queue in the dispatch order.
+
+    The snapshot is reloaded when it is older than SNAPSHOT_TTL_SEC. An order queued after the snapshot was loaded
+    is inserted into it, so other queries are answered without querying the database.
+    """
+
+    SNAPSHOT_TTL_SEC = 5
+
+    def __init__(self, scheduler: OrderScheduler):
+        self.scheduler = scheduler
+        self.build_queue_snapshot: Optional[QueueSnapshot] = None
+        self.sources_only_queue_snapshot: Optional[QueueSnapshot] = None
+
+    def get_position(self, order: Order) -> Optional[int]:
+        """Returns None if the order isn't queued anymore, e.g. it was already taken by a worker."""
+        if order.status == OrderStatus.get_sources_queued:
+            return self._get_position_in_sources_only_queue(order)
+        elif order.status in (OrderStatus.queued, OrderStatus.update_queued):
+            return self._get_position_in_build_queue(order)
+        else:
+            return None
+
+    def invalidate(self):
+        self.build_queue_snapshot = None
+        self.sources_only_queue_snapshot = None
+
+    def _get_position_in_build_queue(self, order: Order) -> Optional[int]:
+        self.build_queue_snapshot, position = self._get_position(self.build_queue_snapshot,
+                                                                 self.scheduler.get_build_queue, order)
+        return position
+
+    def _get_position_in_sources_only_queue(self, order: Order) -> Optional[int]:
+        self.sources_only_queue_snapshot, position = self._get_position(self.sources_only_queue_snapshot,
+                                                                        self.scheduler.get_sources_only_queue, order)
+        return position
+
+    def _get_position(self,
+                      snapshot: Optional[QueueSnapshot],
+                      load_queue: Callable[[datetime], list[QueuedOrder]],
+                      order: Order
+                      ) -> tuple[QueueSnapshot, Optional[int]]:
+        is_reloaded = snapshot is None or snapshot.get_age() >= self.SNAPSHOT_TTL_SEC
+        if is_reloaded:
+            now = self.scheduler.now()
+            snapshot = QueueSnapshot(load_queue(now), self.scheduler.policy.make_sort_key, now)
+        queued_order = self._make_queued_order(order)
+        position = snapshot.find(queued_order)
+        if position is None and not is_reloaded:
+            # The order was queued after the snapshot was loaded.
+            position = snapshot.insert(queued_order)
+        return snapshot, position
+
+    @staticmethod
+    def _make_queued_order(order: Order) -> QueuedOrder:
+        # The bot sets an aware date when the order is confirmed, the dates loaded from the database are naive UTC.
+        record_created = order.record_created
+        if record_created.tzinfo is not None:
+            record_created = record_created.astimezone(pytz.utc).replace(tzinfo=None)
+        return QueuedOrder(order.id, order.priority, record_created)
@@ -3,7 +3,6 @@ from typing import Union
 from src.localisation.localisation import Localisation
 
 _processed_media_groups: list[tuple[int, str]] = []
-_sending_apk_attempts: dict[int, int] = {}
 _messages_with_buttons: dict[int, list[types.Message]] = {}
 _blocked_users: set[int] = set()
 
@@ -32,19 +31,6 @@ def add_media_group_token(token: tuple[int, str]) -> bool:
     return False
 
 
-def get_sending_apk_attempt_count(order_id: int):
-    return _sending_apk_attempts.get(order_id, 0)
-
-
-def increase_sending_apk_attempt_count(order_id: int):
-    _sending_apk_attempts[order_id] = get_sending_apk_attempt_count(order_id) + 1
-
-
-def delete_sending_apk_attempt_count(order_id: int):
-    if order_id in _sending_apk_attempts:
-        del _sending_apk_attempts[order_id]
-
-
 def add_message_with_buttons(user_id: int, message: types.Message):
     if user_id not in _messages_with_buttons:
         _messages_with_buttons[user_id] = [message]
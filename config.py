@@ -22,6 +22,8 @@ if os.environ.get("DOCKER"):
 else:
     TELEGRAM_HOST = "127.0.0.1"
 TOKEN = os.environ.get("TOKEN", "0000000000:asdasdasdasdadsasdadsasd")
+# The local Bot API server reads the sent files from the disk by the same paths as the bot.
+TELEGRAM_LOCAL_FILES = os.environ.get("TELEGRAM_LOCAL_FILES", "False").lower() in ("true", "1", "t")
 SKIP_UPDATES = os.environ.get("SKIP_UPDATES", "False").lower() in ("true", "1", "t")
 DELETE_MESSAGES_AFTER_SEC = int(os.environ.get("DELETE_MESSAGES_AFTER_SEC", "3600"))
 DELETE_MESSAGES_WITHOUT_ORDERS_AFTER_SEC = int(os.environ.get("DELETE_MESSAGES_WITHOUT_ORDERS_AFTER_SEC", str(DELETE_MESSAGES_AFTER_SEC)))
@@ -31,14 +33,36 @@ ERROR_LOGS_CHAT_ID = int(os.environ.get("ERROR_LOGS_CHAT_ID", str(ADMIN_CHAT_ID)
 STATS_CHAT_ID = int(os.environ.get("STATS_CHAT_ID", str(ADMIN_CHAT_ID)))
 STATS_PERIOD = int(os.environ.get("STATS_PERIOD", "86400"))
 CONSIDER_WORKER_OFFLINE_AFTER_SEC = int(os.environ.get("CONSIDER_WORKER_OFFLINE_AFTER_SEC", "1800"))
+# Unsent build results are removed after BUILD_RESULT_MAX_AGE_SEC, the orders of the expired results fail. Unused
+# results are also removed when all of them take more than BUILD_RESULT_MAX_BYTES (0 disables the quota).
+# See storage/build_result_store.py.
+BUILD_RESULT_MAX_BYTES = int(os.environ.get("BUILD_RESULT_MAX_BYTES", str(10 * 1024 ** 3)))
+BUILD_RESULT_MAX_AGE_SEC = int(os.environ.get("BUILD_RESULT_MAX_AGE_SEC", str(2 * 24 * 3600)))
+BUILD_RESULT_SWEEP_INTERVAL_SEC = int(os.environ.get("BUILD_RESULT_SWEEP_INTERVAL_SEC", "60"))
+DELETE_BUILD_TIMINGS_AFTER_SEC = int(os.environ.get("DELETE_BUILD_TIMINGS_AFTER_SEC", str(30 * 24 * 3600)))
 # If not defined, the seed will not depend on the user id.
 SALT_FOR_DERIVATION_RANDOM_SEED_FROM_USER_ID = os.environ.get("SALT_FOR_DERIVATION_RANDOM_SEED_FROM_USER_ID", None)
 USER_ID_HASH_SALT = os.environ.get("USER_ID_HASH_SALT", None)
+USER_ID_HASH_CACHE_SIZE = int(os.environ.get("USER_ID_HASH_CACHE_SIZE", "10000"))
+# If not defined, user id hashes are cached only in memory.
+USER_ID_HASH_CACHE_KEY = os.environ.get("USER_ID_HASH_CACHE_KEY", None)
+USER_ID_HASH_THREAD_COUNT = int(os.environ.get("USER_ID_HASH_THREAD_COUNT", "2"))
+USER_ID_HASH_CACHE_TTL_SEC = int(os.environ.get("USER_ID_HASH_CACHE_TTL_SEC", str(30 * 24 * 3600)))
 FAILED_BUILD_COUNT_ALLOWED = int(os.environ.get("FAILED_BUILD_COUNT_ALLOWED", "1"))
 DELETE_USER_BUILD_STATS_AFTER_SEC = int(os.environ.get("DELETE_USER_BUILD_STATS_AFTER_SEC", "1"))
 UPDATES_ALLOWED = os.environ.get("UPDATES_ALLOWED", "True").lower() in ("true", "1", "t")
 SET_BOT_NAME_AND_DESCRIPTION = os.environ.get("SET_BOT_NAME_AND_DESCRIPTION", "True").lower() in ("true", "1", "t")
 DELAY_BEFORE_UPDATE_ORDER_BUILD_SEC = int(os.environ.get("DELAY_BEFORE_UPDATE_ORDER_BUILD_SEC", "60"))
+# One of: fifo, strict_priority, aging, weighted_wait. See scheduling/dispatch_policy.py.
+DISPATCH_POLICY = os.environ.get("DISPATCH_POLICY", "fifo")
+DISPATCH_AGING_INTERVAL_SEC = int(os.environ.get("DISPATCH_AGING_INTERVAL_SEC", "600"))
+# Build results are sent in the background, see bot/delivery_queue.py.
+DELIVERY_UPLOAD_SLOTS = int(os.environ.get("DELIVERY_UPLOAD_SLOTS", "2"))
+DELIVERY_TIMEOUT_SEC = int(os.environ.get("DELIVERY_TIMEOUT_SEC", "1800"))
+DELIVERY_RETRY_DELAY_SEC = int(os.environ.get("DELIVERY_RETRY_DELAY_SEC", "30"))
+DELIVERY_MAX_RETRY_DELAY_SEC = int(os.environ.get("DELIVERY_MAX_RETRY_DELAY_SEC", "1800"))
+# Edit the build started message with the current build phase reported by the worker.
+BUILD_PROGRESS_MESSAGES = os.environ.get("BUILD_PROGRESS_MESSAGES", "False").lower() in ("true", "1", "t")
 
 # Database
 if os.environ.get("DOCKER"):
@@ -53,6 +77,11 @@ DATABASE_PASSWORD = os.environ.get("POSTGRES_PASSWORD", "password")
 # Build data path
 DATA_DIR = os.environ.get("DATA_DIR", "data")
 TMP_DIR = os.environ.get("TMP_DIR", os.path.join(DATA_DIR, "tmp"))
+BUILD_LOGS_DIR = os.environ.get("BUILD_LOGS_DIR", os.path.join(DATA_DIR, "build_logs"))
+ICON_CACHE_DIR = os.environ.get("ICON_CACHE_DIR", os.path.join(DATA_DIR, "icon_cache"))
+# Rendered user icons are kept for ICON_CACHE_TTL_SEC, so retries and rebuilds skip rendering.
+ICON_CACHE_TTL_SEC = int(os.environ.get("ICON_CACHE_TTL_SEC", str(24 * 3600)))
+SOURCES_BASE_DIR = os.environ.get("SOURCES_BASE_DIR", os.path.join(DATA_DIR, "sources_base"))
 PROJECT_ROOT_ABSPATH_ON_HOST = os.environ.get("PROJECT_ROOT_ABSPATH_ON_HOST", None)
 MOCK_BUILD = os.environ.get("MOCK_BUILD", "False").lower() in ("true", "1", "t")
 WORKER_CONTROLLER_HOST = os.environ.get("WORKER_CONTROLLER_HOST", "localhost")
@@ -60,10 +89,21 @@ WORKER_CHECK_INTERVAL_SEC = int(os.environ.get("WORKER_CHECK_INTERVAL_SEC", "1")
 WORKER_JWT = os.environ.get("WORKER_JWT", "")
 KEYSTORE_PASSWORD = os.environ.get("KEYSTORE_PASSWORD", "")
 BUILD_DOCKER_IMAGE_NAME = os.environ.get("BUILD_DOCKER_IMAGE_NAME", "masked-partisan-telegram-build")
+REPO_FETCH_INTERVAL_SEC = int(os.environ.get("REPO_FETCH_INTERVAL_SEC", "600"))
 ALLOW_BUILD_SOURCES_ONLY = os.environ.get("ALLOW_BUILD_SOURCES_ONLY", "True").lower() in ("true", "1", "t")
 
 # Workers Controller
 JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "")
+WORKERS_CACHE_TTL_SEC = int(os.environ.get("WORKERS_CACHE_TTL_SEC", "10"))
+WORKER_ONLINE_FLUSH_INTERVAL_SEC = int(os.environ.get("WORKER_ONLINE_FLUSH_INTERVAL_SEC", "5"))
+UPLOAD_CONCURRENCY_LIMIT = int(os.environ.get("UPLOAD_CONCURRENCY_LIMIT", "2"))
+WORKERS_CONTROLLER_PROCESSES = int(os.environ.get("WORKERS_CONTROLLER_PROCESSES", "2"))
+WORKERS_CONTROLLER_THREADS = int(os.environ.get("WORKERS_CONTROLLER_THREADS", "8"))
+# Built apks are reused for orders with the same settings. 0 disables the cache.
+APK_CACHE_MAX_BYTES = int(os.environ.get("APK_CACHE_MAX_BYTES", "0"))
+APK_CACHE_TTL_SEC = int(os.environ.get("APK_CACHE_TTL_SEC", "3600"))
+# Build generated orders on idle workers before the user confirms them. See scheduling/speculative_builds.py.
+SPECULATIVE_BUILDS = os.environ.get("SPECULATIVE_BUILDS", "False").lower() in ("true", "1", "t")
 
 def variable_exists(name: str):
     return name in globals()
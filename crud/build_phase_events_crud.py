@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from models import BuildPhaseEvent
+from schemas.build_phase import BuildPhase
+
+
+class BuildPhaseEventsCRUD:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def add_event(self, order_id: int, phase: str, date: datetime):
+        self.session.execute(
+            sa.insert(BuildPhaseEvent)
+            .values(
+                {
+                    BuildPhaseEvent.order_id: order_id,
+                    BuildPhaseEvent.phase: phase,
+                    BuildPhaseEvent.date: date,
+                }
+            )
+        )
+
+    def get_current_phases(self, order_ids: list[int]) -> dict[int, str]:
+        """Returns the last reported phase of every order that has one."""
+        q = (
+            sa.select(BuildPhaseEvent.order_id, BuildPhaseEvent.phase)
+            .distinct(BuildPhaseEvent.order_id)
+            .where(BuildPhaseEvent.order_id.in_(order_ids))
+            .order_by(BuildPhaseEvent.order_id, BuildPhaseEvent.id.desc())
+        )
+        return {order_id: phase for order_id, phase in self.session.execute(q).fetchall()}
+
+    def get_median_phase_durations(self, since: datetime) -> dict[str, Optional[float]]:
+        """Returns the median duration of every phase. A phase lasts until the next event of the same order."""
+        def next_event(column):
+            return sa.func.lead(column).over(partition_by=BuildPhaseEvent.order_id, order_by=BuildPhaseEvent.id)
+
+        events = (
+            sa.select(
+                BuildPhaseEvent.phase,
+                next_event(BuildPhaseEvent.phase).label("next_phase"),
+                sa.func.extract("epoch", next_event(BuildPhaseEvent.date) - BuildPhaseEvent.date).label("duration"),
+            )
+            .where(BuildPhaseEvent.date >= since)
+            .subquery()
+        )
+        q = (
+            sa.select(events.c.phase, sa.func.percentile_cont(0.5).within_group(events.c.duration))
+            # The phase before a retry lasts until the build failed, not until the retry.
+            .where(events.c.next_phase != BuildPhase.repo_sync)
+            .group_by(events.c.phase)
+        )
+        return {phase: duration for phase, duration in self.session.execute(q).fetchall()}
+
+    def remove_old_events(self, before_date: datetime):
+        self.session.execute(sa.delete(BuildPhaseEvent).where(BuildPhaseEvent.date <= before_date))
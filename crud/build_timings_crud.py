@@ -0,0 +1,117 @@
+from datetime import datetime
+from typing import Optional, NamedTuple
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from models import BuildTiming
+
+
+class BuildTimingStats(NamedTuple):
+    build_count: int
+    failed_build_count: int
+    median_queue_wait_sec: Optional[float]
+    median_build_sec: Optional[float]
+    p90_build_sec: Optional[float]
+    median_upload_sec: Optional[float]
+    median_send_sec: Optional[float]
+
+
+def _seconds_between(start, end):
+    return sa.func.extract("epoch", end - start)
+
+
+class BuildTimingsCRUD:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def add_claimed_build(self, order_id: int, worker_id: int, queued_date: datetime, claimed_date: datetime):
+        self.session.execute(
+            sa.insert(BuildTiming)
+            .values(
+                {
+                    BuildTiming.order_id: order_id,
+                    BuildTiming.worker_id: worker_id,
+                    BuildTiming.queued_date: queued_date,
+                    BuildTiming.claimed_date: claimed_date,
+                }
+            )
+        )
+
+    def set_build_completed(
+        self,
+        order_id: int,
+        successful: bool,
+        completed_date: datetime,
+        configure_duration_sec: Optional[float] = None,
+        build_duration_sec: Optional[float] = None,
+        upload_duration_sec: Optional[float] = None,
+    ):
+        self.session.execute(
+            sa.update(BuildTiming)
+            .values(
+                {
+                    BuildTiming.successful: successful,
+                    BuildTiming.completed_date: completed_date,
+                    BuildTiming.configure_duration_sec: configure_duration_sec,
+                    BuildTiming.build_duration_sec: build_duration_sec,
+                    BuildTiming.upload_duration_sec: upload_duration_sec,
+                }
+            )
+            .where(BuildTiming.id == self._make_last_attempt_id_query(order_id))
+            .where(BuildTiming.completed_date.is_(None))
+        )
+
+    @staticmethod
+    def _make_last_attempt_id_query(order_id: int):
+        # Attempts reset by the cleaning task are never completed, so only the last one is updated.
+        return (sa.select(sa.func.max(BuildTiming.id))
+                .where(BuildTiming.order_id == order_id)
+                .scalar_subquery())
+
+    def set_build_sent(self, order_id: int, sent_date: datetime):
+        self.session.execute(
+            sa.update(BuildTiming)
+            .values({BuildTiming.sent_date: sent_date})
+            .where(BuildTiming.id == self._make_last_attempt_id_query(order_id))
+            .where(BuildTiming.successful == True)
+            .where(BuildTiming.sent_date.is_(None))
+        )
+
+    def get_median_build_duration(self, sample_size: int) -> Optional[float]:
+        """Returns the median time from claiming to uploading the apk over the last successful builds."""
+        recent_builds = (
+            sa.select(_seconds_between(BuildTiming.claimed_date, BuildTiming.completed_date).label("duration"))
+            .where(BuildTiming.successful == True)
+            .order_by(BuildTiming.claimed_date.desc())
+            .limit(sample_size)
+            .subquery()
+        )
+        q = sa.select(sa.func.percentile_cont(0.5).within_group(recent_builds.c.duration))
+        return self.session.execute(q).scalar()
+
+    def get_build_timing_stats(self, since: datetime) -> BuildTimingStats:
+        def successful_only(value):
+            # Percentiles skip NULLs.
+            return sa.case((BuildTiming.successful == True, value))
+
+        def percentile(fraction: float, value):
+            return sa.func.percentile_cont(fraction).within_group(value)
+
+        build_duration = successful_only(_seconds_between(BuildTiming.claimed_date, BuildTiming.completed_date))
+        q = (
+            sa.select(
+                sa.func.count(BuildTiming.successful),
+                sa.func.count(sa.case((BuildTiming.successful == False, 1))),
+                percentile(0.5, _seconds_between(BuildTiming.queued_date, BuildTiming.claimed_date)),
+                percentile(0.5, build_duration),
+                percentile(0.9, build_duration),
+                percentile(0.5, successful_only(BuildTiming.upload_duration_sec)),
+                percentile(0.5, _seconds_between(BuildTiming.completed_date, BuildTiming.sent_date)),
+            )
+            .where(BuildTiming.claimed_date >= since)
+        )
+        return BuildTimingStats(*self.session.execute(q).fetchone())
+
+    def remove_old_build_timings(self, before_date: datetime):
+        self.session.execute(sa.delete(BuildTiming).where(BuildTiming.claimed_date <= before_date))
@@ -0,0 +1,62 @@
+from datetime import datetime
+from typing import NamedTuple
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models import Delivery, Order
+from schemas.order_status import OrderStatus
+
+
+class PendingDelivery(NamedTuple):
+    order_id: int
+    attempts: int
+
+
+class DeliveriesCRUD:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def add_delivery(self, order_id: int, next_attempt_date: datetime):
+        self.session.execute(
+            insert(Delivery)
+            .values({Delivery.order_id: order_id, Delivery.next_attempt_date: next_attempt_date})
+            .on_conflict_do_nothing(index_elements=[Delivery.order_id])
+        )
+
+    def get_due_deliveries(self, now: datetime, excluded_order_ids: list[int], limit: int) -> list[PendingDelivery]:
+        q = (
+            sa.select(Delivery.order_id, Delivery.attempts)
+            .where(Delivery.next_attempt_date <= now, Delivery.order_id.not_in(excluded_order_ids))
+            .order_by(Delivery.next_attempt_date)
+            .limit(limit)
+        )
+        return [PendingDelivery(*row) for row in self.session.execute(q)]
+
+    def set_failed_attempt(self, order_id: int, attempts: int, next_attempt_date: datetime):
+        self.session.execute(
+            sa.update(Delivery)
+            .where(Delivery.order_id == order_id)
+            .values({Delivery.attempts: attempts, Delivery.next_attempt_date: next_attempt_date})
+        )
+
+    def remove_delivery(self, order_id: int):
+        self.session.execute(sa.delete(Delivery).where(Delivery.order_id == order_id))
+
+    def fail_delivery(self, order_id: int, status: OrderStatus, failed_status: OrderStatus) -> bool:
+        """Moves the order to `failed_status` and removes its delivery unless its status has changed meanwhile.
+
+        A delivery left behind by an interrupted call is removed by the delivery queue, because its order isn't being
+        sent anymore.
+        """
+        result = self.session.execute(
+            sa.update(Order)
+            .where(Order.id == order_id, Order.status == status)
+            .values({Order.status: failed_status})
+            .returning(Order.id)
+        )
+        if result.scalar() is None:
+            return False
+        self.remove_delivery(order_id)
+        return True
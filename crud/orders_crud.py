@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from typing import Iterator, Optional, Union
+from typing import Iterator, Optional, Union, NamedTuple
 
 import pytz
 import sqlalchemy as sa
@@ -8,6 +8,24 @@ from sqlalchemy.orm import Session
 import config
 from models import Order
 from schemas.order_status import OrderStatus, get_next_status
+from schemas.speculative_build_status import SpeculativeBuildStatus
+
+
+BUILD_QUEUE_STATUSES = [OrderStatus.queued, OrderStatus.update_queued]
+
+
+class QueuedOrder(NamedTuple):
+    id: int
+    priority: int
+    record_created: datetime
+
+
+class OrderOwnership(NamedTuple):
+    id: int
+    status: str
+    worker_id: Optional[int]
+    sources_only: bool
+    speculative_build_status: Optional[str]
 
 
 class OrdersCRUD:
@@ -119,7 +137,6 @@ class OrdersCRUD:
                     Order.keystore: order.keystore,
                     Order.keystore_password_salt: order.keystore_password_salt,
                     Order.status: order.status,
-                    Order.worker_id: order.worker_id,
                     Order.build_attempts: order.build_attempts,
                     Order.record_created: order.record_created,
                     Order.sources_only: order.sources_only,
@@ -131,6 +148,54 @@ class OrdersCRUD:
         )
         return result.scalar()
 
+    def update_order_build_state(self, order: Order) -> int:
+        """Writes only the columns the builds change, so the changes the bot makes meanwhile are kept.
+
+        The worker and the speculative build are owned by the controller, so `update_order` doesn't write them. A
+        speculative build the order had is dropped.
+        """
+        order.speculative_build_status = None
+        order.speculative_build_hash = None
+        result = self.session.execute(
+            sa.update(Order)
+            .values(
+                {
+                    Order.status: order.status,
+                    Order.worker_id: order.worker_id,
+                    Order.build_attempts: order.build_attempts,
+                    Order.speculative_build_status: None,
+                    Order.speculative_build_hash: None,
+                }
+            )
+            .where(Order.id == order.id)
+            .returning(Order.id)
+        )
+        return result.scalar()
+
+    def claim_queued_order(self, order: Order) -> bool:
+        """Writes the build state of the queued order unless another worker has claimed it since it was loaded."""
+        result = self.session.execute(
+            sa.update(Order)
+            .values(
+                {
+                    Order.status: order.status,
+                    Order.worker_id: order.worker_id,
+                    Order.build_attempts: order.build_attempts,
+                    Order.speculative_build_status: None,
+                    Order.speculative_build_hash: None,
+                }
+            )
+            .where(Order.id == order.id)
+            .where(Order.status.in_(BUILD_QUEUE_STATUSES))
+            .where(Order.worker_id.is_(None))
+            .returning(Order.id)
+        )
+        if result.scalar() is None:
+            return False
+        order.speculative_build_status = None
+        order.speculative_build_hash = None
+        return True
+
     def update_order_status(self, order: Order, status: OrderStatus):
         order.status = status
         result = self.session.execute(
@@ -185,24 +250,160 @@ class OrdersCRUD:
         for record in records:
             yield Order(**record)
 
-    def get_order_for_build(self) -> Optional[Order]:
-        q = (sa.select(*Order.__table__.c)
-             .where(((Order.status == OrderStatus.queued) | (Order.status == OrderStatus.update_queued)) & (Order.sources_only == False))
-             .where(Order.record_created < datetime.now().astimezone(pytz.utc))
-             .order_by(Order.record_created))
-
+    def get_build_queue(self, created_before: Optional[datetime] = None) -> list[QueuedOrder]:
+        """Returns the orders waiting for a build, oldest first."""
+        q = self.make_build_queue_query(created_before)
+        return [QueuedOrder(*row) for row in self.session.execute(q).fetchall()]
+
+    def get_sources_only_queue(self) -> list[QueuedOrder]:
+        """Returns the orders waiting for sources, oldest first."""
+        q = self.make_sources_only_queue_query()
+        return [QueuedOrder(*row) for row in self.session.execute(q).fetchall()]
+
+    @staticmethod
+    def make_build_queue_query(created_before: Optional[datetime] = None) -> sa.sql.Select:
+        q = (sa.select(Order.id, Order.priority, Order.record_created)
+             .where(Order.status.in_(BUILD_QUEUE_STATUSES))
+             .where(Order.sources_only == False))
+        if created_before is not None:
+            q = q.where(Order.record_created < created_before)
+        return q.order_by(Order.record_created, Order.id)
+
+    @staticmethod
+    def make_sources_only_queue_query() -> sa.sql.Select:
+        return (sa.select(Order.id, Order.priority, Order.record_created)
+                .where(Order.status == OrderStatus.get_sources_queued)
+                .where(Order.sources_only == True)
+                .order_by(Order.record_created, Order.id))
+
+    def get_first_queued_order(self, queue_query: sa.sql.Select,
+                               order_by: list[sa.sql.ColumnElement]) -> Optional[Order]:
+        """Returns the first order of the queue made by `make_*_queue_query` sorted by `order_by`."""
+        q = queue_query.with_only_columns(*Order.__table__.c).order_by(None).order_by(*order_by).limit(1)
         row = self.session.execute(q).fetchone()
+        return Order(**row) if row else None
 
+    def get_speculative_build_candidate(self, statuses: list[OrderStatus]) -> Optional[Order]:
+        q = (sa.select(*Order.__table__.c)
+             .where(Order.status.in_(statuses))
+             .where(Order.sources_only == False)
+             .where(Order.update_tag.is_(None))
+             .where(Order.worker_id.is_(None))
+             .where(Order.speculative_build_status.is_(None))
+             .order_by(Order.record_created, Order.id))
+        row = self.session.execute(q).fetchone()
         return Order(**row) if row else None
 
-    def get_sources_only_order(self) -> Optional[Order]:
+    def get_speculative_builds_in_progress(self) -> Iterator[Order]:
         q = (sa.select(*Order.__table__.c)
-             .where((Order.status == OrderStatus.get_sources_queued) & (Order.sources_only == True))
-             .order_by(Order.priority, Order.record_created))
+             .where(Order.speculative_build_status.in_([SpeculativeBuildStatus.building,
+                                                        SpeculativeBuildStatus.cancelled])))
+        for row in self.session.execute(q).fetchall():
+            yield Order(**row)
 
-        row = self.session.execute(q).fetchone()
+    def start_speculative_build(self, order: Order, worker_id: int, statuses: list[OrderStatus]) -> bool:
+        """Claims the order for the worker unless the user or another worker has changed it since it was loaded."""
+        result = self.session.execute(
+            sa.update(Order)
+            .values(
+                {
+                    Order.worker_id: worker_id,
+                    Order.speculative_build_status: SpeculativeBuildStatus.building,
+                    Order.speculative_build_hash: order.make_build_hash(),
+                }
+            )
+            .where(Order.id == order.id)
+            .where(Order.status.in_(statuses))
+            .where(Order.worker_id.is_(None))
+            .where(Order.speculative_build_status.is_(None))
+            .returning(Order.id)
+        )
+        if result.scalar() is None:
+            return False
+        order.worker_id = worker_id
+        order.speculative_build_status = SpeculativeBuildStatus.building
+        order.speculative_build_hash = order.make_build_hash()
+        return True
+
+    def complete_speculative_build(self, order: Order, worker_id: int, statuses: list[OrderStatus]) -> bool:
+        """Marks the build of the worker as built unless the order was confirmed, changed or reset meanwhile."""
+        result = self.session.execute(
+            sa.update(Order)
+            .values(
+                {
+                    Order.worker_id: None,
+                    Order.speculative_build_status: SpeculativeBuildStatus.built,
+                }
+            )
+            .where(Order.id == order.id)
+            .where(Order.status.in_(statuses))
+            .where(Order.worker_id == worker_id)
+            .where(Order.speculative_build_status == SpeculativeBuildStatus.building)
+            .where(Order.speculative_build_hash == order.make_build_hash())
+            .returning(Order.id)
+        )
+        return result.scalar() is not None
 
-        return Order(**row) if row else None
+    def reset_speculative_build(self, order_id: int, worker_id: Optional[int]) -> bool:
+        """Drops the speculative build of the worker unless the order was confirmed or reset meanwhile."""
+        result = self.session.execute(
+            sa.update(Order)
+            .values(
+                {
+                    Order.worker_id: None,
+                    Order.speculative_build_status: None,
+                    Order.speculative_build_hash: None,
+                }
+            )
+            .where(Order.id == order_id)
+            .where(Order.worker_id.is_not_distinct_from(worker_id))
+            .where(Order.speculative_build_status.in_([SpeculativeBuildStatus.building,
+                                                       SpeculativeBuildStatus.cancelled]))
+            .returning(Order.id)
+        )
+        return result.scalar() is not None
+
+    def replace_speculative_build_status(self, order_id: int, status: SpeculativeBuildStatus,
+                                         new_status: Optional[SpeculativeBuildStatus]) -> bool:
+        """Changes the speculative build status unless a worker has changed it since it was loaded."""
+        values = {Order.speculative_build_status: new_status}
+        if new_status is None:
+            values[Order.speculative_build_hash] = None
+        result = self.session.execute(
+            sa.update(Order)
+            .values(values)
+            .where(Order.id == order_id)
+            .where(Order.speculative_build_status == status)
+            .returning(Order.id)
+        )
+        return result.scalar() is not None
+
+    def update_confirmed_order(self, order: Order, worker_id: Optional[int],
+                               speculative_build_status: Optional[SpeculativeBuildStatus]) -> bool:
+        """Saves the confirmation unless a worker has changed the speculative build since the order was loaded."""
+        result = self.session.execute(
+            sa.update(Order)
+            .values(
+                {
+                    Order.status: order.status,
+                    Order.record_created: order.record_created,
+                    Order.worker_id: order.worker_id,
+                    Order.speculative_build_status: order.speculative_build_status,
+                    Order.speculative_build_hash: order.speculative_build_hash,
+                }
+            )
+            .where(Order.id == order.id)
+            .where(Order.worker_id.is_not_distinct_from(worker_id))
+            .where(Order.speculative_build_status.is_not_distinct_from(speculative_build_status))
+            .returning(Order.id)
+        )
+        return result.scalar() is not None
+
+    def get_order_ownerships(self, order_ids: list[int]) -> dict[int, OrderOwnership]:
+        """Returns the fields that tell whether a worker may continue building the orders, without loading icons."""
+        q = (sa.select(Order.id, Order.status, Order.worker_id, Order.sources_only, Order.speculative_build_status)
+             .where(Order.id.in_(order_ids)))
+        return {row[0]: OrderOwnership(*row) for row in self.session.execute(q).fetchall()}
 
     def get_worker_order(self, worker_id: int) -> Optional[Order]:
         q = (sa.select(*Order.__table__.c)
@@ -210,15 +411,6 @@ class OrdersCRUD:
         row = self.session.execute(q).fetchone()
         return Order(**row) if row else None
 
-    def get_order_queue_position(self, order: Order) -> int:
-        q = sa.select(sa.func.count(Order.id)).where(
-            (Order.status == OrderStatus.queued) &
-            ((Order.priority < order.priority) | ((Order.priority == order.priority) & (Order.record_created < order.record_created)))
-        )
-
-        result = self.session.execute(q).scalar() + 1
-        return result
-
     def order_for_user_exists(self, user_id: int) -> bool:
         q = (sa.select(sa.func.count(Order.id))
              .where(Order.user_id == user_id))
@@ -0,0 +1,37 @@
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models import TelegramMedia
+
+
+class TelegramMediaCRUD:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def get_file_id(self, file_hash: str, bot_id: int) -> Optional[str]:
+        q = sa.select(TelegramMedia.file_id).where(TelegramMedia.file_hash == file_hash,
+                                                   TelegramMedia.bot_id == bot_id)
+        return self.session.execute(q).scalar()
+
+    def set_file_id(self, file_hash: str, bot_id: int, file_id: str):
+        self.session.execute(
+            insert(TelegramMedia)
+            .values(
+                {
+                    TelegramMedia.file_hash: file_hash,
+                    TelegramMedia.bot_id: bot_id,
+                    TelegramMedia.file_id: file_id,
+                }
+            )
+            .on_conflict_do_update(
+                index_elements=[TelegramMedia.file_hash, TelegramMedia.bot_id],
+                set_={TelegramMedia.file_id: file_id},
+            )
+        )
+
+    def remove_file_id(self, file_hash: str, bot_id: int):
+        self.session.execute(sa.delete(TelegramMedia).where(TelegramMedia.file_hash == file_hash,
+                                                            TelegramMedia.bot_id == bot_id))
@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import Optional, Iterator
 
 import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from models.user_order_stats import UserBuildStats
@@ -37,6 +38,25 @@ class UserBuildStatsCRUD:
             .where(UserBuildStats.user_id_hash == stats.user_id_hash)
         )
 
+    def increase_user_build_stats(self, user_id_hash: str, successful: bool, build_date: datetime):
+        count_column = UserBuildStats.successful_build_count if successful else UserBuildStats.failed_build_count
+        q = insert(UserBuildStats).values(
+            {
+                UserBuildStats.user_id_hash: user_id_hash,
+                UserBuildStats.last_build_date: build_date,
+                UserBuildStats.successful_build_count: 1 if successful else 0,
+                UserBuildStats.failed_build_count: 0 if successful else 1,
+            }
+        )
+        q = q.on_conflict_do_update(
+            index_elements=[UserBuildStats.user_id_hash],
+            set_={
+                UserBuildStats.last_build_date.name: q.excluded.last_build_date,
+                count_column.name: count_column + 1,
+            }
+        )
+        self.session.execute(q)
+
     def get_user_build_stats(self, user_id_hash: str) -> Optional[UserBuildStats]:
         q = sa.select(*UserBuildStats.__table__.c).where(UserBuildStats.user_id_hash == user_id_hash)
         record = self.session.execute(q).fetchone()
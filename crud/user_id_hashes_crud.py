@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models import UserIdHash
+
+
+class UserIdHashesCRUD:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def add_user_id_hash(self, user_id_hmac: str, user_id_hash: str):
+        self.session.execute(
+            insert(UserIdHash)
+            .values(
+                {
+                    UserIdHash.user_id_hmac: user_id_hmac,
+                    UserIdHash.user_id_hash: user_id_hash,
+                }
+            )
+            .on_conflict_do_nothing(index_elements=[UserIdHash.user_id_hmac])
+        )
+
+    def get_user_id_hash(self, user_id_hmac: str) -> Optional[str]:
+        q = sa.select(UserIdHash.user_id_hash).where(UserIdHash.user_id_hmac == user_id_hmac)
+        return self.session.execute(q).scalar()
+
+    def remove_old_user_id_hashes(self, before_date: datetime):
+        self.session.execute(sa.delete(UserIdHash).where(UserIdHash.record_created <= before_date))
@@ -6,6 +6,8 @@ from sqlalchemy.orm import Session
 
 from models import Worker
 
+WORKERS_CHANGED_CHANNEL = "workers_changed"
+
 
 class WorkersCRUD:
     def __init__(self, session: Session):
@@ -22,10 +24,20 @@ class WorkersCRUD:
             )
             .returning(Worker.id)
         )
-        return result.scalar()
+        worker_id = result.scalar()
+        self.notify_workers_changed()
+        return worker_id
 
     def remove_worker(self, worker_id: int):
         self.session.execute(sa.delete(Worker).where(Worker.id == worker_id))
+        self.notify_workers_changed()
+
+    def notify_workers_changed(self):
+        # The workers controller caches workers and listens to this channel to invalidate the cache.
+        self.session.execute(
+            sa.select(sa.func.pg_notify(WORKERS_CHANGED_CHANNEL, ""))
+            .execution_options(autocommit=True)
+        )
 
     def update_worker_online(self, worker_id: int) -> int:
         result = self.session.execute(
@@ -40,6 +52,19 @@ class WorkersCRUD:
         )
         return result.scalar()
 
+    def update_workers_online(self, online_dates: dict[int, datetime]):
+        if not online_dates:
+            return
+        self.session.execute(
+            sa.update(Worker)
+            .values(
+                {
+                    Worker.last_online_date: sa.case(online_dates, value=Worker.id),
+                }
+            )
+            .where(Worker.id.in_(list(online_dates.keys())))
+        )
+
     def get_worker(self, worker_id: int) -> Worker:
         q = sa.select(*Worker.__table__.c).where(Worker.id == worker_id)
         row = self.session.execute(q).fetchone()
@@ -50,6 +75,15 @@ class WorkersCRUD:
         row = self.session.execute(q).fetchone()
         return Worker(**row) if row else None
 
+    def get_all_workers(self) -> Iterator[Worker]:
+        q = sa.select(*Worker.__table__.c)
+        for row in self.session.execute(q).fetchall():
+            yield Worker(**row)
+
+    def get_online_worker_count(self, online_since: datetime) -> int:
+        q = sa.select(sa.func.count(Worker.id)).where(Worker.last_online_date >= online_since)
+        return self.session.execute(q).scalar()
+
     def get_all_worker_names(self) -> Iterator[str]:
         q = sa.select(Worker.name)
         self.session.execute(q).fetchall()
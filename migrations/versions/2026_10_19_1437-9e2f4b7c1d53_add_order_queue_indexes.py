@@ -0,0 +1,30 @@
+"""add order queue indexes
+
+Revision ID: 9e2f4b7c1d53
+Revises: 3c5e8d0a91f4
+Create Date: 2026-10-19 14:37:51.882310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e2f4b7c1d53'
+down_revision = '3c5e8d0a91f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_build_queue', ['record_created'], unique=False,
+                              postgresql_where=sa.text("status IN ('queued', 'update_queued') AND NOT sources_only"))
+        batch_op.create_index('ix_orders_sources_only_queue', ['record_created'], unique=False,
+                              postgresql_where=sa.text("status = 'get_sources_queued' AND sources_only"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_sources_only_queue')
+        batch_op.drop_index('ix_orders_build_queue')
@@ -3,4 +3,9 @@ from .order import Order
 from .worker import Worker
 from .error_log import ErrorLog
 from .user_order_stats import UserBuildStats
-from .message_to_delete import MessageToDelete
\ No newline at end of file
+from .message_to_delete import MessageToDelete
+from .user_id_hash import UserIdHash
+from .build_timing import BuildTiming
+from .build_phase_event import BuildPhaseEvent
+from .telegram_media import TelegramMedia
+from .delivery import Delivery
@@ -0,0 +1,13 @@
+import sqlalchemy as sa
+
+from .base import Base
+
+
+class BuildPhaseEvent(Base):
+    """Start of a build phase reported by the worker. Rows outlive orders, so order_id is not a foreign key."""
+    __tablename__ = "build_phase_events"
+
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    order_id = sa.Column(sa.Integer, nullable=False, index=True)
+    phase = sa.Column(sa.String, nullable=False)
+    date = sa.Column(sa.DateTime, nullable=False, index=True)
@@ -0,0 +1,22 @@
+import sqlalchemy as sa
+from sqlalchemy import ForeignKey
+
+from .base import Base
+
+
+class BuildTiming(Base):
+    """Timings of one build attempt. Rows outlive orders, so order_id is not a foreign key."""
+    __tablename__ = "build_timings"
+
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    order_id = sa.Column(sa.Integer, nullable=False, index=True)
+    worker_id = sa.Column(sa.Integer, ForeignKey('workers.id', ondelete='SET NULL'), nullable=True)
+
+    queued_date = sa.Column(sa.DateTime, nullable=False)
+    claimed_date = sa.Column(sa.DateTime, nullable=False, index=True)
+    configure_duration_sec = sa.Column(sa.Float, nullable=True) # reported by the worker
+    build_duration_sec = sa.Column(sa.Float, nullable=True) # reported by the worker
+    upload_duration_sec = sa.Column(sa.Float, nullable=True)
+    completed_date = sa.Column(sa.DateTime, nullable=True)
+    sent_date = sa.Column(sa.DateTime, nullable=True)
+    successful = sa.Column(sa.BOOLEAN, nullable=True) # NULL while the build is in progress
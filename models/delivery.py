@@ -0,0 +1,18 @@
+import sqlalchemy as sa
+from sqlalchemy import ForeignKey
+
+from .base import Base
+
+
+class Delivery(Base):
+    """Build result waiting to be sent to the user, see DeliveryQueue."""
+    __tablename__ = "deliveries"
+
+    order_id = sa.Column(sa.Integer, ForeignKey('orders.id', ondelete='CASCADE'), primary_key=True)
+    attempts = sa.Column(sa.Integer, nullable=False, server_default="0")
+    next_attempt_date = sa.Column(
+        sa.DateTime,
+        nullable=False,
+        server_default=sa.text("(CURRENT_TIMESTAMP)"),
+        index=True,
+    )
@@ -1,4 +1,6 @@
 import base64
+import hashlib
+import json
 
 import sqlalchemy as sa
 from sqlalchemy import ForeignKey
@@ -10,6 +12,19 @@ from .base import Base
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Partial indexes for the queue queries in OrdersCRUD.
+        sa.Index(
+            "ix_orders_build_queue",
+            "record_created",
+            postgresql_where=sa.text("status IN ('queued', 'update_queued') AND NOT sources_only"),
+        ),
+        sa.Index(
+            "ix_orders_sources_only_queue",
+            "record_created",
+            postgresql_where=sa.text("status = 'get_sources_queued' AND sources_only"),
+        ),
+    )
 
     id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
 
@@ -48,12 +63,23 @@ class Order(Base):
 
     build_attempts = sa.Column(sa.Integer, server_default="0")
 
+    # A build started by an idle worker before the user confirmed the order, see SpeculativeBuilds.
+    speculative_build_status = sa.Column(sa.String, nullable=True)
+    speculative_build_hash = sa.Column(sa.String, nullable=True) # hash of the order fields the build was started with
+
     @staticmethod
     def get_fields_for_worker() -> set[str]:
         return {'id', 'app_name', 'app_id', 'app_icon', 'app_version_code', 'app_version_name',
                 'app_notification_icon', 'app_notification_color', 'app_masked_passcode_screen',
                 'app_notification_text', 'permissions', 'keystore', 'keystore_password_salt', 'sources_only'}
 
+    def make_build_hash(self) -> str:
+        """Hash of the fields that affect the built apk. Orders with the same settings have the same hash."""
+        fields = self.make_dict_for_worker()
+        fields.pop('id', None)
+        fields = json.dumps(fields, sort_keys=True)
+        return hashlib.sha256(fields.encode()).hexdigest()
+
     def make_dict_for_worker(self) -> dict:
         result = {k: v for k, v in self.__dict__.items() if k in self.get_fields_for_worker()}
         result['app_icon'] = base64.b64encode(result['app_icon']).decode("UTF-8")
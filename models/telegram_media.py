@@ -0,0 +1,18 @@
+import sqlalchemy as sa
+
+from .base import Base
+
+
+class TelegramMedia(Base):
+    """Telegram file id of a static file uploaded by the bot. File ids are valid only for the bot that got them."""
+    __tablename__ = "telegram_media"
+
+    file_hash = sa.Column(sa.String, primary_key=True) # sha256 of the file content
+    bot_id = sa.Column(sa.BIGINT, primary_key=True)
+    file_id = sa.Column(sa.String, nullable=False)
+
+    record_created = sa.Column(
+        sa.DateTime,
+        nullable=False,
+        server_default=sa.text("(CURRENT_TIMESTAMP)"),
+    )
@@ -0,0 +1,17 @@
+import sqlalchemy as sa
+
+from .base import Base
+
+
+class UserIdHash(Base):
+    __tablename__ = "user_id_hashes"
+
+    user_id_hmac = sa.Column(sa.String, primary_key=True) # HMAC of the user id, the raw user id is never stored
+    user_id_hash = sa.Column(sa.String, nullable=False)
+
+    record_created = sa.Column(
+        sa.DateTime,
+        nullable=False,
+        server_default=sa.text("(CURRENT_TIMESTAMP)"),
+        index=True,
+    )
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+from typing import Protocol
+
+import sqlalchemy as sa
+
+from crud.orders_crud import QueuedOrder
+from models import Order
+
+
+class DispatchPolicy(Protocol):
+    """Decides in which order queued orders are dispatched to workers.
+
+    The priority is 1 for new users and grows with the number of builds, so the higher the number,
+    the lower the priority. `now` is naive UTC like `Order.record_created`.
+    """
+
+    def sort_queue(self, queue: list[QueuedOrder], now: datetime) -> list[QueuedOrder]:
+        ...
+
+    def make_sort_key(self, order: QueuedOrder, now: datetime) -> tuple:
+        """Returns the key `sort_queue` sorts by, unique for every order."""
+        ...
+
+    def make_order_by(self, now: datetime) -> list[sa.sql.ColumnElement]:
+        """Returns the ORDER BY clauses of the queue query that sort like `make_sort_key`."""
+        ...
+
+
+class FifoPolicy:
+    """Dispatches orders in the order they were created and ignores priority."""
+
+    def sort_queue(self, queue: list[QueuedOrder], now: datetime) -> list[QueuedOrder]:
+        return sorted(queue, key=lambda order: self.make_sort_key(order, now))
+
+    def make_sort_key(self, order: QueuedOrder, now: datetime) -> tuple:
+        return order.record_created, order.id
+
+    def make_order_by(self, now: datetime) -> list[sa.sql.ColumnElement]:
+        return [Order.record_created, Order.id]
+
+
+class StrictPriorityPolicy:
+    """Dispatches the orders with the highest priority first. Low priority orders may starve under load."""
+
+    def sort_queue(self, queue: list[QueuedOrder], now: datetime) -> list[QueuedOrder]:
+        return sorted(queue, key=lambda order: self.make_sort_key(order, now))
+
+    def make_sort_key(self, order: QueuedOrder, now: datetime) -> tuple:
+        return order.priority, order.record_created, order.id
+
+    def make_order_by(self, now: datetime) -> list[sa.sql.ColumnElement]:
+        return [Order.priority, Order.record_created, Order.id]
+
+
+class AgingPolicy:
+    """Dispatches orders as if each priority level above 1 was created `aging_interval` later.
+
+    The key of an order doesn't change while it waits, so every order eventually overtakes newer orders
+    of any priority and can't starve.
+    """
+
+    def __init__(self, aging_interval: timedelta):
+        self.aging_interval = aging_interval
+
+    def sort_queue(self, queue: list[QueuedOrder], now: datetime) -> list[QueuedOrder]:
+        return sorted(queue, key=lambda order: self.make_sort_key(order, now))
+
+    def make_sort_key(self, order: QueuedOrder, now: datetime) -> tuple:
+        return order.record_created + (order.priority - 1) * self.aging_interval, order.id
+
+    def make_order_by(self, now: datetime) -> list[sa.sql.ColumnElement]:
+        aging = sa.func.make_interval(0, 0, 0, 0, 0, 0, (Order.priority - 1) * self.aging_interval.total_seconds())
+        return [Order.record_created + aging, Order.id]
+
+
+class WeightedWaitPolicy:
+    """Dispatches the order with the longest wait time weighted by 1 / priority.
+
+    E.g. a priority 2 order that has waited 20 minutes goes before a priority 1 order that has waited 9 minutes.
+    Workers are shared between priority classes instead of serving them one after another, and the weighted
+    wait time of every order grows, so low priority orders can't starve.
+    """
+
+    def sort_queue(self, queue: list[QueuedOrder], now: datetime) -> list[QueuedOrder]:
+        return sorted(queue, key=lambda order: self.make_sort_key(order, now))
+
+    def make_sort_key(self, order: QueuedOrder, now: datetime) -> tuple:
+        return -self._get_weighted_wait(order, now), order.record_created, order.id
+
+    def make_order_by(self, now: datetime) -> list[sa.sql.ColumnElement]:
+        wait_sec = sa.func.greatest(sa.extract("epoch", sa.literal(now, sa.DateTime) - Order.record_created), 0)
+        weighted_wait = wait_sec / sa.func.greatest(Order.priority, 1)
+        return [weighted_wait.desc(), Order.record_created, Order.id]
+
+    @staticmethod
+    def _get_weighted_wait(order: QueuedOrder, now: datetime) -> float:
+        wait_sec = max((now - order.record_created).total_seconds(), 0)
+        return wait_sec / max(order.priority, 1)
+
+
+def make_dispatch_policy(name: str, aging_interval_sec: int) -> DispatchPolicy:
+    if name == "fifo":
+        return FifoPolicy()
+    elif name == "strict_priority":
+        return StrictPriorityPolicy()
+    elif name == "aging":
+        return AgingPolicy(timedelta(seconds=aging_interval_sec))
+    elif name == "weighted_wait":
+        return WeightedWaitPolicy()
+    else:
+        raise ValueError(f"Unknown dispatch policy '{name}'")
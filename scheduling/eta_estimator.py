@@ -0,0 +1,52 @@
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from crud.build_timings_crud import BuildTimingsCRUD
+from crud.workers_crud import WorkersCRUD
+
+
+class EtaEstimator:
+    """Estimates when a queued build will be ready from the recent build durations and the online workers.
+
+    Every online worker builds one order at a time, so the order at the position p is ready after
+    ceil(p / worker_count) builds.
+    """
+
+    # Number of recent successful builds for the median build duration.
+    SAMPLE_SIZE = 50
+    CACHE_TTL_SEC = 60
+
+    def __init__(self, build_timings: BuildTimingsCRUD, workers: WorkersCRUD, worker_offline_after_sec: int):
+        self.build_timings = build_timings
+        self.workers = workers
+        self.worker_offline_after_sec = worker_offline_after_sec
+        self.build_duration_sec: Optional[float] = None
+        self.worker_count = 0
+        self.load_time: Optional[float] = None
+
+    def estimate_wait(self, queue_position: int) -> Optional[timedelta]:
+        self._reload_if_needed()
+        if self.build_duration_sec is None or self.worker_count == 0:
+            return None
+        build_rounds = math.ceil(queue_position / self.worker_count)
+        return timedelta(seconds=build_rounds * self.build_duration_sec)
+
+    def get_builds_per_hour(self) -> Optional[float]:
+        self._reload_if_needed()
+        if not self.build_duration_sec:
+            return None
+        return self.worker_count * 3600 / self.build_duration_sec
+
+    def get_worker_count(self) -> int:
+        self._reload_if_needed()
+        return self.worker_count
+
+    def _reload_if_needed(self):
+        if self.load_time is not None and time.monotonic() - self.load_time < self.CACHE_TTL_SEC:
+            return
+        self.build_duration_sec = self.build_timings.get_median_build_duration(self.SAMPLE_SIZE)
+        online_since = datetime.now() - timedelta(seconds=self.worker_offline_after_sec)
+        self.worker_count = self.workers.get_online_worker_count(online_since)
+        self.load_time = time.monotonic()
@@ -0,0 +1,40 @@
+from datetime import datetime
+from typing import Optional
+
+import pytz
+
+from crud.orders_crud import OrdersCRUD, QueuedOrder
+from models import Order
+from .dispatch_policy import DispatchPolicy
+
+
+class OrderScheduler:
+    """Picks orders for workers according to the dispatch policy.
+
+    Workers poll for orders often, so the first order is selected by the database with the ORDER BY of the policy.
+    The bot ranks queue positions with the same scheduler, so the position shown to the user matches
+    the order in which the controller dispatches builds.
+    """
+
+    def __init__(self, orders: OrdersCRUD, policy: DispatchPolicy):
+        self.orders = orders
+        self.policy = policy
+
+    def get_build_queue(self, now: Optional[datetime] = None) -> list[QueuedOrder]:
+        return self.policy.sort_queue(self.orders.get_build_queue(), now or self.now())
+
+    def get_sources_only_queue(self, now: Optional[datetime] = None) -> list[QueuedOrder]:
+        return self.policy.sort_queue(self.orders.get_sources_only_queue(), now or self.now())
+
+    def get_order_for_build(self) -> Optional[Order]:
+        # Update orders are delayed, so the user can change them before the build.
+        queue_query = OrdersCRUD.make_build_queue_query(created_before=datetime.now().astimezone(pytz.utc))
+        return self.orders.get_first_queued_order(queue_query, self.policy.make_order_by(self.now()))
+
+    def get_sources_only_order(self) -> Optional[Order]:
+        queue_query = OrdersCRUD.make_sources_only_queue_query()
+        return self.orders.get_first_queued_order(queue_query, self.policy.make_order_by(self.now()))
+
+    @staticmethod
+    def now() -> datetime:
+        return datetime.now(pytz.utc).replace(tzinfo=None)
@@ -0,0 +1,98 @@
+"""Replays a synthetic arrival trace through each dispatch policy and reports wait times per priority class.
+
+Usage: python -m scheduling.simulation [--workers 2] [--arrivals-per-hour 40] [--hours 24] [--seed 0]
+"""
+import argparse
+import heapq
+import math
+from datetime import datetime, timedelta
+from random import Random
+
+import config
+from crud.orders_crud import QueuedOrder
+from .dispatch_policy import DispatchPolicy, make_dispatch_policy
+
+POLICY_NAMES = ["fifo", "strict_priority", "aging", "weighted_wait"]
+# Most users build once, some rebuild a few times.
+PRIORITY_WEIGHTS = {1: 0.6, 2: 0.25, 3: 0.1, 4: 0.03, 5: 0.02}
+MAX_PRIORITY_CLASS = 4
+
+
+class Arrival:
+    def __init__(self, order: QueuedOrder, build_duration: timedelta):
+        self.order = order
+        self.build_duration = build_duration
+
+
+def make_arrival_trace(arrivals_per_hour: float, hours: float, mean_build_min: float, seed: int) -> list[Arrival]:
+    random = Random(seed)
+    start = datetime(2025, 1, 1)
+    trace = []
+    t = 0.0
+    while True:
+        t += random.expovariate(arrivals_per_hour / 3600)
+        if t > hours * 3600:
+            return trace
+        priority = random.choices(list(PRIORITY_WEIGHTS), weights=list(PRIORITY_WEIGHTS.values()))[0]
+        build_duration = timedelta(minutes=max(random.gauss(mean_build_min, mean_build_min / 4), 1))
+        order = QueuedOrder(len(trace) + 1, priority, start + timedelta(seconds=t))
+        trace.append(Arrival(order, build_duration))
+
+
+def simulate(policy: DispatchPolicy, trace: list[Arrival], worker_count: int) -> dict[int, list[float]]:
+    """Returns wait times in minutes per priority class."""
+    build_durations = {arrival.order.id: arrival.build_duration for arrival in trace}
+    waits: dict[int, list[float]] = {}
+    worker_free_times = [trace[0].order.record_created] * worker_count if trace else []
+    queue: list[QueuedOrder] = []
+    next_arrival = 0
+    while next_arrival < len(trace) or queue:
+        now = heapq.heappop(worker_free_times)
+        if not queue and trace[next_arrival].order.record_created > now:
+            now = trace[next_arrival].order.record_created
+        while next_arrival < len(trace) and trace[next_arrival].order.record_created <= now:
+            queue.append(trace[next_arrival].order)
+            next_arrival += 1
+        order = policy.sort_queue(queue, now)[0]
+        queue.remove(order)
+        priority_class = min(order.priority, MAX_PRIORITY_CLASS)
+        waits.setdefault(priority_class, []).append((now - order.record_created).total_seconds() / 60)
+        heapq.heappush(worker_free_times, now + build_durations[order.id])
+    return waits
+
+
+def percentile(values: list[float], p: float) -> float:
+    sorted_values = sorted(values)
+    return sorted_values[max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)]
+
+
+def print_report(policy_name: str, waits: dict[int, list[float]]):
+    print(f"\n{policy_name}")
+    print(f"{'priority':>8} {'orders':>7} {'p50 min':>8} {'p90 min':>8} {'p99 min':>8} {'max min':>8}")
+    for priority_class in sorted(waits):
+        values = waits[priority_class]
+        label = f"{priority_class}+" if priority_class == MAX_PRIORITY_CLASS else str(priority_class)
+        print(f"{label:>8} {len(values):>7} {percentile(values, 50):>8.1f} {percentile(values, 90):>8.1f} "
+              f"{percentile(values, 99):>8.1f} {max(values):>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--arrivals-per-hour", type=float, default=40)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--mean-build-min", type=float, default=5)
+    parser.add_argument("--aging-interval-sec", type=int, default=config.DISPATCH_AGING_INTERVAL_SEC)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    trace = make_arrival_trace(args.arrivals_per_hour, args.hours, args.mean_build_min, args.seed)
+    print(f"{len(trace)} orders, {args.workers} workers, "
+          f"load {args.arrivals_per_hour * args.mean_build_min / 60 / args.workers:.2f}")
+    for policy_name in POLICY_NAMES:
+        policy = make_dispatch_policy(policy_name, args.aging_interval_sec)
+        print_report(policy_name, simulate(policy, trace, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import logging
+import shutil
+from typing import Optional
+
+import utils
+from crud.orders_crud import OrdersCRUD
+from models import Order
+from schemas.order_status import OrderStatus
+from schemas.speculative_build_status import SpeculativeBuildStatus
+
+# Most users confirm generated orders without changes, so these orders are built while the user is deciding.
+SPECULATIVE_BUILD_STATUSES = [OrderStatus.generated, OrderStatus.confirmation]
+
+
+class SpeculativeBuilds:
+    """Builds orders that are not confirmed yet on idle workers.
+
+    The result is used if the user confirms the order without changes, otherwise it is discarded. The order keeps
+    its configuring status during the build, so the user doesn't see the speculative build.
+    """
+
+    def __init__(self, orders: OrdersCRUD):
+        self.orders = orders
+
+    def claim_order(self, worker_id: int) -> Optional[Order]:
+        """Called by the controller when there are no queued orders for the worker."""
+        order = self.orders.get_speculative_build_candidate(SPECULATIVE_BUILD_STATUSES)
+        if order is None or not self.orders.start_speculative_build(order, worker_id, SPECULATIVE_BUILD_STATUSES):
+            return None
+        logging.info(f"Speculative build of order #{order.id} started")
+        return order
+
+    def on_build_completed(self, order: Order, worker_id: int, successful: bool) -> bool:
+        """Called by the controller after the worker sent the result of a speculative build.
+
+        Returns False if the order isn't a speculative build of the worker anymore, because the user has confirmed it
+        and the build continues as a regular one.
+        """
+        if (successful and order.speculative_build_status == SpeculativeBuildStatus.building
+                and self.orders.complete_speculative_build(order, worker_id, SPECULATIVE_BUILD_STATUSES)):
+            order.worker_id = None
+            order.speculative_build_status = SpeculativeBuildStatus.built
+            return True
+        return self.on_build_cancelled(order.id, worker_id)
+
+    def on_build_cancelled(self, order_id: int, worker_id: int) -> bool:
+        """Discards the speculative build of the worker. Returns False if it isn't a speculative build anymore."""
+        if not self.orders.reset_speculative_build(order_id, worker_id):
+            return False
+        self._remove_result(order_id)
+        return True
+
+    def confirm_order(self, order: Order) -> bool:
+        """Saves the confirmed order, moving it to the speculative build if it can be used.
+
+        The order is saved only if no worker has changed the speculative build since it was loaded, otherwise the
+        build is checked again. Returns True if the build result is already available.
+        """
+        confirmed_status = order.status
+        while True:
+            worker_id, speculative_build_status = order.worker_id, order.speculative_build_status
+            is_built = self.on_order_confirmed(order)
+            if self.orders.update_confirmed_order(order, worker_id, speculative_build_status):
+                return is_built
+            current_order = self.orders.get_order(order.id)
+            if current_order is None:
+                return False
+            order.status = confirmed_status
+            order.worker_id = current_order.worker_id
+            order.speculative_build_status = current_order.speculative_build_status
+            order.speculative_build_hash = current_order.speculative_build_hash
+
+    def on_order_confirmed(self, order: Order) -> bool:
+        """Moves the confirmed order to the speculative build if it can be used, otherwise drops the build.
+
+        Returns True if the build result is already available.
+        """
+        is_actual = order.speculative_build_hash == order.make_build_hash()
+        if is_actual and order.speculative_build_status == SpeculativeBuildStatus.built:
+            order.status = OrderStatus.built
+            self._clear(order)
+            return True
+        elif (is_actual and order.speculative_build_status == SpeculativeBuildStatus.building
+              and order.worker_id is not None):
+            # The build continues as a regular one.
+            order.status = OrderStatus.build_started
+            self._clear(order)
+            return False
+        # A build in progress is stopped by the worker, because the order isn't its anymore.
+        if order.speculative_build_status == SpeculativeBuildStatus.built:
+            self._remove_result(order.id)
+        order.worker_id = None
+        self._clear(order)
+        return False
+
+    def on_order_customized(self, order: Order):
+        # The worker stops the build on its next keep-alive.
+        if self.orders.replace_speculative_build_status(order.id, SpeculativeBuildStatus.building,
+                                                        SpeculativeBuildStatus.cancelled):
+            order.speculative_build_status = SpeculativeBuildStatus.cancelled
+        elif self.orders.replace_speculative_build_status(order.id, SpeculativeBuildStatus.built, None):
+            self._remove_result(order.id)
+            self._clear(order)
+
+    def on_order_removed(self, order: Order):
+        # A build in progress is stopped by the worker, because the order doesn't exist anymore.
+        if order.speculative_build_status == SpeculativeBuildStatus.built:
+            self._remove_result(order.id)
+
+    @staticmethod
+    def _remove_result(order_id: int):
+        shutil.rmtree(utils.make_order_build_result_dir_path(order_id), ignore_errors=True)
+
+    @staticmethod
+    def _clear(order: Order):
+        order.speculative_build_status = None
+        order.speculative_build_hash = None
@@ -0,0 +1,10 @@
+from enum import StrEnum
+
+
+class BuildPhase(StrEnum):
+    """Phases reported by the worker during a build, in the order they happen."""
+    repo_sync = "repo_sync"
+    configure = "configure"
+    docker_build = "docker_build"
+    gradle_assemble = "gradle_assemble"
+    upload = "upload"
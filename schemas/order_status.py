@@ -101,8 +101,9 @@ _STATUS_TRANSITIONS: dict[OptionalOrderStatus, StatusTransition] = {
     OrderStatus.sending_apk: {None: OrderStatus.successfully_finished, "repeat": OrderStatus.built, "fail": OrderStatus.failed},
     OrderStatus.successfully_finished: {None: None, "get_sources": OrderStatus.get_sources_queued},
     OrderStatus.get_sources_queued: OrderStatus.sources_downloaded,
-    OrderStatus.sources_downloaded: {"send_result": OrderStatus.sending_sources, "repeat": OrderStatus.sources_downloaded},
-    OrderStatus.sending_sources: OrderStatus.getting_sources_successfully_finished,
+    OrderStatus.sources_downloaded: {"send_result": OrderStatus.sending_sources, "repeat": OrderStatus.sources_downloaded, "fail": OrderStatus.successfully_finished},
+    # The user can ask for the sources again if they weren't sent.
+    OrderStatus.sending_sources: {None: OrderStatus.getting_sources_successfully_finished, "fail": OrderStatus.successfully_finished},
     OrderStatus.getting_sources_successfully_finished: None,
     OrderStatus.failed: OrderStatus.failed_notified,
     OrderStatus.failed_notified: {"retry": OrderStatus.queued, "cancel": None},
@@ -0,0 +1,8 @@
+from enum import StrEnum
+
+
+class SpeculativeBuildStatus(StrEnum):
+    building = "building"
+    built = "built"
+    # The user changed the order during the build, the result will be discarded.
+    cancelled = "cancelled"
@@ -12,7 +12,9 @@ cd Partisan-Telegram-Android
 MOUNT_POINT="$1"
 DOCKER_IMAGE_NAME="$2"
 docker build -f Dockerfile -t "$DOCKER_IMAGE_NAME" .
-docker run -v "${MOUNT_POINT}":/home/source -m 10G --rm "$DOCKER_IMAGE_NAME"
+echo "##build-phase gradle_assemble"
+# The container is named after the image, so the worker can remove it when the build is cancelled.
+docker run -v "${MOUNT_POINT}":/home/source -m 10G --rm --name "$DOCKER_IMAGE_NAME" "$DOCKER_IMAGE_NAME"
 docker rmi -f "$DOCKER_IMAGE_NAME" || true
 docker system prune -f
 cd ..
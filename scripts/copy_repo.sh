@@ -1,19 +1,16 @@
 #!/bin/bash
 set -e
 
-if [ "$#" -ne 1 ]; then
+# args: destination_dir, commit
+
+if [ "$#" -ne 2 ]; then
     echo "Illegal number of parameters"
     exit 1
 fi
 
-if [ -d "Partisan-Telegram-Android" ]; then
-  cd Partisan-Telegram-Android
-  git pull || exit 1
-else
-  git clone -b masking https://github.com/wrwrabbit/Partisan-Telegram-Android.git || exit 1
-  cd Partisan-Telegram-Android
-fi
-
-cd ..
-
-cp -R Partisan-Telegram-Android "$1/Partisan-Telegram-Android"
+ORIGIN_URL="$(git -C Partisan-Telegram-Android remote get-url origin)"
+# A local clone hardlinks the objects, so the copy doesn't need the network.
+git clone --no-checkout Partisan-Telegram-Android "$1/Partisan-Telegram-Android"
+cd "$1/Partisan-Telegram-Android"
+git checkout -B masking "$2"
+git remote set-url origin "$ORIGIN_URL"
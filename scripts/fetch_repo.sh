@@ -0,0 +1,15 @@
+#!/bin/bash
+set -e
+
+if [ "$#" -ne 0 ]; then
+    echo "Illegal number of parameters"
+    exit 1
+fi
+
+if [ -d "Partisan-Telegram-Android" ]; then
+  cd Partisan-Telegram-Android
+  # Only the remote branch is updated, builds check out the fetched commit in their own copies.
+  git fetch origin masking || exit 1
+else
+  git clone -b masking https://github.com/wrwrabbit/Partisan-Telegram-Android.git || exit 1
+fi
@@ -8,6 +8,7 @@ if [ "$#" -ne 1 ]; then
     exit 1
 fi
 
+echo "##build-phase gradle_assemble"
 if [ "$1" = "True" ]; then
     echo "[mock_build.sh] Mocking build failure"
     sleep 5
@@ -5,15 +5,28 @@ from sys import argv
 variables_per_service = {
         "bot" : ["POSTGRES_USER", "POSTGRES_PASSWORD", "SKIP_UPDATES", "DELETE_MESSAGES_AFTER_SEC",
                  "DELETE_MESSAGES_WITHOUT_ORDERS_AFTER_SEC", "DELETE_MESSAGES_WITH_FINISHED_ORDERS_AFTER_SEC",
-                 "TOKEN", "TMP_DIR", "JWT_SECRET_KEY", "ADMIN_CHAT_ID", "ERROR_LOGS_CHAT_ID", "STATS_CHAT_ID",
+                 "TOKEN", "TELEGRAM_LOCAL_FILES", "TMP_DIR", "JWT_SECRET_KEY", "ADMIN_CHAT_ID", "ERROR_LOGS_CHAT_ID", "STATS_CHAT_ID",
                  "STATS_PERIOD", "SALT_FOR_DERIVATION_RANDOM_SEED_FROM_USER_ID","KEYSTORE_PASSWORD",
-                 "USER_ID_HASH_SALT", "FAILED_BUILD_COUNT_ALLOWED", "UPDATES_ALLOWED", "SET_BOT_NAME_AND_DESCRIPTION",
-                 "DELAY_BEFORE_UPDATE_ORDER_BUILD_SEC"],
-        "build_worker": ["DATA_DIR", "TMP_DIR", "MOCK_BUILD", "WORKER_CONTROLLER_HOST", "WORKER_CHECK_INTERVAL_SEC",
-                         "WORKER_JWT", "KEYSTORE_PASSWORD", "BUILD_DOCKER_IMAGE_NAME", "ALLOW_BUILD_SOURCES_ONLY"],
+                 "USER_ID_HASH_SALT", "USER_ID_HASH_CACHE_SIZE", "USER_ID_HASH_CACHE_KEY",
+                 "USER_ID_HASH_THREAD_COUNT", "FAILED_BUILD_COUNT_ALLOWED", "UPDATES_ALLOWED", "SET_BOT_NAME_AND_DESCRIPTION",
+                 "DELAY_BEFORE_UPDATE_ORDER_BUILD_SEC", "DISPATCH_POLICY", "DISPATCH_AGING_INTERVAL_SEC",
+                 "CONSIDER_WORKER_OFFLINE_AFTER_SEC", "BUILD_PROGRESS_MESSAGES", "DELIVERY_UPLOAD_SLOTS",
+                 "DELIVERY_TIMEOUT_SEC", "DELIVERY_RETRY_DELAY_SEC", "DELIVERY_MAX_RETRY_DELAY_SEC",
+                 "BUILD_RESULT_MAX_BYTES", "BUILD_RESULT_MAX_AGE_SEC"],
+        "build_worker": ["DATA_DIR", "TMP_DIR", "BUILD_LOGS_DIR", "ICON_CACHE_DIR", "ICON_CACHE_TTL_SEC",
+                         "SOURCES_BASE_DIR", "MOCK_BUILD", "WORKER_CONTROLLER_HOST", "WORKER_CHECK_INTERVAL_SEC",
+                         "WORKER_JWT", "KEYSTORE_PASSWORD", "BUILD_DOCKER_IMAGE_NAME", "ALLOW_BUILD_SOURCES_ONLY",
+                         "REPO_FETCH_INTERVAL_SEC"],
         "clean_orders_queue": ["POSTGRES_USER", "POSTGRES_PASSWORD", "CONSIDER_WORKER_OFFLINE_AFTER_SEC",
-                               "DELETE_USER_BUILD_STATS_AFTER_SEC"],
-        "workers_controller": ["POSTGRES_USER", "POSTGRES_PASSWORD", "JWT_SECRET_KEY", "TMP_DIR", "USER_ID_HASH_SALT"],
+                               "DELETE_USER_BUILD_STATS_AFTER_SEC", "DELETE_BUILD_TIMINGS_AFTER_SEC", "TMP_DIR",
+                               "USER_ID_HASH_CACHE_TTL_SEC",
+                               "BUILD_RESULT_MAX_BYTES", "BUILD_RESULT_MAX_AGE_SEC", "BUILD_RESULT_SWEEP_INTERVAL_SEC"],
+        "workers_controller": ["POSTGRES_USER", "POSTGRES_PASSWORD", "JWT_SECRET_KEY", "TMP_DIR", "USER_ID_HASH_SALT",
+                               "USER_ID_HASH_CACHE_SIZE", "USER_ID_HASH_CACHE_KEY", "USER_ID_HASH_THREAD_COUNT",
+                               "WORKERS_CACHE_TTL_SEC", "WORKER_ONLINE_FLUSH_INTERVAL_SEC", "UPLOAD_CONCURRENCY_LIMIT",
+                               "WORKERS_CONTROLLER_PROCESSES", "WORKERS_CONTROLLER_THREADS",
+                               "DISPATCH_POLICY", "DISPATCH_AGING_INTERVAL_SEC", "SPECULATIVE_BUILDS",
+                               "APK_CACHE_MAX_BYTES", "APK_CACHE_TTL_SEC"],
         "migrations": ["POSTGRES_USER", "POSTGRES_PASSWORD"],
         "tests": []
     }
@@ -372,6 +372,48 @@ translations = {
         'be': "Ваш Партызанскі Тэлеграм знаходзіцца ў чарзе. Ваша пазіцыя ў чарзе: {}",
         'uk': "Ваш Партизанський Телеграм перебуває у черзі. Ваша позиція у черзі: {}",
     },
+    'queue-eta': {
+        'en': "Estimated waiting time: about {} min.",
+        'ru': "Примерное время ожидания: около {} мин.",
+        'be': "Прыблізны час чакання: каля {} хв.",
+        'uk': "Орієнтовний час очікування: близько {} хв.",
+    },
+    'build-phase': {
+        'en': "Current step: {}",
+        'ru': "Текущий этап: {}",
+        'be': "Бягучы этап: {}",
+        'uk': "Поточний етап: {}",
+    },
+    'build-phase-repo_sync': {
+        'en': "preparing the source code",
+        'ru': "подготовка исходного кода",
+        'be': "падрыхтоўка зыходнага кода",
+        'uk': "підготовка вихідного коду",
+    },
+    'build-phase-configure': {
+        'en': "applying your settings",
+        'ru': "применение Ваших настроек",
+        'be': "ужыванне Вашых налад",
+        'uk': "застосування Ваших налаштувань",
+    },
+    'build-phase-docker_build': {
+        'en': "preparing the build environment",
+        'ru': "подготовка окружения для сборки",
+        'be': "падрыхтоўка асяроддзя для зборкі",
+        'uk': "підготовка середовища для збірки",
+    },
+    'build-phase-gradle_assemble': {
+        'en': "building the app",
+        'ru': "сборка приложения",
+        'be': "зборка дадатка",
+        'uk': "збірка застосунку",
+    },
+    'build-phase-upload': {
+        'en': "uploading the app",
+        'ru': "загрузка приложения",
+        'be': "загрузка дадатка",
+        'uk': "завантаження застосунку",
+    },
     'status-finished': {
         'en': "The build of your Partisan Telegram is finished.",
         'ru': "Сборка Вашего Партизанского Телеграма завершена.",
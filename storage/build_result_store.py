@@ -0,0 +1,150 @@
+import os
+import shutil
+import time
+from typing import NamedTuple, Optional
+
+from crud.deliveries_crud import DeliveriesCRUD
+from crud.orders_crud import OrderOwnership, OrdersCRUD
+from models import Order
+from schemas.order_status import STATUSES_CONFIGURING, STATUSES_FINISHED, OrderStatus, get_next_status
+from schemas.speculative_build_status import SpeculativeBuildStatus
+
+# The results of these orders are waiting for the delivery to the user.
+STATUSES_DELIVERY_PENDING = [
+    OrderStatus.built,
+    OrderStatus.sending_apk,
+    OrderStatus.sources_downloaded,
+    OrderStatus.sending_sources,
+]
+
+
+class BuildResult(NamedTuple):
+    order_id: int
+    path: str
+    size: int
+    modified: float # the latest modification time of the files
+
+
+class BuildResultUsage(NamedTuple):
+    result_count: int
+    total_bytes: int
+
+
+class BuildResultStore:
+    """Build results in `root_dir/<order_id>`, written by the controller and swept by the clean task.
+
+    A result is removed by the bot when it is sent. The store removes the results of the orders that were removed or
+    finished without sending them, the results older than `max_age_sec`, and the least recently written unused results
+    while all of them take more than `max_bytes`. `max_bytes` 0 disables the quota. The results of the builds in
+    progress are never removed, the results waiting for the delivery only when they expire.
+    """
+
+    def __init__(self, root_dir: str, max_bytes: int, max_age_sec: int):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_sec
+
+    def get_results(self) -> list[BuildResult]:
+        if not os.path.isdir(self.root_dir):
+            return []
+        results = []
+        # The files passed to the local Bot API server and the apks served from the apk cache are hard links, the data
+        # of a file is counted once.
+        seen_inodes: set[tuple[int, int]] = set()
+        for name in os.listdir(self.root_dir):
+            path = os.path.join(self.root_dir, name)
+            if not name.isdigit() or not os.path.isdir(path):
+                continue
+            size = 0
+            modified = 0.0
+            try:
+                for dir_path, _, file_names in os.walk(path):
+                    for file_name in file_names:
+                        stat = os.stat(os.path.join(dir_path, file_name))
+                        if (stat.st_dev, stat.st_ino) not in seen_inodes:
+                            seen_inodes.add((stat.st_dev, stat.st_ino))
+                            size += stat.st_size
+                        modified = max(modified, stat.st_mtime)
+                modified = max(modified, os.stat(path).st_mtime)
+            except FileNotFoundError:
+                continue # Removed by another process.
+            results.append(BuildResult(int(name), path, size, modified))
+        return results
+
+    def get_usage(self) -> BuildResultUsage:
+        results = self.get_results()
+        return BuildResultUsage(len(results), sum(result.size for result in results))
+
+    def evict(self, orders: OrdersCRUD) -> list[int]:
+        """Removes the expired results and the least recently written unused ones over the quota.
+
+        An expired result that is waiting for the delivery is removed together with the delivery, and its order
+        fails. Returns the order ids of the removed results.
+        """
+        results = self.get_results()
+        ownerships = orders.get_order_ownerships([result.order_id for result in results])
+        removed_order_ids = []
+        for result in self.get_evicted_results(results, ownerships, time.time()):
+            if self._release(orders, ownerships.get(result.order_id)):
+                self._remove(result)
+                removed_order_ids.append(result.order_id)
+        return removed_order_ids
+
+    def get_evicted_results(self, results: list[BuildResult], ownerships: dict[int, OrderOwnership],
+                            now: float) -> list[BuildResult]:
+        evicted = []
+        kept = []
+        for result in results:
+            ownership = ownerships.get(result.order_id)
+            if now - result.modified >= self.max_age_sec and (self._is_unused(ownership)
+                                                              or ownership.status in STATUSES_DELIVERY_PENDING):
+                evicted.append(result)
+            else:
+                kept.append(result)
+        if self.max_bytes <= 0:
+            return evicted
+        total_bytes = sum(result.size for result in kept)
+        for result in sorted(kept, key=lambda r: r.modified):
+            if total_bytes <= self.max_bytes:
+                break
+            if not self._is_unused(ownerships.get(result.order_id)):
+                continue
+            evicted.append(result)
+            total_bytes -= result.size
+        return evicted
+
+    def sweep(self, orders: OrdersCRUD) -> list[int]:
+        """Removes the results of the orders that don't need them anymore, then evicts. Returns their order ids."""
+        results = self.get_results()
+        ownerships = orders.get_order_ownerships([result.order_id for result in results])
+        removed_order_ids = []
+        for result in results:
+            ownership = ownerships.get(result.order_id)
+            if ownership is None or ownership.status in STATUSES_FINISHED:
+                self._remove(result)
+                removed_order_ids.append(result.order_id)
+        return removed_order_ids + self.evict(orders)
+
+    @staticmethod
+    def _is_unused(ownership: Optional[OrderOwnership]) -> bool:
+        """Whether nobody is waiting for the result: the order is removed, finished or configured again."""
+        if ownership is None or ownership.status in STATUSES_FINISHED:
+            return True
+        return (ownership.status in STATUSES_CONFIGURING
+                and ownership.speculative_build_status != SpeculativeBuildStatus.building)
+
+    @staticmethod
+    def _release(orders: OrdersCRUD, ownership: Optional[OrderOwnership]) -> bool:
+        """Detaches the result from its order. Returns False if the order has changed since it was loaded."""
+        if ownership is None or ownership.status in STATUSES_FINISHED:
+            return True
+        if ownership.status in STATUSES_DELIVERY_PENDING:
+            failed_status = get_next_status(Order(id=ownership.id, status=ownership.status), "fail")
+            return DeliveriesCRUD(orders.session).fail_delivery(ownership.id, ownership.status, failed_status)
+        if ownership.speculative_build_status == SpeculativeBuildStatus.built:
+            return orders.replace_speculative_build_status(ownership.id, SpeculativeBuildStatus.built, None)
+        return True
+
+    @staticmethod
+    def _remove(result: BuildResult):
+        shutil.rmtree(result.path, ignore_errors=True)
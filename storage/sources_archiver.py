@@ -0,0 +1,275 @@
+import io
+import json
+import os
+import struct
+import zipfile
+from contextlib import ExitStack
+from typing import Iterator, Optional
+
+# Paths relative to the repo root that must not get to the users.
+EXCLUDED_PATHS = {
+    ".git",
+    "TMessagesProj/config/release.keystore",
+}
+# Files that are already compressed are stored as is, compressing them again only takes time.
+STORED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".jar", ".aar", ".apk", ".zip", ".gz", ".tgs",
+                     ".mp3", ".mp4", ".ogg", ".webm", ".woff", ".woff2"}
+READ_CHUNK_SIZE = 1024 * 1024
+# General purpose flag of the entries whose sizes and crc follow the data instead of the local header.
+DATA_DESCRIPTOR_FLAG = 0x08
+# General purpose flag of the entries with UTF-8 names.
+UTF8_FLAG = 0x800
+LOCAL_HEADER_SIGNATURE = 0x04034b50
+CENTRAL_HEADER_SIGNATURE = 0x02014b50
+END_SIGNATURE = 0x06054b50
+ZIP64_END_SIGNATURE = 0x06064b50
+ZIP64_END_LOCATOR_SIGNATURE = 0x07064b50
+ZIP64_EXTRA_ID = 0x0001
+ZIP64_VERSION = 45
+# Sizes, offsets and counts from these values on are stored in the zip64 fields.
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_ENTRY_COUNT_LIMIT = 0xFFFF
+# Base archives of older commits are removed when a new one is written.
+MAX_BASE_ARCHIVES = 2
+# Entry of a delta archive with the commit of its base archive and the removed files.
+DELTA_MANIFEST_NAME = ".sources-delta.json"
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Unseekable zip output. ZipFile writes data descriptors after the entries, so nothing is rewritten later."""
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def pop(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+# Modification time in nanoseconds and size of a file.
+FileStamp = tuple[int, int]
+
+
+def iter_sources_zip(sources_dir: str) -> Iterator[bytes]:
+    """Yields the zip archive of the sources while it is being written, without a temporary archive on the disk."""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for path, arcname in iter_source_files(sources_dir):
+            if os.path.isdir(path):
+                archive.write(path, arcname)
+            else:
+                yield from _write_file(archive, buffer, path, arcname)
+            yield from _pop_chunk(buffer)
+    yield from _pop_chunk(buffer)
+
+
+def iter_sources_delta_zip(sources_dir: str, pristine_files: dict[str, FileStamp], repo_commit: str
+                           ) -> Iterator[bytes]:
+    """Yields the archive of the files that differ from the base archive of the commit.
+
+    The files that still have the stamps from `pristine_files` are left out. The removed files are listed in the
+    manifest, see assemble_sources_zip.
+    """
+    buffer = _StreamBuffer()
+    arcnames = set()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for path, arcname in iter_source_files(sources_dir):
+            arcnames.add(arcname)
+            stat = os.stat(path)
+            if pristine_files.get(arcname) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            if os.path.isdir(path):
+                archive.write(path, arcname)
+            else:
+                yield from _write_file(archive, buffer, path, arcname)
+            yield from _pop_chunk(buffer)
+        manifest = {"repo_commit": repo_commit, "removed": sorted(pristine_files.keys() - arcnames)}
+        archive.writestr(DELTA_MANIFEST_NAME, json.dumps(manifest))
+    yield from _pop_chunk(buffer)
+
+
+def read_delta_manifest(delta_archive_path: str) -> dict:
+    with zipfile.ZipFile(delta_archive_path) as delta_archive:
+        return json.loads(delta_archive.read(DELTA_MANIFEST_NAME))
+
+
+def assemble_sources_zip(base_archive_path: str, delta_archive_path: str, output_path: str):
+    """Writes the archive of the order sources from the base archive of the commit and the order delta.
+
+    The compressed data of the entries is copied as is, nothing is compressed again.
+    """
+    with ExitStack() as stack:
+        base_archive = stack.enter_context(zipfile.ZipFile(base_archive_path))
+        base_file = stack.enter_context(open(base_archive_path, "rb"))
+        delta_archive = stack.enter_context(zipfile.ZipFile(delta_archive_path))
+        delta_file = stack.enter_context(open(delta_archive_path, "rb"))
+        archive = _RawZipWriter(stack.enter_context(open(output_path, "wb")))
+        manifest = json.loads(delta_archive.read(DELTA_MANIFEST_NAME))
+        delta_infos = [info for info in delta_archive.infolist() if info.filename != DELTA_MANIFEST_NAME]
+        replaced_names = {info.filename for info in delta_infos} | set(manifest["removed"])
+        for info in base_archive.infolist():
+            if info.filename not in replaced_names:
+                archive.copy_entry(base_file, info)
+        for info in delta_infos:
+            archive.copy_entry(delta_file, info)
+        archive.write_central_directory()
+
+
+def write_base_archive(sources_dir: str, base_archive_path: str):
+    """Writes the archive of the unmodified sources that is uploaded to the controller once per commit."""
+    os.makedirs(os.path.dirname(base_archive_path), exist_ok=True)
+    temp_path = base_archive_path + ".part"
+    with open(temp_path, "wb") as file:
+        for chunk in iter_sources_zip(sources_dir):
+            file.write(chunk)
+    os.replace(temp_path, base_archive_path)
+    remove_old_base_archives(os.path.dirname(base_archive_path))
+
+
+def make_file_stamps(sources_dir: str) -> dict[str, FileStamp]:
+    """Returns the stamps of the files to archive. Files that are rewritten later get different stamps."""
+    stamps = {}
+    for path, arcname in iter_source_files(sources_dir):
+        stat = os.stat(path)
+        stamps[arcname] = (stat.st_mtime_ns, stat.st_size)
+    return stamps
+
+
+def remove_old_base_archives(base_archives_dir: str):
+    paths = [os.path.join(base_archives_dir, name) for name in os.listdir(base_archives_dir) if name.endswith(".zip")]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[MAX_BASE_ARCHIVES:]:
+        os.remove(path)
+
+
+class _RawZipWriter:
+    """Writes a zip archive of entries copied from other archives without decompressing them.
+
+    ZipFile has no public API for raw entries, so the headers are written here. The zip64 fields of the source
+    entries are dropped and written again only where the new sizes or offsets need them.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.entries: list[tuple[zipfile.ZipInfo, int]] = []
+
+    def copy_entry(self, source_file, source_info: zipfile.ZipInfo):
+        source_file.seek(source_info.header_offset)
+        local_header = source_file.read(zipfile.sizeFileHeader)
+        name_length, extra_length = struct.unpack("<2H", local_header[26:30])
+        source_file.seek(name_length + extra_length, os.SEEK_CUR)
+
+        header_offset = self.file.tell()
+        self.entries.append((source_info, header_offset))
+        zip64_fields = []
+        if source_info.file_size >= ZIP64_LIMIT or source_info.compress_size >= ZIP64_LIMIT:
+            zip64_fields = [source_info.file_size, source_info.compress_size]
+        self.file.write(self._make_header(LOCAL_HEADER_SIGNATURE, source_info, zip64_fields))
+        remaining_size = source_info.compress_size
+        while remaining_size > 0:
+            chunk = source_file.read(min(READ_CHUNK_SIZE, remaining_size))
+            if not chunk:
+                raise EOFError(f"The archive is truncated at {source_info.filename}")
+            self.file.write(chunk)
+            remaining_size -= len(chunk)
+
+    def write_central_directory(self):
+        central_directory_offset = self.file.tell()
+        for info, header_offset in self.entries:
+            zip64_fields = [value for value in (info.file_size, info.compress_size, header_offset)
+                            if value >= ZIP64_LIMIT]
+            self.file.write(self._make_header(CENTRAL_HEADER_SIGNATURE, info, zip64_fields, header_offset))
+        central_directory_size = self.file.tell() - central_directory_offset
+        entry_count = len(self.entries)
+        if (entry_count >= ZIP64_ENTRY_COUNT_LIMIT or central_directory_offset >= ZIP64_LIMIT
+                or central_directory_size >= ZIP64_LIMIT):
+            zip64_end_offset = self.file.tell()
+            self.file.write(struct.pack("<IQ2H2I4Q", ZIP64_END_SIGNATURE, 44, ZIP64_VERSION, ZIP64_VERSION, 0, 0,
+                                        entry_count, entry_count, central_directory_size, central_directory_offset))
+            self.file.write(struct.pack("<2IQI", ZIP64_END_LOCATOR_SIGNATURE, 0, zip64_end_offset, 1))
+            entry_count = min(entry_count, ZIP64_ENTRY_COUNT_LIMIT)
+            central_directory_size = min(central_directory_size, ZIP64_LIMIT)
+            central_directory_offset = min(central_directory_offset, ZIP64_LIMIT)
+        self.file.write(struct.pack("<I4H2IH", END_SIGNATURE, 0, 0, entry_count, entry_count,
+                                    central_directory_size, central_directory_offset, 0))
+
+    @staticmethod
+    def _make_header(signature: int, info: zipfile.ZipInfo, zip64_fields: list[int],
+                     header_offset: Optional[int] = None) -> bytes:
+        """Returns the local header, or the central directory header if `header_offset` is given."""
+        name = info.filename.encode("utf-8" if info.flag_bits & UTF8_FLAG else "cp437")
+        extra = _strip_zip64_extra(info.extra)
+        version = info.extract_version
+        if zip64_fields:
+            extra = struct.pack(f"<2H{len(zip64_fields)}Q", ZIP64_EXTRA_ID, 8 * len(zip64_fields), *zip64_fields) + extra
+            version = max(version, ZIP64_VERSION)
+        year, month, day, hour, minute, second = info.date_time
+        dos_date = (year - 1980) << 9 | month << 5 | day
+        dos_time = hour << 11 | minute << 5 | second // 2
+        # The sizes are known, so they are written to the headers instead of a data descriptor.
+        flag_bits = info.flag_bits & ~DATA_DESCRIPTOR_FLAG
+        file_size = min(info.file_size, ZIP64_LIMIT) if zip64_fields else info.file_size
+        compress_size = min(info.compress_size, ZIP64_LIMIT) if zip64_fields else info.compress_size
+        if header_offset is None:
+            return struct.pack("<I5H3I2H", signature, version, flag_bits, info.compress_type, dos_time, dos_date,
+                               info.CRC, compress_size, file_size, len(name), len(extra)) + name + extra
+        return struct.pack("<I6H3I5HII", signature, info.create_system << 8 | info.create_version, version,
+                           flag_bits, info.compress_type, dos_time, dos_date, info.CRC, compress_size, file_size,
+                           len(name), len(extra), len(info.comment), 0, info.internal_attr, info.external_attr,
+                           min(header_offset, ZIP64_LIMIT)) + name + extra + info.comment
+
+
+def _strip_zip64_extra(extra: bytes) -> bytes:
+    fields = []
+    position = 0
+    while position + 4 <= len(extra):
+        field_id, field_size = struct.unpack("<2H", extra[position:position + 4])
+        if field_id != ZIP64_EXTRA_ID:
+            fields.append(extra[position:position + 4 + field_size])
+        position += 4 + field_size
+    return b"".join(fields)
+
+
+def _pop_chunk(buffer: _StreamBuffer) -> Iterator[bytes]:
+    # An empty chunk would end a chunked request body.
+    if chunk := buffer.pop():
+        yield chunk
+
+
+def iter_source_files(sources_dir: str) -> Iterator[tuple[str, str]]:
+    """Yields the paths and the archive names of the dirs and the files to archive."""
+    for dir_path, dir_names, file_names in os.walk(sources_dir):
+        dir_names.sort()
+        dir_names[:] = [name for name in dir_names
+                        if _make_arcname(sources_dir, os.path.join(dir_path, name)) not in EXCLUDED_PATHS]
+        if dir_path != sources_dir:
+            yield dir_path, _make_arcname(sources_dir, dir_path)
+        for name in sorted(file_names):
+            path = os.path.join(dir_path, name)
+            arcname = _make_arcname(sources_dir, path)
+            if arcname not in EXCLUDED_PATHS and os.path.isfile(path):
+                yield path, arcname
+
+
+def _make_arcname(sources_dir: str, path: str) -> str:
+    return os.path.relpath(path, sources_dir).replace(os.sep, "/")
+
+
+def _write_file(archive: zipfile.ZipFile, buffer: _StreamBuffer, path: str, arcname: str) -> Iterator[bytes]:
+    info = zipfile.ZipInfo.from_file(path, arcname)
+    if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS:
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = zipfile.ZIP_DEFLATED
+    with open(path, "rb") as source, archive.open(info, "w") as entry:
+        while chunk := source.read(READ_CHUNK_SIZE):
+            entry.write(chunk)
+            yield from _pop_chunk(buffer)
@@ -0,0 +1,83 @@
+import os
+import re
+import uuid
+
+from storage.sources_archiver import assemble_sources_zip, read_delta_manifest
+
+REPO_COMMIT_PATTERN = re.compile(r"[0-9a-f]{40,64}")
+# Orders are sent right after they are built, so only the bases of the latest commits are needed.
+MAX_SOURCES_BASES = 5
+
+
+class SourcesBases:
+    """Archives of the unmodified sources per upstream commit, shared by the controller processes.
+
+    Workers upload the base archive of a commit once and then send only the files that differ from it for every
+    sources only order. The archive for the user is assembled from the base and the order delta right after the
+    upload, so the base may be evicted before the archive is sent.
+    The modification time of a base is updated every time a worker uses it, and only `max_count` most recently used
+    bases are kept.
+    """
+
+    DELTA_FILENAME = "sources_delta.zip"
+    SOURCES_FILENAME = "sources.zip"
+
+    def __init__(self, bases_dir: str, max_count: int = MAX_SOURCES_BASES):
+        self.bases_dir = bases_dir
+        self.max_count = max_count
+
+    @staticmethod
+    def is_valid_commit(repo_commit: str) -> bool:
+        return REPO_COMMIT_PATTERN.fullmatch(repo_commit) is not None
+
+    def has(self, repo_commit: str) -> bool:
+        try:
+            os.utime(self._make_path(repo_commit))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def make_temp_path(self) -> str:
+        os.makedirs(self.bases_dir, exist_ok=True)
+        return os.path.join(self.bases_dir, f"{uuid.uuid4().hex}.part")
+
+    def put(self, repo_commit: str, temp_path: str):
+        os.replace(temp_path, self._make_path(repo_commit))
+        self.evict()
+
+    def assemble(self, build_result_dir: str, repo_commit: str) -> str:
+        """Returns the path of the sources archive of the order assembled from the delta against `repo_commit`.
+
+        Raises ValueError if the delta was made against another commit.
+        """
+        sources_path = os.path.join(build_result_dir, self.SOURCES_FILENAME)
+        delta_path = os.path.join(build_result_dir, self.DELTA_FILENAME)
+        delta_repo_commit = read_delta_manifest(delta_path)["repo_commit"]
+        if delta_repo_commit != repo_commit:
+            raise ValueError(f"The delta is made against commit {delta_repo_commit}, not {repo_commit}")
+        base_path = self._make_path(repo_commit)
+        temp_path = sources_path + ".part"
+        assemble_sources_zip(base_path, delta_path, temp_path)
+        os.replace(temp_path, sources_path)
+        os.remove(delta_path)
+        return sources_path
+
+    def evict(self):
+        entries: list[tuple[float, str]] = []
+        for name in os.listdir(self.bases_dir):
+            if not name.endswith(".zip"):
+                continue
+            path = os.path.join(self.bases_dir, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except FileNotFoundError:
+                pass
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_count:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _make_path(self, repo_commit: str) -> str:
+        return os.path.join(self.bases_dir, f"{repo_commit}.zip")
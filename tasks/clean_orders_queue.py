@@ -4,27 +4,31 @@ from datetime import datetime, timedelta
 import pytz
 
 import config
+import utils
+from crud.build_phase_events_crud import BuildPhaseEventsCRUD
+from crud.build_timings_crud import BuildTimingsCRUD
 from crud.user_build_stats_crud import UserBuildStatsCRUD
+from crud.user_id_hashes_crud import UserIdHashesCRUD
 from db import engine
 from crud.orders_crud import OrdersCRUD
 from schemas.order_status import OrderStatus, get_next_status
 from crud.workers_crud import WorkersCRUD
+from storage.build_result_store import BuildResultStore
 
 
 def fail_stuck_builds(orders: OrdersCRUD):
     # If the bot was stopped during building, the order may get stuck.
-    # So after restart we must reset status to build the order or send the apk again.
+    # So after restart we must reset status to build the order again. Sending is resumed by DeliveryQueue.
     stuck_statuses = [
         OrderStatus.build_started,
         OrderStatus.building,
-        OrderStatus.sending_apk,
     ]
     for status in stuck_statuses:
         for order in orders.get_orders_by_status(status):
             print(f"Cleaning building status for order {order.id}")
             order.worker_id = None
             order.status = get_next_status(order, "repeat")
-            orders.update_order(order)
+            orders.update_order_build_state(order)
 
 
 def delete_finished_orders(orders: OrdersCRUD):
@@ -41,7 +45,16 @@ def reset_build_status_for_offline_workers(orders: OrdersCRUD):
             print(f"Worker {worker.id} is offline for order {order.id}", datetime.now() - worker.last_online_date)
             order.status = get_next_status(order, "repeat")
             order.worker_id = None
-            orders.update_order(order)
+            orders.update_order_build_state(order)
+
+
+def reset_speculative_builds_for_offline_workers(orders: OrdersCRUD):
+    workers = WorkersCRUD(orders.session)
+    for order in orders.get_speculative_builds_in_progress():
+        worker = workers.get_worker(order.worker_id) if order.worker_id is not None else None
+        if worker is None or datetime.now() - worker.last_online_date > timedelta(seconds=config.CONSIDER_WORKER_OFFLINE_AFTER_SEC):
+            print(f"Resetting speculative build for order {order.id}")
+            orders.reset_speculative_build(order.id, order.worker_id)
 
 
 def delete_old_user_build_stats(user_build_stats_crud: UserBuildStatsCRUD):
@@ -49,14 +62,42 @@ def delete_old_user_build_stats(user_build_stats_crud: UserBuildStatsCRUD):
     user_build_stats_crud.remove_old_user_build_stats(before_date)
 
 
+def delete_old_user_id_hashes(user_id_hashes_crud: UserIdHashesCRUD):
+    before_date = (datetime.now() - timedelta(seconds=config.USER_ID_HASH_CACHE_TTL_SEC)).astimezone(pytz.utc)
+    user_id_hashes_crud.remove_old_user_id_hashes(before_date)
+
+
+def delete_old_build_timings(build_timings: BuildTimingsCRUD, build_phase_events: BuildPhaseEventsCRUD):
+    before_date = utils.utc_now() - timedelta(seconds=config.DELETE_BUILD_TIMINGS_AFTER_SEC)
+    build_timings.remove_old_build_timings(before_date)
+    build_phase_events.remove_old_events(before_date)
+
+
+def sweep_build_results(build_result_store: BuildResultStore, orders: OrdersCRUD):
+    for order_id in build_result_store.sweep(orders):
+        print(f"Removed build result of order {order_id}")
+
+
 def main():
     print("Clean process started")
     orders = OrdersCRUD(engine)
     user_build_stats_crud = UserBuildStatsCRUD(engine)
+    user_id_hashes_crud = UserIdHashesCRUD(engine)
+    build_timings = BuildTimingsCRUD(engine)
+    build_phase_events = BuildPhaseEventsCRUD(engine)
+    build_result_store = BuildResultStore(utils.make_build_results_dir_path(), config.BUILD_RESULT_MAX_BYTES,
+                                          config.BUILD_RESULT_MAX_AGE_SEC)
+    last_build_results_sweep_time = 0.0
     fail_stuck_builds(orders)
     while True:
         reset_build_status_for_offline_workers(orders)
+        reset_speculative_builds_for_offline_workers(orders)
         delete_old_user_build_stats(user_build_stats_crud)
+        delete_old_user_id_hashes(user_id_hashes_crud)
+        delete_old_build_timings(build_timings, build_phase_events)
+        if time.monotonic() - last_build_results_sweep_time >= config.BUILD_RESULT_SWEEP_INTERVAL_SEC:
+            sweep_build_results(build_result_store, orders)
+            last_build_results_sweep_time = time.monotonic()
         time.sleep(1)
 
 
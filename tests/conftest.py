@@ -1,7 +1,12 @@
+import os
+
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 
+# The bot and the controller don't start without the salt, and the modules create the hasher on import.
+os.environ.setdefault("USER_ID_HASH_SALT", "test_user_id_hash_salt")
+
 import config
 from models import Base
 
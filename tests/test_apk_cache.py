@@ -0,0 +1,43 @@
+import os
+import time
+
+from models import Order
+from web.apk_cache import ApkCache
+
+
+def make_apk(tmp_path, name: str, size: int) -> str:
+    path = os.path.join(tmp_path, name)
+    with open(path, "wb") as file:
+        file.write(b"a" * size)
+    return path
+
+
+def test_cache_key_does_not_depend_on_order_id():
+    order = Order(id=1, app_name="App", app_id="org.some.app", app_icon=b"icon", app_notification_icon=b"icon",
+                  keystore=b"keystore")
+    same_order = Order(id=2, app_name="App", app_id="org.some.app", app_icon=b"icon", app_notification_icon=b"icon",
+                       keystore=b"keystore")
+    assert ApkCache.make_key(order, "commit") == ApkCache.make_key(same_order, "commit")
+    assert ApkCache.make_key(order, "commit") != ApkCache.make_key(order, "other commit")
+
+
+def test_least_recently_used_apks_are_evicted(tmp_path):
+    cache = ApkCache(os.path.join(tmp_path, "cache"), max_bytes=250, ttl_sec=3600)
+    cache.put("a", make_apk(tmp_path, "a.apk", 100))
+    cache.put("b", make_apk(tmp_path, "b.apk", 100))
+    os.utime(os.path.join(cache.cache_dir, "a.apk"), (time.time() - 10, time.time()))
+    os.utime(os.path.join(cache.cache_dir, "b.apk"), (time.time() - 20, time.time()))
+    assert cache.copy_to("b", os.path.join(tmp_path, "result", "b.apk"))
+
+    cache.put("c", make_apk(tmp_path, "c.apk", 100))
+
+    assert not cache.copy_to("a", os.path.join(tmp_path, "result", "a.apk"))
+    assert cache.copy_to("b", os.path.join(tmp_path, "result", "b2.apk"))
+    assert cache.copy_to("c", os.path.join(tmp_path, "result", "c.apk"))
+
+
+def test_expired_apks_are_not_used(tmp_path):
+    cache = ApkCache(os.path.join(tmp_path, "cache"), max_bytes=1000, ttl_sec=60)
+    cache.put("a", make_apk(tmp_path, "a.apk", 100))
+    os.utime(os.path.join(cache.cache_dir, "a.apk"), (time.time(), time.time() - 61))
+    assert not cache.copy_to("a", os.path.join(tmp_path, "result", "a.apk"))
@@ -0,0 +1,45 @@
+import threading
+import time
+
+import config
+from models import Order
+from schemas.build_phase import BuildPhase
+from schemas.order_status import OrderStatus
+from worker.application_builder import ApplicationBuilder
+
+
+class FakeControllerApi:
+    def __init__(self):
+        self.sent_results = []
+        self.phases = []
+
+    def send_order_phase(self, order: Order, phase: str):
+        self.phases.append(phase)
+
+    def send_order_completed(self, order: Order, phase_durations: dict[str, float]):
+        self.sent_results.append("completed")
+
+    def send_order_failed(self, exception_text: str, phase_durations: dict[str, float]):
+        self.sent_results.append("failed")
+
+
+def test_cancelled_build_is_stopped_without_sending_result(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "MOCK_BUILD", True)
+    monkeypatch.setattr(config, "TMP_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "BUILD_LOGS_DIR", str(tmp_path / "build_logs"))
+    order = Order(id=1, status=OrderStatus.build_started, app_name="App", app_id="org.some.app", build_attempts=0)
+    controller_api = FakeControllerApi()
+    builder = ApplicationBuilder(controller_api, None, order)
+    thread = threading.Thread(target=builder.build)
+    start_time = time.monotonic()
+    thread.start()
+    while BuildPhase.gradle_assemble not in controller_api.phases:
+        time.sleep(0.01)
+
+    builder.cancel()
+    thread.join()
+
+    assert time.monotonic() - start_time < 5 # The mock build takes 10 seconds.
+    assert controller_api.sent_results == []
+    assert controller_api.phases == [BuildPhase.docker_build, BuildPhase.gradle_assemble]
+    assert not (tmp_path / "orders" / "1").exists()
@@ -0,0 +1,20 @@
+import config
+from worker import build_log
+from worker.build_log import BuildLog, read_build_log
+
+
+def test_build_log_keeps_tail_and_rotates(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "BUILD_LOGS_DIR", str(tmp_path))
+    monkeypatch.setattr(build_log, "LOG_FILE_MAX_BYTES", 100)
+    monkeypatch.setattr(build_log, "LOG_BACKUP_COUNT", 1)
+    log = BuildLog(1)
+    lines = [f"line {i:03}\n" for i in range(200)]
+    for line in lines:
+        log.write_line(line)
+    log.close()
+
+    assert log.get_tail() == "".join(lines[-build_log.LOG_TAIL_LINES:])
+    # Only the current file and one backup are kept.
+    full_log = list(read_build_log(1))
+    assert full_log == lines[-len(full_log):]
+    assert len(full_log) <= 2 * 100 // len(lines[0])
@@ -0,0 +1,21 @@
+from datetime import datetime, timedelta
+
+from crud.build_phase_events_crud import BuildPhaseEventsCRUD
+from schemas.build_phase import BuildPhase
+
+START = datetime(2025, 1, 1)
+
+
+def test_build_phase_durations(session):
+    build_phase_events = BuildPhaseEventsCRUD(session)
+    for order_id, gradle_min in [(1, 10), (2, 20), (3, 30)]:
+        build_phase_events.add_event(order_id, BuildPhase.repo_sync, START)
+        build_phase_events.add_event(order_id, BuildPhase.gradle_assemble, START + timedelta(minutes=1))
+        build_phase_events.add_event(order_id, BuildPhase.upload, START + timedelta(minutes=1 + gradle_min))
+    # The failed attempt is retried much later, which is not a part of the phase.
+    build_phase_events.add_event(4, BuildPhase.repo_sync, START)
+    build_phase_events.add_event(4, BuildPhase.repo_sync, START + timedelta(hours=5))
+
+    durations = build_phase_events.get_median_phase_durations(START)
+    assert durations == {BuildPhase.repo_sync: 60, BuildPhase.gradle_assemble: 20 * 60}
+    assert build_phase_events.get_current_phases([1, 4, 5]) == {1: BuildPhase.upload, 4: BuildPhase.repo_sync}
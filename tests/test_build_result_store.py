@@ -0,0 +1,56 @@
+import os
+import time
+
+from crud.orders_crud import OrderOwnership
+from schemas.order_status import OrderStatus
+from storage.build_result_store import BuildResultStore, BuildResultUsage
+
+
+def make_result(store: BuildResultStore, order_id: int, size: int, age_sec: float):
+    path = os.path.join(store.root_dir, str(order_id), "app.apk")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(b"a" * size)
+    modified = time.time() - age_sec
+    os.utime(path, (modified, modified))
+    os.utime(os.path.dirname(path), (modified, modified))
+
+
+def make_ownership(order_id: int, status: OrderStatus) -> OrderOwnership:
+    return OrderOwnership(order_id, status, None, False, None)
+
+
+def get_evicted_order_ids(store: BuildResultStore, ownerships: dict[int, OrderOwnership]):
+    results = store.get_evicted_results(store.get_results(), ownerships, time.time())
+    return sorted(result.order_id for result in results)
+
+
+def test_expired_and_least_recently_written_results_are_evicted(tmp_path):
+    store = BuildResultStore(os.path.join(tmp_path, "build_result"), max_bytes=250, max_age_sec=3600)
+    make_result(store, 1, 100, age_sec=7200)
+    make_result(store, 2, 100, age_sec=30)
+    make_result(store, 3, 100, age_sec=20)
+    make_result(store, 4, 100, age_sec=10)
+    assert store.get_usage() == BuildResultUsage(4, 400)
+
+    assert get_evicted_order_ids(store, {}) == [1, 2]
+
+
+def test_results_waiting_for_delivery_are_evicted_only_when_expired(tmp_path):
+    store = BuildResultStore(os.path.join(tmp_path, "build_result"), max_bytes=150, max_age_sec=3600)
+    make_result(store, 1, 100, age_sec=7200)
+    make_result(store, 2, 100, age_sec=30)
+    make_result(store, 3, 100, age_sec=20)
+    ownerships = {
+        1: make_ownership(1, OrderStatus.sending_apk),
+        2: make_ownership(2, OrderStatus.built),
+        3: make_ownership(3, OrderStatus.building),
+    }
+    assert get_evicted_order_ids(store, ownerships) == [1]
+
+
+def test_hard_links_are_counted_once(tmp_path):
+    store = BuildResultStore(os.path.join(tmp_path, "build_result"), max_bytes=0, max_age_sec=3600)
+    make_result(store, 1, 100, age_sec=0)
+    os.link(os.path.join(store.root_dir, "1", "app.apk"), os.path.join(store.root_dir, "1", "App.apk"))
+    assert store.get_usage() == BuildResultUsage(1, 100)
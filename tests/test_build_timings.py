@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta
+
+from crud.build_timings_crud import BuildTimingsCRUD
+
+START = datetime(2025, 1, 1)
+
+
+def test_build_timing_stats(session):
+    build_timings = BuildTimingsCRUD(session)
+    for order_id, build_min in [(1, 10), (2, 20), (3, 30)]:
+        claimed_date = START + timedelta(minutes=order_id)
+        completed_date = claimed_date + timedelta(minutes=build_min)
+        build_timings.add_claimed_build(order_id, None, START, claimed_date)
+        build_timings.set_build_completed(order_id, True, completed_date, upload_duration_sec=6)
+        build_timings.set_build_sent(order_id, completed_date + timedelta(minutes=1))
+    # A stuck attempt of the failed order is never completed and doesn't affect its next attempt.
+    build_timings.add_claimed_build(4, None, START, START)
+    build_timings.add_claimed_build(4, None, START, START + timedelta(minutes=1))
+    build_timings.set_build_completed(4, False, START + timedelta(minutes=2))
+
+    stats = build_timings.get_build_timing_stats(START)
+    assert stats.build_count == 4
+    assert stats.failed_build_count == 1
+    assert stats.median_build_sec == 20 * 60
+    assert stats.median_upload_sec == 6
+    assert stats.median_send_sec == 60
+    assert build_timings.get_median_build_duration(sample_size=2) == 25 * 60
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+from crud.deliveries_crud import DeliveriesCRUD, PendingDelivery
+from crud.orders_crud import OrdersCRUD
+from schemas.order_status import OrderStatus
+
+NOW = datetime(2025, 1, 1)
+
+
+def test_due_deliveries(session):
+    orders = OrdersCRUD(session)
+    deliveries = DeliveriesCRUD(session)
+    first_order_id = orders.create_order(1, 1)
+    second_order_id = orders.create_order(2, 1)
+    deliveries.add_delivery(first_order_id, NOW)
+    deliveries.add_delivery(first_order_id, NOW + timedelta(hours=1))
+    deliveries.add_delivery(second_order_id, NOW)
+    deliveries.set_failed_attempt(second_order_id, 1, NOW + timedelta(minutes=1))
+
+    assert deliveries.get_due_deliveries(NOW, [], 10) == [PendingDelivery(first_order_id, 0)]
+    assert deliveries.get_due_deliveries(NOW, [first_order_id], 10) == []
+    assert deliveries.get_due_deliveries(NOW + timedelta(minutes=1), [], 1) == [PendingDelivery(first_order_id, 0)]
+
+    orders.remove_order(first_order_id)
+    assert deliveries.get_due_deliveries(NOW + timedelta(minutes=1), [], 10) == [PendingDelivery(second_order_id, 1)]
+
+
+def test_fail_delivery(session):
+    orders = OrdersCRUD(session)
+    deliveries = DeliveriesCRUD(session)
+    order_id = orders.create_order(1, 1)
+    orders.update_order_status(orders.get_order(order_id), OrderStatus.sending_apk)
+    deliveries.add_delivery(order_id, NOW)
+
+    assert not deliveries.fail_delivery(order_id, OrderStatus.built, OrderStatus.failed)
+    assert deliveries.get_due_deliveries(NOW, [], 10) == [PendingDelivery(order_id, 0)]
+
+    assert deliveries.fail_delivery(order_id, OrderStatus.sending_apk, OrderStatus.failed)
+    assert orders.get_order(order_id).status == OrderStatus.failed
+    assert deliveries.get_due_deliveries(NOW, [], 10) == []
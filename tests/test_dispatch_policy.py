@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+
+from crud.orders_crud import OrdersCRUD, QueuedOrder
+from models import Order
+from scheduling.dispatch_policy import AgingPolicy, FifoPolicy, StrictPriorityPolicy, WeightedWaitPolicy
+from scheduling.simulation import make_arrival_trace, simulate
+from schemas.order_status import OrderStatus
+
+START = datetime(2025, 1, 1)
+
+
+def make_queue() -> list[QueuedOrder]:
+    return [
+        QueuedOrder(1, 3, START),
+        QueuedOrder(2, 1, START + timedelta(minutes=5)),
+        QueuedOrder(3, 2, START + timedelta(minutes=10)),
+    ]
+
+
+def get_ids(queue: list[QueuedOrder]) -> list[int]:
+    return [order.id for order in queue]
+
+
+def test_strict_priority_policy():
+    assert get_ids(StrictPriorityPolicy().sort_queue(make_queue(), START + timedelta(minutes=30))) == [2, 3, 1]
+
+
+def test_aging_policy():
+    policy = AgingPolicy(timedelta(minutes=10))
+    # Keys: 1 -> 20 min, 2 -> 5 min, 3 -> 20 min.
+    assert get_ids(policy.sort_queue(make_queue(), START + timedelta(minutes=30))) == [2, 1, 3]
+
+
+def test_weighted_wait_policy():
+    policy = WeightedWaitPolicy()
+    # Weighted waits: 1 -> 10 min, 2 -> 25 min, 3 -> 10 min.
+    assert get_ids(policy.sort_queue(make_queue(), START + timedelta(minutes=30))) == [2, 1, 3]
+    # Weighted waits: 1 -> 100 min, 2 -> 295 min, 3 -> 145 min.
+    assert get_ids(policy.sort_queue(make_queue(), START + timedelta(minutes=300))) == [2, 3, 1]
+
+
+@pytest.mark.parametrize("policy", [FifoPolicy(), StrictPriorityPolicy(), AgingPolicy(timedelta(minutes=10)),
+                                    WeightedWaitPolicy()])
+def test_order_by_matches_sort_key(session, policy):
+    orders = OrdersCRUD(session)
+    for order in make_queue():
+        order_id = orders.create_order(order.id, order.priority)
+        session.execute(
+            sa.update(Order).values({Order.status: OrderStatus.queued, Order.record_created: order.record_created})
+            .where(Order.id == order_id)
+        )
+    for now in [START + timedelta(minutes=30), START + timedelta(minutes=300)]:
+        queue = orders.get_build_queue()
+        first_order = orders.get_first_queued_order(OrdersCRUD.make_build_queue_query(), policy.make_order_by(now))
+        assert first_order.id == policy.sort_queue(queue, now)[0].id
+
+
+def test_aging_bounds_low_priority_wait():
+    trace = make_arrival_trace(arrivals_per_hour=22, hours=24, mean_build_min=5, seed=0)
+    strict_waits = simulate(StrictPriorityPolicy(), trace, worker_count=2)
+    aging_waits = simulate(AgingPolicy(timedelta(minutes=10)), trace, worker_count=2)
+    assert max(aging_waits[4]) < max(strict_waits[4])
+    assert sum(len(waits) for waits in aging_waits.values()) == len(trace)
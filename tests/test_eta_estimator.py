@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from scheduling.eta_estimator import EtaEstimator
+
+
+class FakeBuildTimings:
+    def __init__(self, median_build_duration):
+        self.median_build_duration = median_build_duration
+
+    def get_median_build_duration(self, sample_size):
+        return self.median_build_duration
+
+
+class FakeWorkers:
+    def __init__(self, worker_count):
+        self.worker_count = worker_count
+
+    def get_online_worker_count(self, online_since):
+        return self.worker_count
+
+
+def test_eta_estimator():
+    estimator = EtaEstimator(FakeBuildTimings(600), FakeWorkers(2), worker_offline_after_sec=60)
+    assert estimator.estimate_wait(1) == timedelta(minutes=10)
+    assert estimator.estimate_wait(2) == timedelta(minutes=10)
+    assert estimator.estimate_wait(3) == timedelta(minutes=20)
+    assert estimator.get_builds_per_hour() == 12
+
+
+def test_eta_estimator_without_history():
+    assert EtaEstimator(FakeBuildTimings(None), FakeWorkers(2), 60).estimate_wait(1) is None
+    assert EtaEstimator(FakeBuildTimings(600), FakeWorkers(0), 60).estimate_wait(1) is None
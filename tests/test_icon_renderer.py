@@ -0,0 +1,24 @@
+import io
+
+from PIL import Image
+
+from worker.icon_renderer import DPI_SIZES, IconSetCache
+
+
+def make_icon() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGBA", (512, 512), (255, 0, 0, 255)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_icon_set_is_rendered_once(tmp_path, monkeypatch):
+    cache = IconSetCache(str(tmp_path), ttl_sec=3600)
+    icon_set = cache.get_icon_set(make_icon())
+    for dpi_name, size in DPI_SIZES.items():
+        with Image.open(io.BytesIO(icon_set[dpi_name])) as image:
+            assert image.size == (size, size)
+
+    def fail_render(icon: bytes):
+        raise AssertionError("The cached icon set must be used")
+    monkeypatch.setattr("worker.icon_renderer.render_icon_set", fail_render)
+    assert cache.get_icon_set(make_icon()) == icon_set
@@ -1,4 +1,5 @@
 from crud.orders_crud import OrdersCRUD
+from crud.workers_crud import WorkersCRUD
 from schemas.order_status import OrderStatus
 
 
@@ -24,3 +25,22 @@ def test_create_order(session):
     order_list = list(orders.get_orders_by_status(OrderStatus.built))
     assert len(order_list) == 1
     assert order_list[0].status == OrderStatus.built
+
+
+def test_claim_queued_order(session):
+    orders = OrdersCRUD(session)
+    workers = WorkersCRUD(session)
+    first_worker_id = workers.create_worker("first")
+    second_worker_id = workers.create_worker("second")
+    order_id = orders.create_order(int(1e12), 1)
+    orders.update_order_status(orders.get_order(order_id), OrderStatus.queued)
+
+    first_claim = orders.get_order(order_id)
+    second_claim = orders.get_order(order_id)
+    for order, worker_id in [(first_claim, first_worker_id), (second_claim, second_worker_id)]:
+        order.status = OrderStatus.build_started
+        order.worker_id = worker_id
+
+    assert orders.claim_queued_order(first_claim)
+    assert not orders.claim_queued_order(second_claim)
+    assert orders.get_order(order_id).worker_id == first_worker_id
@@ -0,0 +1,81 @@
+import json
+from datetime import datetime
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from crud.orders_crud import OrdersCRUD
+from models import Order
+from scheduling.dispatch_policy import make_dispatch_policy
+from schemas.order_status import OrderStatus
+
+SEEDED_ORDER_COUNT = 100_000
+
+
+@pytest.fixture(scope="function")
+def seeded_engine(engine):
+    # Most orders are configuring or finished and only a small part of them is queued, like in production.
+    with engine.begin() as connection:
+        connection.execute(
+            sa.text(
+                "INSERT INTO orders (user_id, status, priority, sources_only, record_created) "
+                "SELECT i, "
+                "       CASE WHEN i % 100 = 0 THEN :queued "
+                "            WHEN i % 100 = 1 THEN :update_queued "
+                "            WHEN i % 100 = 2 THEN :get_sources_queued "
+                "            WHEN i % 2 = 0 THEN :finished "
+                "            ELSE :configuring END, "
+                "       1 + i % 5, "
+                "       i % 100 = 2, "
+                "       now() - make_interval(secs => i) "
+                "FROM generate_series(1, :count) AS i"
+            ),
+            {
+                "queued": OrderStatus.queued.value,
+                "update_queued": OrderStatus.update_queued.value,
+                "get_sources_queued": OrderStatus.get_sources_queued.value,
+                "finished": OrderStatus.successfully_finished.value,
+                "configuring": OrderStatus.app_name.value,
+                "count": SEEDED_ORDER_COUNT,
+            }
+        )
+        connection.execute(sa.text("ANALYZE orders"))
+    yield engine
+
+
+def explain(engine, query) -> dict:
+    compiled = query.compile(dialect=postgresql.dialect(), compile_kwargs={"render_postcompile": True})
+    with engine.connect() as connection:
+        result = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    plan = result if isinstance(result, list) else json.loads(result)
+    return plan[0]["Plan"]
+
+
+def find_seq_scans(plan: dict) -> list[str]:
+    seq_scans = []
+    if plan["Node Type"] == "Seq Scan":
+        seq_scans.append(plan["Relation Name"])
+    for sub_plan in plan.get("Plans", []):
+        seq_scans += find_seq_scans(sub_plan)
+    return seq_scans
+
+
+@pytest.mark.parametrize("query_factory", [
+    lambda: OrdersCRUD.make_build_queue_query(),
+    lambda: OrdersCRUD.make_build_queue_query(created_before=datetime.now()),
+    lambda: OrdersCRUD.make_sources_only_queue_query(),
+])
+def test_order_queue_queries_use_indexes(seeded_engine, query_factory):
+    plan = explain(seeded_engine, query_factory())
+    assert "orders" not in find_seq_scans(plan), json.dumps(plan, indent=2)
+
+
+@pytest.mark.parametrize("policy_name", ["fifo", "strict_priority", "aging", "weighted_wait"])
+def test_dispatch_queries_use_indexes(seeded_engine, policy_name):
+    # The query the controller runs on every poll of a worker.
+    order_by = make_dispatch_policy(policy_name, 600).make_order_by(datetime.now())
+    query = (OrdersCRUD.make_build_queue_query(created_before=datetime.now())
+             .with_only_columns(*Order.__table__.c).order_by(None).order_by(*order_by).limit(1))
+    plan = explain(seeded_engine, query)
+    assert "orders" not in find_seq_scans(plan), json.dumps(plan, indent=2)
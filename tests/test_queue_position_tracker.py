@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import Optional
+
+import pytz
+
+from bot.queue_position_tracker import QueuePositionTracker
+from crud.orders_crud import QueuedOrder
+from models import Order
+from schemas.order_status import OrderStatus
+from scheduling.dispatch_policy import FifoPolicy
+from scheduling.order_scheduler import OrderScheduler
+
+
+class FakeOrders:
+    def __init__(self):
+        self.build_queue: list[QueuedOrder] = []
+        self.sources_only_queue: list[QueuedOrder] = []
+        self.load_count = 0
+
+    def get_build_queue(self, created_before: Optional[datetime] = None) -> list[QueuedOrder]:
+        self.load_count += 1
+        return list(self.build_queue)
+
+    def get_sources_only_queue(self) -> list[QueuedOrder]:
+        self.load_count += 1
+        return list(self.sources_only_queue)
+
+
+def make_queued_order(order_id: int) -> QueuedOrder:
+    return QueuedOrder(order_id, 1, datetime(2025, 1, 1, 0, 0, order_id))
+
+
+def make_order(queued_order: QueuedOrder, status: OrderStatus) -> Order:
+    return Order(id=queued_order.id, status=status, priority=queued_order.priority,
+                 record_created=queued_order.record_created)
+
+
+def test_queue_position_tracker():
+    orders = FakeOrders()
+    orders.build_queue = [make_queued_order(i) for i in (1, 2, 3)]
+    tracker = QueuePositionTracker(OrderScheduler(orders, FifoPolicy()))
+
+    assert tracker.get_position(make_order(orders.build_queue[0], OrderStatus.queued)) == 1
+    assert tracker.get_position(make_order(orders.build_queue[2], OrderStatus.update_queued)) == 3
+    assert orders.load_count == 1
+
+    # A new order is inserted into the snapshot without reloading it.
+    order = make_order(make_queued_order(4), OrderStatus.queued)
+    order.record_created = pytz.utc.localize(order.record_created)
+    assert tracker.get_position(order) == 4
+    assert tracker.get_position(make_order(orders.build_queue[2], OrderStatus.queued)) == 3
+    assert orders.load_count == 1
+
+    orders.sources_only_queue = [make_queued_order(5)]
+    assert tracker.get_position(make_order(orders.sources_only_queue[0], OrderStatus.get_sources_queued)) == 1
+
+    # Orders that were already taken by a worker.
+    tracker.invalidate()
+    assert tracker.get_position(make_order(make_queued_order(6), OrderStatus.queued)) is None
+    assert tracker.get_position(make_order(orders.build_queue[0], OrderStatus.build_started)) is None
@@ -0,0 +1,37 @@
+import os
+
+from worker.source_rewriter import SourceRewriter
+
+
+def write_file(path: str, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wt") as file:
+        file.write(content)
+
+
+def read_file(path: str) -> str:
+    with open(path, "rt") as file:
+        return file.read()
+
+
+def test_substitutions_are_applied_in_order(tmp_path):
+    manifest_path = os.path.join(tmp_path, "app", "AndroidManifest.xml")
+    other_manifest_path = os.path.join(tmp_path, "lib", "AndroidManifest.xml")
+    properties_path = os.path.join(tmp_path, "gradle.properties")
+    write_file(manifest_path, '<uses-permission android:name="CAMERA" />\n<application/>\n')
+    write_file(other_manifest_path, '<application/>\n')
+    write_file(properties_path, "APP_NAME=Telegram\n")
+    other_manifest_mtime = os.path.getmtime(other_manifest_path) - 10
+    os.utime(other_manifest_path, (other_manifest_mtime, other_manifest_mtime))
+
+    rewriter = SourceRewriter()
+    rewriter.add(os.path.join(tmp_path, "**/AndroidManifest*.xml"), r'<uses-permission android:name="CAMERA"\s*/>\n',
+                 "", search_by_path=True)
+    rewriter.add(properties_path, r"(?<=APP_NAME=)Telegram", "First")
+    rewriter.add(properties_path, r"(?<=APP_NAME=)First", "Second")
+    rewriter.apply()
+
+    assert read_file(manifest_path) == "<application/>\n"
+    assert read_file(properties_path) == "APP_NAME=Second\n"
+    # Unchanged files are not rewritten.
+    assert os.path.getmtime(other_manifest_path) == other_manifest_mtime
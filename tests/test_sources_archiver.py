@@ -0,0 +1,87 @@
+import io
+import json
+import os
+import struct
+import zipfile
+
+from storage.sources_archiver import DELTA_MANIFEST_NAME, assemble_sources_zip, iter_sources_delta_zip, \
+    iter_sources_zip, make_file_stamps, read_delta_manifest, write_base_archive, _strip_zip64_extra
+
+
+def write_file(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(data)
+
+
+def test_sources_zip_excludes_private_files(tmp_path):
+    sources_dir = os.path.join(tmp_path, "Partisan-Telegram-Android")
+    write_file(os.path.join(sources_dir, "gradle.properties"), b"APP_VERSION_CODE=1\n" * 1000)
+    write_file(os.path.join(sources_dir, "TMessagesProj/src/main/res/mipmap-hdpi/ic_launcher.png"), b"png")
+    write_file(os.path.join(sources_dir, "TMessagesProj/config/release.keystore"), b"keystore")
+    write_file(os.path.join(sources_dir, ".git/HEAD"), b"ref: refs/heads/masking")
+
+    data = b"".join(iter_sources_zip(sources_dir))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        file_names = [name for name in archive.namelist() if not name.endswith("/")]
+        assert sorted(file_names) == ["TMessagesProj/src/main/res/mipmap-hdpi/ic_launcher.png", "gradle.properties"]
+        assert archive.read("gradle.properties") == b"APP_VERSION_CODE=1\n" * 1000
+        assert archive.getinfo("gradle.properties").compress_type == zipfile.ZIP_DEFLATED
+        png_info = archive.getinfo("TMessagesProj/src/main/res/mipmap-hdpi/ic_launcher.png")
+        assert png_info.compress_type == zipfile.ZIP_STORED
+
+
+def test_sources_zip_is_assembled_from_base_and_delta(tmp_path):
+    sources_dir = os.path.join(tmp_path, "Partisan-Telegram-Android")
+    base_archive_path = os.path.join(tmp_path, "sources_base", "commit.zip")
+    delta_archive_path = os.path.join(tmp_path, "sources_delta.zip")
+    sources_path = os.path.join(tmp_path, "sources.zip")
+    write_file(os.path.join(sources_dir, "gradle.properties"), b"APP_VERSION_CODE=1\n")
+    write_file(os.path.join(sources_dir, "TMessagesProj/src/Main.java"), b"class Main {}\n" * 1000)
+    write_file(os.path.join(sources_dir, "TMessagesProj/src/Removed.java"), b"class Removed {}\n")
+    write_base_archive(sources_dir, base_archive_path)
+    pristine_files = make_file_stamps(sources_dir)
+
+    write_file(os.path.join(sources_dir, "gradle.properties"), b"APP_VERSION_CODE=2\n")
+    write_file(os.path.join(sources_dir, "TMessagesProj/src/Added.java"), b"class Added {}\n")
+    os.remove(os.path.join(sources_dir, "TMessagesProj/src/Removed.java"))
+    write_file(delta_archive_path, b"".join(iter_sources_delta_zip(sources_dir, pristine_files, "commit")))
+
+    with zipfile.ZipFile(delta_archive_path) as delta_archive:
+        delta_file_names = [name for name in delta_archive.namelist() if not name.endswith("/")]
+        assert "TMessagesProj/src/Main.java" not in delta_file_names
+    assert read_delta_manifest(delta_archive_path) == {"repo_commit": "commit",
+                                                       "removed": ["TMessagesProj/src/Removed.java"]}
+
+    assemble_sources_zip(base_archive_path, delta_archive_path, sources_path)
+
+    with zipfile.ZipFile(sources_path) as archive:
+        assert archive.testzip() is None
+        file_names = [name for name in archive.namelist() if not name.endswith("/")]
+        assert sorted(file_names) == ["TMessagesProj/src/Added.java", "TMessagesProj/src/Main.java",
+                                      "gradle.properties"]
+        assert archive.read("gradle.properties") == b"APP_VERSION_CODE=2\n"
+        assert archive.read("TMessagesProj/src/Added.java") == b"class Added {}\n"
+        assert archive.read("TMessagesProj/src/Main.java") == b"class Main {}\n" * 1000
+
+
+def test_zip64_fields_are_not_copied(tmp_path):
+    base_archive_path = os.path.join(tmp_path, "base.zip")
+    delta_archive_path = os.path.join(tmp_path, "sources_delta.zip")
+    sources_path = os.path.join(tmp_path, "sources.zip")
+    with zipfile.ZipFile(base_archive_path, "w", zipfile.ZIP_DEFLATED) as base_archive:
+        with base_archive.open("Main.java", "w", force_zip64=True) as entry:
+            entry.write(b"class Main {}\n" * 1000)
+    with zipfile.ZipFile(delta_archive_path, "w") as delta_archive:
+        delta_archive.writestr(DELTA_MANIFEST_NAME, json.dumps({"repo_commit": "commit", "removed": []}))
+
+    assemble_sources_zip(base_archive_path, delta_archive_path, sources_path)
+
+    with zipfile.ZipFile(sources_path) as archive:
+        assert archive.testzip() is None
+        assert archive.read("Main.java") == b"class Main {}\n" * 1000
+    zip64_extra = struct.pack("<2H2Q", 1, 16, 14000, 64)
+    timestamp_extra = struct.pack("<2HBI", 0x5455, 5, 1, 0)
+    assert _strip_zip64_extra(zip64_extra + timestamp_extra) == timestamp_extra
@@ -0,0 +1,51 @@
+from models import Order
+from schemas.order_status import OrderStatus
+from schemas.speculative_build_status import SpeculativeBuildStatus
+from scheduling.speculative_builds import SpeculativeBuilds
+
+
+def make_order(speculative_build_status: SpeculativeBuildStatus) -> Order:
+    order = Order(id=1, status=OrderStatus.queued, app_name="App", app_id="org.some.app", app_icon=b"icon",
+                  app_notification_icon=b"icon", keystore=b"keystore", worker_id=2)
+    order.speculative_build_status = speculative_build_status
+    order.speculative_build_hash = order.make_build_hash()
+    return order
+
+
+def test_built_speculative_build_is_used_on_confirmation():
+    order = make_order(SpeculativeBuildStatus.built)
+    assert SpeculativeBuilds(None).on_order_confirmed(order)
+    assert order.status == OrderStatus.built
+    assert order.speculative_build_status is None
+
+
+def test_speculative_build_in_progress_continues_as_regular_build():
+    order = make_order(SpeculativeBuildStatus.building)
+    assert not SpeculativeBuilds(None).on_order_confirmed(order)
+    assert order.status == OrderStatus.build_started
+    assert order.worker_id == 2
+    assert order.speculative_build_status is None
+
+
+def test_speculative_build_of_changed_order_is_discarded():
+    order = make_order(SpeculativeBuildStatus.building)
+    order.app_name = "Other App"
+    assert not SpeculativeBuilds(None).on_order_confirmed(order)
+    assert order.status == OrderStatus.queued
+    assert order.worker_id is None
+    assert order.speculative_build_status is None
+
+    order = make_order(SpeculativeBuildStatus.built)
+    order.app_name = "Other App"
+    assert not SpeculativeBuilds(None).on_order_confirmed(order)
+    assert order.status == OrderStatus.queued
+    assert order.speculative_build_status is None
+
+
+def test_cancelled_speculative_build_is_not_inherited_by_confirmed_order():
+    order = make_order(SpeculativeBuildStatus.cancelled)
+    assert not SpeculativeBuilds(None).on_order_confirmed(order)
+    assert order.status == OrderStatus.queued
+    assert order.worker_id is None
+    assert order.speculative_build_status is None
+    assert order.speculative_build_hash is None
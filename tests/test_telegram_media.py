@@ -0,0 +1,11 @@
+from crud.telegram_media_crud import TelegramMediaCRUD
+
+
+def test_file_ids_are_stored_per_bot(session):
+    telegram_media = TelegramMediaCRUD(session)
+    telegram_media.set_file_id("hash", 1, "first")
+    telegram_media.set_file_id("hash", 1, "second")
+    assert telegram_media.get_file_id("hash", 1) == "second"
+    assert telegram_media.get_file_id("hash", 2) is None
+    telegram_media.remove_file_id("hash", 1)
+    assert telegram_media.get_file_id("hash", 1) is None
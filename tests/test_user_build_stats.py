@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from crud.user_build_stats_crud import UserBuildStatsCRUD
+
+
+def test_increase_user_build_stats(session):
+    user_build_stats_crud = UserBuildStatsCRUD(session)
+    user_id_hash = "hash"
+
+    user_build_stats_crud.increase_user_build_stats(user_id_hash, successful=True, build_date=datetime(2025, 1, 1))
+    stats = user_build_stats_crud.get_user_build_stats(user_id_hash)
+    assert stats.successful_build_count == 1
+    assert stats.failed_build_count == 0
+
+    user_build_stats_crud.increase_user_build_stats(user_id_hash, successful=False, build_date=datetime(2025, 1, 2))
+    user_build_stats_crud.increase_user_build_stats(user_id_hash, successful=True, build_date=datetime(2025, 1, 3))
+    stats = user_build_stats_crud.get_user_build_stats(user_id_hash)
+    assert stats.successful_build_count == 2
+    assert stats.failed_build_count == 1
+    assert stats.last_build_date == datetime(2025, 1, 3)
@@ -0,0 +1,22 @@
+import pytest
+
+from user_id_hasher import UserIdHasher
+
+
+def test_user_id_hasher_cache():
+    hasher = UserIdHasher("saltsaltsalt", cache_size=2, persistent_cache_key=None, thread_count=1)
+
+    first_hash = hasher.hash(1984)
+    assert hasher.hash("1984") == first_hash
+    assert hasher.hash(1985) != first_hash
+
+    hasher.hash(1986)
+    assert list(hasher.cache.keys()) == ["1985", "1986"]
+
+    assert hasher.hash(1984) == first_hash
+    assert list(hasher.cache.keys()) == ["1986", "1984"]
+
+
+def test_user_id_hasher_requires_salt():
+    with pytest.raises(ValueError):
+        UserIdHasher(None, cache_size=2, persistent_cache_key=None, thread_count=1)
@@ -0,0 +1,89 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+
+from crud.workers_crud import WorkersCRUD
+from models import Worker
+from web.workers_registry import WorkersRegistry
+
+
+def make_registry(engine, cache_ttl_sec: int = 60) -> WorkersRegistry:
+    registry = WorkersRegistry(engine, cache_ttl_sec, online_flush_interval_sec=60)
+    # The tests flush and invalidate the cache themselves.
+    registry.background_threads_started = True
+    return registry
+
+
+def rename_worker(engine, worker_id: int, name: str):
+    # Without a notification, like a change the registry doesn't know about.
+    with engine.begin() as connection:
+        connection.execute(sa.update(Worker).values({Worker.name: name}).where(Worker.id == worker_id))
+
+
+def test_cached_workers_are_reloaded_when_expired(engine):
+    worker_id = WorkersCRUD(engine).create_worker("first")
+    registry = make_registry(engine)
+    assert registry.get_worker(worker_id).name == "first"
+
+    rename_worker(engine, worker_id, "second")
+    assert registry.get_worker(worker_id).name == "first"
+
+    registry.cache_load_time -= registry.cache_ttl_sec
+    assert registry.get_worker(worker_id).name == "second"
+
+
+def test_unknown_worker_reloads_cache(engine):
+    registry = make_registry(engine)
+    assert registry.get_worker(1) is None
+
+    worker_id = WorkersCRUD(engine).create_worker("first")
+    registry.cache_load_time -= registry.MIN_RELOAD_INTERVAL_SEC
+    assert registry.get_worker(worker_id).name == "first"
+
+
+def test_workers_changed_notification_invalidates_cache(engine):
+    registry = make_registry(engine)
+    assert registry.get_worker(1) is None
+    threading.Thread(target=registry._listen_workers_changed, daemon=True).start()
+    time.sleep(1) # Wait until the listener is subscribed.
+
+    WorkersCRUD(engine).create_worker("first")
+    deadline = time.monotonic() + 10
+    while registry.cache_load_time is not None and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert registry.cache_load_time is None
+
+
+def test_online_dates_are_flushed(engine):
+    workers = WorkersCRUD(engine)
+    first_worker_id = workers.create_worker("first")
+    second_worker_id = workers.create_worker("second")
+    registry = make_registry(engine)
+    registry.mark_online(first_worker_id)
+    registry.mark_online(second_worker_id)
+    online_dates = dict(registry.online_dates)
+
+    registry.flush_online_dates()
+
+    assert registry.online_dates == {}
+    assert workers.get_worker(first_worker_id).last_online_date == online_dates[first_worker_id]
+    assert workers.get_worker(second_worker_id).last_online_date == online_dates[second_worker_id]
+
+
+def test_online_dates_are_kept_when_flush_fails():
+    registry = make_registry(None)
+    old_date = datetime(2025, 1, 1)
+    registry.online_dates = {1: old_date, 2: old_date}
+
+    def update_workers_online(online_dates: dict[int, datetime]):
+        # Keep-alive requests arrive during the flush.
+        registry.online_dates = {1: old_date + timedelta(minutes=1)}
+        raise RuntimeError("Database is unavailable")
+    registry.workers.update_workers_online = update_workers_online
+
+    with pytest.raises(RuntimeError):
+        registry.flush_online_dates()
+    assert registry.online_dates == {1: old_date + timedelta(minutes=1), 2: old_date}
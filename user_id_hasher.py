@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+import hmac
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Callable, Any
+
+from argon2 import PasswordHasher
+
+import config
+from crud.user_id_hashes_crud import UserIdHashesCRUD
+from db import engine
+
+
+class UserIdHasher:
+    """Computes argon2 hashes of user ids.
+
+    The hashes are kept in a bounded in-memory LRU cache. If USER_ID_HASH_CACHE_KEY is set, they are also stored
+    in the database keyed by HMAC of the user id, so the cache survives restarts without storing raw user ids.
+    """
+
+    def __init__(self, salt: Optional[str], cache_size: int, persistent_cache_key: Optional[str], thread_count: int):
+        # Without a salt argon2 generates a random one, and the bot and the controller would hash the same user id
+        # differently.
+        if not salt:
+            raise ValueError("USER_ID_HASH_SALT is not set")
+        self.password_hasher = PasswordHasher()
+        self.salt = salt.encode()
+        self.cache_size = cache_size
+        self.cache: OrderedDict[str, str] = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.persistent_cache_key = persistent_cache_key.encode() if persistent_cache_key else None
+        self.user_id_hashes_crud = UserIdHashesCRUD(engine) if self.persistent_cache_key else None
+        self.executor = ThreadPoolExecutor(max_workers=thread_count, thread_name_prefix="user_id_hasher")
+
+    def hash(self, user_id: Any) -> str:
+        user_id_str = str(user_id)
+        user_id_hash = self._get_cached_hash(user_id_str)
+        if user_id_hash is not None:
+            return user_id_hash
+
+        user_id_hmac = self._make_hmac(user_id_str)
+        if user_id_hmac is not None:
+            user_id_hash = self.user_id_hashes_crud.get_user_id_hash(user_id_hmac)
+        if user_id_hash is None:
+            user_id_hash = self.password_hasher.hash(user_id_str, salt=self.salt)
+            if user_id_hmac is not None:
+                self.user_id_hashes_crud.add_user_id_hash(user_id_hmac, user_id_hash)
+
+        self._cache_hash(user_id_str, user_id_hash)
+        return user_id_hash
+
+    async def hash_async(self, user_id: Any) -> str:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.hash, user_id)
+
+    def submit(self, fun: Callable, *args) -> Future:
+        """Runs a function that needs user id hashes in the hasher's thread pool."""
+        return self.executor.submit(fun, *args)
+
+    def _get_cached_hash(self, user_id_str: str) -> Optional[str]:
+        with self.cache_lock:
+            user_id_hash = self.cache.get(user_id_str)
+            if user_id_hash is not None:
+                self.cache.move_to_end(user_id_str)
+            return user_id_hash
+
+    def _cache_hash(self, user_id_str: str, user_id_hash: str):
+        if self.cache_size <= 0:
+            return
+        with self.cache_lock:
+            self.cache[user_id_str] = user_id_hash
+            self.cache.move_to_end(user_id_str)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _make_hmac(self, user_id_str: str) -> Optional[str]:
+        if self.persistent_cache_key is None:
+            return None
+        return hmac.new(self.persistent_cache_key, user_id_str.encode(), hashlib.sha256).hexdigest()
+
+
+user_id_hasher = UserIdHasher(
+    config.USER_ID_HASH_SALT,
+    config.USER_ID_HASH_CACHE_SIZE,
+    config.USER_ID_HASH_CACHE_KEY,
+    config.USER_ID_HASH_THREAD_COUNT,
+)
@@ -1,6 +1,8 @@
 import os
 import re
+from datetime import datetime
 
+import pytz
 from PIL.Image import Image
 from aiogram import types
 from unidecode import unidecode
@@ -18,12 +20,25 @@ def mask_user_id(user_id, left_digits_count=2):
     return "".join(symbols)
 
 
+def utc_now() -> datetime:
+    """Returns the current time as naive UTC, like the dates the database sets with CURRENT_TIMESTAMP."""
+    return datetime.now(pytz.utc).replace(tzinfo=None)
+
+
 def make_order_building_dir_path(order_id: int) -> str:
     return os.path.join(config.TMP_DIR, "orders", str(order_id))
 
 
+def make_build_results_dir_path() -> str:
+    return os.path.join(config.TMP_DIR, "build_result")
+
+
 def make_order_build_result_dir_path(order_id: int) -> str:
-    return os.path.join(config.TMP_DIR, "build_result", str(order_id))
+    return os.path.join(make_build_results_dir_path(), str(order_id))
+
+
+def make_sources_bases_dir_path() -> str:
+    return os.path.join(config.TMP_DIR, "sources_base")
 
 
 def normalize_name(app_name: str, delimiter: str = '') -> str:
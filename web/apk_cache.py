@@ -0,0 +1,80 @@
+import hashlib
+import os
+import shutil
+import time
+import uuid
+
+from models import Order
+
+
+class ApkCache:
+    """Content-addressed cache of built apks shared by the controller processes.
+
+    The key is the hash of the order fields that affect the apk and the repo commit it was built from. Every apk is
+    signed with the user's keystore, so entries expire after `ttl_sec`. When the cache is larger than `max_bytes`,
+    the least recently used entries are removed. The modification time of a file is its creation time and the access
+    time is updated on every hit.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, ttl_sec: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_sec = ttl_sec
+
+    def is_enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(order: Order, repo_commit: str) -> str:
+        return hashlib.sha256(f"{order.make_build_hash()}:{repo_commit}".encode()).hexdigest()
+
+    def put(self, key: str, apk_path: str):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = os.path.join(self.cache_dir, f"{uuid.uuid4().hex}.part")
+        shutil.copyfile(apk_path, temp_path)
+        os.replace(temp_path, self._make_path(key))
+        self.evict()
+
+    def copy_to(self, key: str, destination_path: str) -> bool:
+        """Copies the cached apk to the destination. Returns False if there is no actual entry for the key."""
+        path = self._make_path(key)
+        try:
+            stat = os.stat(path)
+            if time.time() - stat.st_mtime >= self.ttl_sec:
+                return False
+            os.utime(path, (time.time(), stat.st_mtime))
+            os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+            try:
+                os.link(path, destination_path)
+            except OSError:
+                shutil.copyfile(path, destination_path)
+            return True
+        except FileNotFoundError:
+            # Removed by another process.
+            return False
+
+    def evict(self):
+        entries: list[tuple[float, int, str]] = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+                if now - stat.st_mtime >= self.ttl_sec:
+                    os.remove(path)
+                else:
+                    entries.append((stat.st_atime, stat.st_size, path))
+            except FileNotFoundError:
+                pass
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+    def _make_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.apk")
@@ -0,0 +1,10 @@
+import config as app_config # 'config' is a name of a gunicorn setting
+
+# Threaded workers, so a slow upload occupies one thread instead of a whole process
+# and keep-alive requests from other build workers are not queued behind it.
+bind = "0.0.0.0:8000"
+worker_class = "gthread"
+workers = app_config.WORKERS_CONTROLLER_PROCESSES
+threads = app_config.WORKERS_CONTROLLER_THREADS
+timeout = 600 # Uploads of big files may take a while.
+graceful_timeout = 170 # Less than stop_grace_period in docker-compose.yaml.
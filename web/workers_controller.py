@@ -1,14 +1,17 @@
 import logging
 import os
 import sys
+import threading
+import time
 import traceback
+import zipfile
 from datetime import datetime
 from functools import wraps
-from typing import Callable
+from typing import Callable, Optional, Union
 
 import pytz
-from argon2 import PasswordHasher
 from flask import Flask
+from flask import Response
 from flask import jsonify
 from flask import request
 from flask_jwt_extended import JWTManager
@@ -17,13 +20,24 @@ from flask_jwt_extended import jwt_required
 
 import config
 import utils
+from crud.build_phase_events_crud import BuildPhaseEventsCRUD
+from crud.build_timings_crud import BuildTimingsCRUD
 from crud.error_logs_crud import ErrorLogsCRUD
 from crud.user_build_stats_crud import UserBuildStatsCRUD
 from db import engine
-from models import Worker, UserBuildStats
+from models import Order, Worker
 from crud.orders_crud import OrdersCRUD
+from schemas.build_phase import BuildPhase
 from schemas.order_status import OrderStatus, get_next_status
+from schemas.speculative_build_status import SpeculativeBuildStatus
+from scheduling.dispatch_policy import make_dispatch_policy
+from scheduling.order_scheduler import OrderScheduler
+from scheduling.speculative_builds import SpeculativeBuilds
 from crud.workers_crud import WorkersCRUD
+from storage.sources_bases import SourcesBases
+from user_id_hasher import user_id_hasher
+from web.apk_cache import ApkCache
+from web.workers_registry import WorkersRegistry
 
 app = Flask(__name__)
 
@@ -31,10 +45,20 @@ app.config["JWT_SECRET_KEY"] = config.JWT_SECRET_KEY
 jwt = JWTManager(app)
 orders = OrdersCRUD(engine)
 workers = WorkersCRUD(engine)
+speculative_builds = SpeculativeBuilds(orders)
+scheduler = OrderScheduler(orders, make_dispatch_policy(config.DISPATCH_POLICY, config.DISPATCH_AGING_INTERVAL_SEC))
+workers_registry = WorkersRegistry(engine, config.WORKERS_CACHE_TTL_SEC, config.WORKER_ONLINE_FLUSH_INTERVAL_SEC)
 error_logs = ErrorLogsCRUD(engine)
 user_build_stats_crud = UserBuildStatsCRUD(engine)
+build_timings = BuildTimingsCRUD(engine)
+build_phase_events = BuildPhaseEventsCRUD(engine)
+apk_cache = ApkCache(os.path.join(config.TMP_DIR, "apk_cache"), config.APK_CACHE_MAX_BYTES, config.APK_CACHE_TTL_SEC)
+sources_bases = SourcesBases(utils.make_sources_bases_dir_path())
 
-password_hasher = PasswordHasher()
+# Uploads are limited separately, so slow uploads can't occupy all threads and block keep-alive requests. Uploads
+# over the limit are rejected right away instead of waiting in a thread, the workers retry them.
+upload_semaphore = threading.BoundedSemaphore(config.UPLOAD_CONCURRENCY_LIMIT)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 
 def check_worker_id(fun: Callable):
@@ -45,7 +69,7 @@ def check_worker_id(fun: Callable):
             worker_id_int = int(worker_id)
         except (TypeError, ValueError):
             worker_id_int = None
-        worker = workers.get_worker(worker_id_int) if worker_id_int is not None else None
+        worker = workers_registry.get_worker(worker_id_int) if worker_id_int is not None else None
         if not worker or (worker.ip and worker.ip != request.remote_addr):
             return jsonify(msg="Signature verification failed"), 422
         return fun(worker)
@@ -67,12 +91,66 @@ def log_exceptions(fun: Callable):
     return wrapper
 
 
+def limit_upload_concurrency(fun: Callable):
+    @wraps(fun)
+    def wrapper(worker: Worker):
+        if not upload_semaphore.acquire(blocking=False):
+            return jsonify({"error": "Too many uploads"}), 503
+        try:
+            return fun(worker)
+        finally:
+            upload_semaphore.release()
+
+    return wrapper
+
+
+def save_request_file(filepath: str) -> bool:
+    """Saves the uploaded file. Raw request bodies are streamed to the disk without buffering the whole file."""
+    if request.mimetype == "application/octet-stream":
+        temp_filepath = filepath + ".part"
+        try:
+            with open(temp_filepath, "wb") as f:
+                while chunk := request.stream.read(UPLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+            os.replace(temp_filepath, filepath)
+        finally:
+            # The worker disconnected during the upload.
+            if os.path.exists(temp_filepath):
+                os.remove(temp_filepath)
+        return True
+    elif 'file' in request.files:
+        request.files['file'].save(filepath)
+        return True
+    else:
+        return False
+
+
 @app.route("/keep-alive", methods=["GET"])
 @jwt_required()
 @log_exceptions
 @check_worker_id
 def keep_alive(worker: Worker):
-    workers.update_worker_online(worker.id)
+    workers_registry.mark_online(worker.id)
+    # Workers send the ids of the orders they are building to learn which builds must be stopped.
+    order_ids = request.args.getlist("order-id", type=int)
+    if not order_ids:
+        return "", 204
+    return jsonify({"cancelled_order_ids": get_cancelled_order_ids(worker, order_ids)}), 200
+
+
+@app.route("/order-phase", methods=["POST"])
+@jwt_required()
+@log_exceptions
+@check_worker_id
+def order_phase(worker: Worker):
+    order_id = request.args.get("order-id", None, type=int)
+    phase = request.args.get("phase", None)
+    if order_id is None or phase not in list(BuildPhase):
+        return jsonify({"error": "Order id and a valid phase required"}), 400
+    ownership = orders.get_order_ownerships([order_id]).get(order_id)
+    if ownership is None or (not ownership.sources_only and ownership.worker_id != worker.id):
+        return jsonify({"error": f"Order {order_id} is not built by the worker"}), 400
+    build_phase_events.add_event(order_id, phase, utils.utc_now())
     return "", 204
 
 
@@ -84,13 +162,18 @@ def receive_order(worker: Worker):
     previous_order = orders.get_worker_order(worker.id)
     if previous_order is not None:
         return jsonify({"error": "Build has already started"}), 400
-    new_order = orders.get_order_for_build()
+    # The commit the worker would build from, cached apks built from it are used without a new build.
+    repo_commit = request.args.get("repo-commit", None)
+    new_order = claim_order_for_build(worker, repo_commit)
+    if new_order is None and config.SPECULATIVE_BUILDS:
+        speculative_order = speculative_builds.claim_order(worker.id)
+        if speculative_order is not None:
+            workers_registry.mark_online(worker.id)
+            return jsonify(speculative_order.make_dict_for_worker()), 200
     if new_order is None:
         return jsonify(new_order), 200
-    new_order.status = get_next_status(new_order)
-    new_order.worker_id = worker.id
-    orders.update_order(new_order)
-    workers.update_worker_online(worker.id)
+    workers_registry.mark_online(worker.id)
+    build_timings.add_claimed_build(new_order.id, worker.id, new_order.record_created, utils.utc_now())
     return jsonify(new_order.make_dict_for_worker()), 200
 
 
@@ -109,25 +192,39 @@ def get_current_order(worker: Worker):
 @jwt_required()
 @log_exceptions
 @check_worker_id
+@limit_upload_concurrency
 def order_completed(worker: Worker):
     previous_order = orders.get_worker_order(worker.id)
     if previous_order is None:
         return jsonify({"error": "Build did not start"}), 400
-    if 'file' not in request.files:
-        return jsonify({"error": "No file sent"}), 400
     apk_dir = utils.make_order_build_result_dir_path(previous_order.id)
     os.makedirs(apk_dir, exist_ok=True)
     filepath = os.path.join(
         apk_dir,
         "app.apk",
     )
-    file = request.files['file']
-    file.save(filepath)
+    upload_start_time = time.monotonic()
+    if not save_request_file(filepath):
+        return jsonify({"error": "No file sent"}), 400
+    upload_duration_sec = time.monotonic() - upload_start_time
+    repo_commit = request.args.get("repo-commit", None)
+    if previous_order.speculative_build_status is not None:
+        if speculative_builds.on_build_completed(previous_order, worker.id, True):
+            # Discarded and cancelled builds are not cached.
+            if previous_order.speculative_build_status == SpeculativeBuildStatus.built:
+                put_to_apk_cache(previous_order, repo_commit, filepath)
+            return "", 204
+        # The user has confirmed the order meanwhile, so the build is a regular one now.
+        previous_order = orders.get_worker_order(worker.id)
+        if previous_order is None:
+            return jsonify({"error": "Build did not start"}), 400
+    put_to_apk_cache(previous_order, repo_commit, filepath)
     previous_order.build_attempts += 1
     previous_order.status = get_next_status(previous_order, "success")
     previous_order.worker_id = None
-    orders.update_order(previous_order)
-    increase_user_build_stats(previous_order.user_id, successful=True)
+    orders.update_order_build_state(previous_order)
+    record_build_completed(previous_order.id, True, upload_duration_sec)
+    increase_user_build_stats(previous_order.user_id, True)
     return "", 204
 
 
@@ -139,14 +236,22 @@ def order_failed(worker: Worker):
     previous_order = orders.get_worker_order(worker.id)
     if previous_order is None:
         return jsonify({"error": "Build did not start"}), 400
+    if previous_order.speculative_build_status is not None:
+        if speculative_builds.on_build_completed(previous_order, worker.id, False):
+            return "", 204
+        # The user has confirmed the order meanwhile, so the build is a regular one now.
+        previous_order = orders.get_worker_order(worker.id)
+        if previous_order is None:
+            return jsonify({"error": "Build did not start"}), 400
     previous_order.build_attempts += 1
     previous_order.status = get_next_status(previous_order, "fail")
     previous_order.worker_id = None
-    orders.update_order(previous_order)
+    orders.update_order_build_state(previous_order)
+    record_build_completed(previous_order.id, False)
     if request.json is not None and "error_text" in request.json:
         logging.error("error_text received from a build worker")
         error_logs.add_log(request.json["error_text"])
-    increase_user_build_stats(previous_order.user_id, successful=False)
+    increase_user_build_stats(previous_order.user_id, False)
     return "", 204
 
 
@@ -155,18 +260,95 @@ def order_failed(worker: Worker):
 @log_exceptions
 @check_worker_id
 def receive_sources_only_order(worker: Worker):
-    new_order = orders.get_sources_only_order()
+    new_order = scheduler.get_sources_only_order()
     if new_order is None:
         return jsonify(new_order), 200
-    workers.update_worker_online(worker.id)
+    workers_registry.mark_online(worker.id)
     return jsonify(new_order.make_dict_for_worker()), 200
 
 
+@app.route("/sources-only-order-result", methods=["POST"])
+@jwt_required()
+@log_exceptions
+@check_worker_id
+@limit_upload_concurrency
+def sources_only_order_result(worker: Worker):
+    order = get_sources_only_order_in_progress()
+    if not isinstance(order, Order):
+        return order
+    # With a commit, the worker sends only the files that differ from the sources base of the commit.
+    repo_commit = request.args.get("repo-commit", None)
+    if repo_commit is not None and not (SourcesBases.is_valid_commit(repo_commit) and sources_bases.has(repo_commit)):
+        return jsonify({"error": f"There is no sources base for commit {repo_commit}"}), 409
+    apk_dir = utils.make_order_build_result_dir_path(order.id)
+    os.makedirs(apk_dir, exist_ok=True)
+    filepath = os.path.join(
+        apk_dir,
+        SourcesBases.SOURCES_FILENAME if repo_commit is None else SourcesBases.DELTA_FILENAME,
+    )
+    if not save_request_file(filepath):
+        return jsonify({"error": "No file sent"}), 400
+    if repo_commit is not None:
+        # The base may be evicted before the result is sent, so the archive for the user is assembled right away.
+        try:
+            sources_bases.assemble(apk_dir, repo_commit)
+        except FileNotFoundError:
+            os.remove(filepath)
+            return jsonify({"error": f"There is no sources base for commit {repo_commit}"}), 409
+        except (ValueError, KeyError, zipfile.BadZipFile) as e:
+            os.remove(filepath)
+            return jsonify({"error": f"Invalid sources delta: {e}"}), 400
+    return "", 204
+
+
 @app.route("/sources-only-order-completed", methods=["POST"])
 @jwt_required()
 @log_exceptions
 @check_worker_id
 def sources_only_order_completed(worker: Worker):
+    # The archive is uploaded by /sources-only-order-result before, so the worker doesn't wait for the upload here.
+    order = get_sources_only_order_in_progress()
+    if not isinstance(order, Order):
+        return order
+    sources_path = os.path.join(utils.make_order_build_result_dir_path(order.id), SourcesBases.SOURCES_FILENAME)
+    if not os.path.isfile(sources_path):
+        return jsonify({"error": "No sources sent"}), 400
+    orders.update_order_status(order, get_next_status(order))
+    return "", 204
+
+
+@app.route("/sources-base", methods=["GET"])
+@jwt_required()
+@log_exceptions
+@check_worker_id
+def has_sources_base(worker: Worker):
+    repo_commit = request.args.get("repo-commit", "")
+    if not SourcesBases.is_valid_commit(repo_commit):
+        return jsonify({"error": "Invalid repo commit"}), 400
+    return ("", 204) if sources_bases.has(repo_commit) else ("", 404)
+
+
+@app.route("/sources-base", methods=["POST"])
+@jwt_required()
+@log_exceptions
+@check_worker_id
+@limit_upload_concurrency
+def put_sources_base(worker: Worker):
+    repo_commit = request.args.get("repo-commit", "")
+    if not SourcesBases.is_valid_commit(repo_commit):
+        return jsonify({"error": "Invalid repo commit"}), 400
+    temp_path = sources_bases.make_temp_path()
+    try:
+        if not save_request_file(temp_path):
+            return jsonify({"error": "No file sent"}), 400
+        sources_bases.put(repo_commit, temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return "", 204
+
+
+def get_sources_only_order_in_progress() -> Union[Order, tuple[Response, int]]:
     order_id = request.args.get("order-id", None, type=int)
     if order_id is None:
         return jsonify({"error": "Order id required"}), 400
@@ -175,35 +357,96 @@ def sources_only_order_completed(worker: Worker):
         return jsonify({"error": f"There is no order with id {order_id}"}), 400
     if order.status != OrderStatus.get_sources_queued or not order.sources_only:
         return jsonify({"error": f"Order {order_id} is not sources only"}), 400
-    if 'file' not in request.files:
-        return jsonify({"error": "No file sent"}), 400
-    apk_dir = utils.make_order_build_result_dir_path(order.id)
-    os.makedirs(apk_dir, exist_ok=True)
-    filepath = os.path.join(
-        apk_dir,
-        "sources.zip",
-    )
-    file = request.files['file']
-    file.save(filepath)
+    return order
+
+
+def get_cancelled_order_ids(worker: Worker, order_ids: list[int]) -> list[int]:
+    ownerships = orders.get_order_ownerships(order_ids)
+    cancelled_order_ids = []
+    for order_id in order_ids:
+        ownership = ownerships.get(order_id)
+        if ownership is None:
+            is_cancelled = True # The order was removed.
+        elif ownership.sources_only:
+            is_cancelled = ownership.status != OrderStatus.get_sources_queued
+        elif ownership.worker_id != worker.id:
+            is_cancelled = True # The order was reset or given to another worker.
+        elif ownership.speculative_build_status == SpeculativeBuildStatus.cancelled:
+            is_cancelled = True
+            speculative_builds.on_build_cancelled(order_id, worker.id)
+        else:
+            is_cancelled = False
+        if is_cancelled:
+            cancelled_order_ids.append(order_id)
+    return cancelled_order_ids
+
+
+def put_to_apk_cache(order: Order, repo_commit: Optional[str], apk_path: str):
+    if not apk_cache.is_enabled() or repo_commit is None:
+        return
+    try:
+        apk_cache.put(ApkCache.make_key(order, repo_commit), apk_path)
+    except FileNotFoundError:
+        pass # The confirmed speculative build was sent and removed by the bot meanwhile.
+
+
+def claim_order_for_build(worker: Worker, repo_commit: Optional[str]) -> Optional[Order]:
+    # Workers are served concurrently, so an order claimed by another worker meanwhile is skipped.
+    while (order := scheduler.get_order_for_build()) is not None:
+        if serve_from_apk_cache(order, worker, repo_commit):
+            continue
+        order.status = get_next_status(order)
+        order.worker_id = worker.id
+        if orders.claim_queued_order(order):
+            return order
+    return None
+
+
+def serve_from_apk_cache(order: Order, worker: Worker, repo_commit: Optional[str]) -> bool:
+    """Returns True if the order was claimed by another worker or served from the apk cache."""
+    if not apk_cache.is_enabled() or repo_commit is None:
+        return False
+    apk_path = os.path.join(utils.make_order_build_result_dir_path(order.id), "app.apk")
+    # The apk is moved into place only after the order is claimed, so a build of another worker isn't overwritten.
+    temp_apk_path = f"{apk_path}.{worker.id}.part"
+    if not apk_cache.copy_to(ApkCache.make_key(order, repo_commit), temp_apk_path):
+        return False
     order.status = get_next_status(order)
-    orders.update_order(order)
-    return "", 204
+    order.worker_id = worker.id
+    if not orders.claim_queued_order(order):
+        os.remove(temp_apk_path)
+        return True
+    os.replace(temp_apk_path, apk_path)
+    logging.info(f"Order #{order.id} is served from the apk cache")
+    order.build_attempts += 1
+    order.status = get_next_status(order, "success")
+    order.worker_id = None
+    orders.update_order_build_state(order)
+    # The served order is recorded as an instant build of the worker that asked for an order.
+    now = utils.utc_now()
+    build_timings.add_claimed_build(order.id, worker.id, order.record_created, now)
+    build_timings.set_build_completed(order.id, True, now)
+    increase_user_build_stats(order.user_id, True)
+    return True
 
 
-def increase_user_build_stats(user_id: int, successful: bool):
-    user_id_hash = password_hasher.hash(str(user_id), salt=config.USER_ID_HASH_SALT.encode())
-    old_stats = user_build_stats_crud.get_user_build_stats(user_id_hash)
-    new_stats = old_stats if old_stats else UserBuildStats.create(user_id_hash)
-    new_stats.last_build_date = datetime.now().astimezone(pytz.utc)
-    if successful:
-        new_stats.successful_build_count += 1
-    else:
-        new_stats.failed_build_count += 1
+def record_build_completed(order_id: int, successful: bool, upload_duration_sec: Optional[float] = None):
+    build_timings.set_build_completed(
+        order_id,
+        successful,
+        utils.utc_now(),
+        configure_duration_sec=request.args.get("configure-sec", None, type=float),
+        build_duration_sec=request.args.get("build-sec", None, type=float),
+        upload_duration_sec=upload_duration_sec,
+    )
 
-    if old_stats is None:
-        user_build_stats_crud.add_user_build_stats(new_stats)
-    else:
-        user_build_stats_crud.update_user_build_stats(new_stats)
+
+def increase_user_build_stats(user_id: int, successful: bool):
+    # argon2 runs in the user id hasher thread pool, which bounds the memory it takes. The response waits for the
+    # stats, so they aren't lost.
+    user_id_hash = user_id_hasher.submit(user_id_hasher.hash, user_id).result()
+    build_date = datetime.now().astimezone(pytz.utc)
+    user_build_stats_crud.increase_user_build_stats(user_id_hash, successful, build_date)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+import logging
+import select
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.engine import Engine
+
+from crud.workers_crud import WorkersCRUD, WORKERS_CHANGED_CHANNEL
+from models import Worker
+
+
+class WorkersRegistry:
+    """In-process cache of workers for authorizing controller requests.
+
+    The cache is reloaded when it is older than `cache_ttl_sec` or when the bot notifies that workers were added or
+    removed. Keep-alive dates are collected in memory and flushed to the database in one UPDATE for all workers.
+    """
+
+    # Don't reload the cache more often than this on requests from unknown workers.
+    MIN_RELOAD_INTERVAL_SEC = 1
+
+    def __init__(self, engine: Engine, cache_ttl_sec: int, online_flush_interval_sec: int):
+        self.engine = engine
+        self.workers = WorkersCRUD(engine)
+        self.cache_ttl_sec = cache_ttl_sec
+        self.online_flush_interval_sec = online_flush_interval_sec
+
+        self.cache: dict[int, Worker] = {}
+        self.cache_load_time: Optional[float] = None
+        self.cache_lock = threading.Lock()
+
+        self.online_dates: dict[int, datetime] = {}
+        self.online_dates_lock = threading.Lock()
+
+        self.background_threads_started = False
+        self.background_threads_lock = threading.Lock()
+
+    def get_worker(self, worker_id: int) -> Optional[Worker]:
+        self._start_background_threads()
+        with self.cache_lock:
+            if self._cache_age() is None or self._cache_age() >= self.cache_ttl_sec:
+                self._reload_cache()
+            worker = self.cache.get(worker_id)
+            if worker is None and self._cache_age() >= self.MIN_RELOAD_INTERVAL_SEC:
+                # The worker may have been added after the last reload.
+                self._reload_cache()
+                worker = self.cache.get(worker_id)
+            return worker
+
+    def invalidate(self):
+        with self.cache_lock:
+            self.cache_load_time = None
+
+    def mark_online(self, worker_id: int):
+        with self.online_dates_lock:
+            self.online_dates[worker_id] = datetime.now()
+
+    def flush_online_dates(self):
+        with self.online_dates_lock:
+            online_dates = self.online_dates
+            self.online_dates = {}
+        try:
+            self.workers.update_workers_online(online_dates)
+        except Exception:
+            # The dates are flushed on the next attempt, otherwise live workers could be considered offline.
+            with self.online_dates_lock:
+                for worker_id, online_date in online_dates.items():
+                    self.online_dates[worker_id] = max(online_date, self.online_dates.get(worker_id, online_date))
+            raise
+
+    def _cache_age(self) -> Optional[float]:
+        if self.cache_load_time is None:
+            return None
+        return time.monotonic() - self.cache_load_time
+
+    def _reload_cache(self):
+        self.cache = {worker.id: worker for worker in self.workers.get_all_workers()}
+        self.cache_load_time = time.monotonic()
+
+    def _start_background_threads(self):
+        # The threads are started lazily, so they are created in the gunicorn worker process, not in the master.
+        with self.background_threads_lock:
+            if self.background_threads_started:
+                return
+            self.background_threads_started = True
+        threading.Thread(target=self._run_online_dates_flusher, daemon=True).start()
+        threading.Thread(target=self._run_workers_changed_listener, daemon=True).start()
+
+    def _run_online_dates_flusher(self):
+        while True:
+            time.sleep(self.online_flush_interval_sec)
+            try:
+                self.flush_online_dates()
+            except Exception:
+                logging.error(f"During flushing worker online dates the following exception occurred:\n"
+                              f"{traceback.format_exc()}")
+
+    def _run_workers_changed_listener(self):
+        while True:
+            try:
+                self._listen_workers_changed()
+            except Exception:
+                logging.error(f"During listening for worker changes the following exception occurred:\n"
+                              f"{traceback.format_exc()}")
+            self.invalidate() # Notifications may have been missed while reconnecting.
+            time.sleep(self.cache_ttl_sec)
+
+    def _listen_workers_changed(self):
+        connection = self.engine.raw_connection()
+        connection.detach() # The connection is closed afterward instead of returning to the pool in autocommit mode.
+        try:
+            connection.set_isolation_level(0) # autocommit, otherwise notifications are not delivered
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {WORKERS_CHANGED_CHANNEL}")
+            while True:
+                if select.select([connection], [], [], self.cache_ttl_sec) == ([], [], []):
+                    continue
+                connection.poll()
+                if connection.notifies:
+                    connection.notifies.clear()
+                    self.invalidate()
+        finally:
+            connection.close()
@@ -1,26 +1,60 @@
 import logging
 import os
 import shutil
+import signal
 import subprocess
 import threading
+import time
 import traceback
+from contextlib import contextmanager
 from os.path import abspath
 from typing import Optional
 
 import config
 import utils
 from models import Order
+from schemas.build_phase import BuildPhase
+from worker.build_log import BuildLog, LOG_TAIL_LINES, remove_old_build_logs
 from worker.configure_build import BuildConfigurator
+from worker.repo_mirror import RepoMirror
+from storage.sources_archiver import FileStamp, make_file_stamps, write_base_archive
 from worker.worker_controller_api import WorkerControllerApi
 
 
 application_builder_critical_lock = threading.Lock()
 
+# Build scripts print this prefix followed by a BuildPhase value when they start a phase.
+PHASE_MARKER = "##build-phase "
+# Time for the build script to stop after SIGTERM before it is killed.
+SCRIPT_TERMINATE_TIMEOUT_SEC = 10
+
+
+class BuildCancelledError(Exception):
+    pass
+
+
+class ScriptFailedError(Exception):
+    def __init__(self, script: str, returncode: int, log_tail: str, log_path: str):
+        super().__init__(f"{script} exited with code {returncode}")
+        self.log_tail = log_tail
+        self.log_path = log_path
+
 
 class ApplicationBuilder:
-    def __init__(self, controller_api: WorkerControllerApi, order: Order):
+    def __init__(self, controller_api: WorkerControllerApi, repo_mirror: RepoMirror, order: Order):
         self.controller_api = controller_api
+        self.repo_mirror = repo_mirror
         self.order = order
+        self.repo_commit: Optional[str] = None
+        self.sources_base_archive_path: Optional[str] = None
+        self.pristine_files: Optional[dict[str, FileStamp]] = None
+        self.sources_sent = False
+        # Phase durations reported to the controller for the queue ETA and stats.
+        self.phase_durations: dict[str, float] = {}
+        self.cancelled = threading.Event()
+        self.process: Optional[subprocess.Popen] = None
+        self.process_lock = threading.Lock()
+        self.log: Optional[BuildLog] = None
 
     def build(self):
         try:
@@ -29,12 +63,18 @@ class ApplicationBuilder:
             else:
                 logging.info(f"Starting build for SOURCES #{self.order.id}")
             self.recreate_order_dir()
-            self.configure_build()
+            remove_old_build_logs()
+            self.log = BuildLog(self.order.id)
+            with self.measure_phase("configure"):
+                self.configure_build()
+            self.check_not_cancelled()
 
-            if not self.order.sources_only:
-                self.run_build_script()
-            else:
-                self.make_sources_archive()
+            with self.measure_phase("build"):
+                if not self.order.sources_only:
+                    self.run_build_script()
+                else:
+                    self.send_sources()
+            self.check_not_cancelled()
 
             if self.is_successful_build():
                 self.handle_successful_build()
@@ -42,8 +82,54 @@ class ApplicationBuilder:
                 self.handle_failed_build()
             self.remove_order_dir()
         except Exception as e:
-            self.handle_failed_build(e)
+            if self.cancelled.is_set():
+                # The controller doesn't expect the result of a cancelled order.
+                logging.info(f"Build for order #{self.order.id} cancelled")
+            else:
+                self.handle_failed_build(e)
             self.remove_order_dir()
+        finally:
+            if self.log is not None:
+                self.log.close()
+
+    def cancel(self):
+        """Stops the build. Called from the main thread when the controller cancels the order."""
+        logging.info(f"Cancelling build for order #{self.order.id}")
+        self.cancelled.set()
+        with self.process_lock:
+            process = self.process
+            if process is not None and process.poll() is None:
+                # The script runs in its own session, so its children are stopped too.
+                os.killpg(process.pid, signal.SIGTERM)
+        if process is not None:
+            try:
+                process.wait(timeout=SCRIPT_TERMINATE_TIMEOUT_SEC)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+        if not self.order.sources_only and not config.MOCK_BUILD:
+            self.remove_docker_container()
+
+    def report_phase(self, phase: str):
+        logging.info(f"Order #{self.order.id} phase: {phase}")
+        self.controller_api.send_order_phase(self.order, phase)
+
+    def check_not_cancelled(self):
+        if self.cancelled.is_set():
+            raise BuildCancelledError()
+
+    def remove_docker_container(self):
+        # The container is not a child of the build script, so it keeps running after the script is killed.
+        image_name = self.build_docker_image_name()
+        subprocess.run(["docker", "rm", "-f", image_name], capture_output=True)
+        subprocess.run(["docker", "rmi", "-f", image_name], capture_output=True)
+
+    @contextmanager
+    def measure_phase(self, phase: str):
+        start_time = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phase_durations[phase] = time.monotonic() - start_time
 
     def recreate_order_dir(self):
         order_dir = self.make_order_dir_path()
@@ -57,19 +143,38 @@ class ApplicationBuilder:
     def configure_build(self):
         if config.MOCK_BUILD and not self.order.sources_only:
             return
+        self.report_phase(BuildPhase.repo_sync)
+        self.repo_commit = self.repo_mirror.get_commit(self.cancelled)
+        self.check_not_cancelled()
         args = [
             abspath(self.make_order_dir_path()),
+            self.repo_commit,
         ]
-        with application_builder_critical_lock: # Wait until the repo is updated before terminating the worker.
-            try:
-                self.run_script("copy_repo.sh", args, cwd=abspath(config.DATA_DIR))
-            except subprocess.CalledProcessError:
-                repo_path = os.path.join(config.DATA_DIR, "Partisan-Telegram-Android")
-                shutil.rmtree(repo_path, ignore_errors=True)
-                raise
+        self.run_script("copy_repo.sh", args, cwd=abspath(config.DATA_DIR))
+        if self.order.sources_only:
+            self.prepare_sources_base_archive()
+        self.report_phase(BuildPhase.configure)
         BuildConfigurator.configure_build(self.order)
 
+    def prepare_sources_base_archive(self):
+        # The controller gets the archive of the unmodified sources once per commit and then only the changed files.
+        sources_dir = os.path.join(self.make_order_dir_path(), "Partisan-Telegram-Android")
+        self.sources_base_archive_path = os.path.join(config.SOURCES_BASE_DIR, f"{self.repo_commit}.zip")
+        if not os.path.isfile(self.sources_base_archive_path):
+            logging.info(f"Writing the base sources archive for {self.repo_commit}")
+            write_base_archive(sources_dir, self.sources_base_archive_path)
+        self.pristine_files = make_file_stamps(sources_dir)
+
+    def send_sources(self):
+        # The archive is compressed while it is streamed to the controller, outside the critical section. Only the
+        # completion is sent under the lock.
+        self.report_phase(BuildPhase.upload)
+        self.sources_sent = self.controller_api.send_sources_only_order_result(self.order, self.repo_commit,
+                                                                               self.sources_base_archive_path,
+                                                                               self.pristine_files)
+
     def run_build_script(self):
+        self.report_phase(BuildPhase.docker_build)
         if config.MOCK_BUILD:
             args = [
                 str(self.need_mock_error())
@@ -90,17 +195,37 @@ class ApplicationBuilder:
         return f"{config.BUILD_DOCKER_IMAGE_NAME}-{self.order.id}"
 
     def run_script(self, script: str, args: list[str], cwd: str):
-        subprocess.run(
-            [
-                "/bin/sh",
-                abspath(os.path.join("scripts", script)),
-                *args
-            ],
-            check=True,
-            capture_output=True,
-            cwd=cwd,
-            encoding="utf-8",
-        )
+        command = [
+            "/bin/sh",
+            abspath(os.path.join("scripts", script)),
+            *args
+        ]
+        with self.process_lock:
+            self.check_not_cancelled()
+            self.log.write_line(f"$ {' '.join(command)}\n")
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                cwd=cwd,
+                encoding="utf-8",
+                errors="replace",
+                start_new_session=True,
+            )
+            self.process = process
+        try:
+            # The output is streamed to the log line by line instead of being buffered until the script exits.
+            for line in process.stdout:
+                self.log.write_line(line)
+                if line.startswith(PHASE_MARKER):
+                    self.report_phase(line[len(PHASE_MARKER):].strip())
+            returncode = process.wait()
+        finally:
+            with self.process_lock:
+                self.process = None
+        self.check_not_cancelled()
+        if returncode != 0:
+            raise ScriptFailedError(script, returncode, self.log.get_tail(), self.log.path)
 
     def need_mock_error(self) -> bool:
         if config.MOCK_BUILD:
@@ -108,22 +233,19 @@ class ApplicationBuilder:
         else:
             return False
 
-    def make_sources_archive(self):
-        order_dir = self.make_order_dir_path()
-        sources_dir = os.path.join(order_dir, "Partisan-Telegram-Android")
-
-        shutil.rmtree(os.path.join(sources_dir, ".git"), ignore_errors=False)
-        os.remove(os.path.join(sources_dir, "TMessagesProj/config/release.keystore"))
-
-        shutil.make_archive(os.path.join(order_dir, "sources"), 'zip', sources_dir)
-
     def is_successful_build(self):
         return os.path.isfile(os.path.join(self.make_order_dir_path(), "done")) or self.order.sources_only
 
     def handle_successful_build(self):
+        if not self.order.sources_only:
+            self.report_phase(BuildPhase.upload)
+        elif not self.sources_sent:
+            # The order stays queued and is sent again.
+            logging.error(f"Sources for order #{self.order.id} were not accepted by the controller")
+            return
         with application_builder_critical_lock: # Wait until the order_completed is sent before terminating the worker.
             if not self.order.sources_only:
-                self.controller_api.send_order_completed(self.order)
+                self.controller_api.send_order_completed(self.order, self.phase_durations, self.repo_commit)
             else:
                 self.controller_api.send_sources_only_order_completed(self.order)
         logging.info(f"Build for order #{self.order.id} successful")
@@ -137,12 +259,15 @@ class ApplicationBuilder:
         with application_builder_critical_lock: # Wait until the order_failed is sent before terminating the worker.
             if exception is None:
                 exception_text = None
-            elif isinstance(exception, subprocess.CalledProcessError):
-                exception_text = f"{type(exception)}\n\nstderr: {exception.stderr}\n\nstdout: {exception.stdout}"
+            elif isinstance(exception, ScriptFailedError):
+                exception_text = (f"{type(exception)} {str(exception)}\n\n"
+                                  f"Last {LOG_TAIL_LINES} lines of the log:\n{exception.log_tail}\n\n"
+                                  f"Full log on the worker: {exception.log_path} "
+                                  f"(python -m worker.build_log {self.order.id})")
             else:
                 exception_text = f"{type(exception)} {str(exception)}\n\n{traceback.format_exc()}"
             logging.error(f"exception_text {exception_text}")
-            self.controller_api.send_order_failed(exception_text)
+            self.controller_api.send_order_failed(exception_text, self.phase_durations)
         logging.error(f"Build for order #{self.order.id} failed")
 
     def remove_order_dir(self):
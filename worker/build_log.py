@@ -0,0 +1,85 @@
+import collections
+import os
+import sys
+from typing import Iterator
+
+import config
+
+# A single log file is rotated after this size, so a runaway build can't fill the disk.
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 2
+# Number of last lines sent to the controller when a build fails.
+LOG_TAIL_LINES = 100
+# Logs of older orders are removed when a new build starts.
+MAX_KEPT_LOGS = 50
+
+
+def make_build_log_path(order_id: int) -> str:
+    return os.path.join(config.BUILD_LOGS_DIR, f"order-{order_id}.log")
+
+
+class BuildLog:
+    """Output of the scripts run for an order.
+
+    The full output is written to a rotating log file on disk, only the last lines are kept in memory.
+    """
+
+    def __init__(self, order_id: int):
+        self.path = make_build_log_path(order_id)
+        self.tail: collections.deque[str] = collections.deque(maxlen=LOG_TAIL_LINES)
+        os.makedirs(config.BUILD_LOGS_DIR, exist_ok=True)
+        for path in self._get_file_paths(self.path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def write_line(self, line: str):
+        if self.file.tell() + len(line) > LOG_FILE_MAX_BYTES:
+            self._rotate()
+        self.file.write(line)
+        self.file.flush()
+        self.tail.append(line)
+
+    def get_tail(self) -> str:
+        return "".join(self.tail)
+
+    def close(self):
+        self.file.close()
+
+    def _rotate(self):
+        self.file.close()
+        paths = self._get_file_paths(self.path)
+        for newer_path, older_path in reversed(list(zip(paths, paths[1:]))):
+            if os.path.exists(newer_path):
+                os.replace(newer_path, older_path)
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    @staticmethod
+    def _get_file_paths(path: str) -> list[str]:
+        """Returns the current log file and the backups from the newest to the oldest."""
+        return [path] + [f"{path}.{i}" for i in range(1, LOG_BACKUP_COUNT + 1)]
+
+
+def read_build_log(order_id: int) -> Iterator[str]:
+    """Yields the lines of the full log from the oldest backup to the current file."""
+    for path in reversed(BuildLog._get_file_paths(make_build_log_path(order_id))):
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                yield from file
+
+
+def remove_old_build_logs():
+    if not os.path.isdir(config.BUILD_LOGS_DIR):
+        return
+    paths = [os.path.join(config.BUILD_LOGS_DIR, name) for name in os.listdir(config.BUILD_LOGS_DIR)
+             if name.endswith(".log")]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[MAX_KEPT_LOGS:]:
+        for file_path in BuildLog._get_file_paths(path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+
+if __name__ == "__main__":
+    # Prints the full build log of an order: python -m worker.build_log <order_id>
+    sys.stdout.writelines(read_build_log(int(sys.argv[1])))
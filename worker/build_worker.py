@@ -10,13 +10,17 @@ from typing import Optional
 import config
 from models import Order
 from worker.application_builder import ApplicationBuilder, application_builder_critical_lock
+from worker.repo_mirror import RepoMirror
 from worker.worker_controller_api import WorkerControllerApi
 
 global_current_order: Optional[Order] = None
 global_current_sources_only_order: Optional[Order] = None
 global_current_order_lock = threading.Lock()
+# Builders of the current orders by order id, used to stop the builds cancelled by the controller.
+global_current_builders: dict[int, ApplicationBuilder] = {}
 
 controller_api = WorkerControllerApi(config.WORKER_CONTROLLER_HOST)
+repo_mirror = RepoMirror(config.REPO_FETCH_INTERVAL_SEC)
 graceful_shutdown = False
 
 
@@ -38,11 +42,14 @@ def process_current_order():
         if global_current_order is None:
             return
         current_order = global_current_order
+        builder = ApplicationBuilder(controller_api, repo_mirror, current_order)
+        global_current_builders[current_order.id] = builder
 
-    ApplicationBuilder(controller_api, current_order).build()
+    builder.build()
 
     with global_current_order_lock:
         global_current_order = None
+        del global_current_builders[current_order.id]
 
 
 def process_current_sources_only_order():
@@ -51,11 +58,21 @@ def process_current_sources_only_order():
         if global_current_sources_only_order is None:
             return
         current_order = global_current_sources_only_order
+        builder = ApplicationBuilder(controller_api, repo_mirror, current_order)
+        global_current_builders[current_order.id] = builder
 
-    ApplicationBuilder(controller_api, current_order).build()
+    builder.build()
 
     with global_current_order_lock:
         global_current_sources_only_order = None
+        del global_current_builders[current_order.id]
+
+
+def cancel_orders(order_ids: list[int]):
+    with global_current_order_lock:
+        builders = [global_current_builders[order_id] for order_id in order_ids if order_id in global_current_builders]
+    for builder in builders:
+        threading.Thread(target=builder.cancel).start()
 
 
 def main():
@@ -67,13 +84,16 @@ def main():
     logging.info("Build daemon started")
     try:
         os.makedirs(config.TMP_DIR, exist_ok=True)
+        repo_mirror.start()
         while True:
-            controller_api.send_keep_alive()
+            with global_current_order_lock:
+                current_order_ids = list(global_current_builders.keys())
+            cancel_orders(controller_api.send_keep_alive(current_order_ids))
             with global_current_order_lock:
                 if global_current_order is None:
                     if graceful_shutdown: # Shutdown the worker only when current order is None
                         sys.exit(0)
-                    global_current_order = controller_api.receive_order()
+                    global_current_order = controller_api.receive_order(repo_mirror.commit)
                     thread = threading.Thread(target=process_current_order)
                     thread.start()
                 if config.ALLOW_BUILD_SOURCES_ONLY and global_current_sources_only_order is None:
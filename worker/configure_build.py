@@ -1,5 +1,3 @@
-import glob
-import io
 import json
 import logging
 import os
@@ -7,19 +5,20 @@ import re
 import xml.sax.saxutils
 from pathlib import Path
 
-from PIL import Image
-from PIL.Image import Resampling
-
 import config
 from models import Order
 from schemas.android_app_permission import AndroidAppPermission
 import utils
 from worker.app_signature_signer import extract_and_sign_app_signature
+from worker.icon_renderer import DPI_SIZES, IconSetCache
+from worker.source_rewriter import SourceRewriter
 
 
 class BuildConfigurator:
     def __init__(self, order: Order):
         self.order = order
+        # Text source changes are applied together at the end of update_project.
+        self.source_rewriter = SourceRewriter()
 
     @staticmethod
     def configure_build(order: Order) -> None:
@@ -32,6 +31,7 @@ class BuildConfigurator:
         if not self.order.sources_only:
             self.replace_keystore()
             self.update_keystore_related_text_sources()
+        self.source_rewriter.apply()
         self.save_update_request_template()
 
     def update_text_sources(self) -> None:
@@ -189,12 +189,15 @@ class BuildConfigurator:
                                  for permission in permissions
                                  if visible_name not in selected_permissions]
 
-        for permission_to_remove in permissions_to_remove:
-            self.update_text_source_file(
-                relative_path="**/AndroidManifest*.xml", search_by_path=True,
-                src=f'<uses-permission android:name="{permission_to_remove}"\\s*/>',
-                dst="",
-            )
+        if not permissions_to_remove:
+            return
+        # All permissions are removed by one regex, so every manifest is scanned once.
+        names = "|".join(re.escape(permission) for permission in permissions_to_remove)
+        self.update_text_source_file(
+            relative_path="**/AndroidManifest*.xml", search_by_path=True,
+            src=f'<uses-permission android:name="(?:{names})"\\s*/>',
+            dst="",
+        )
 
     def update_text_source_file(self,
                                 relative_path: str,
@@ -202,14 +205,7 @@ class BuildConfigurator:
                                 dst: str,
                                 search_by_path: bool = False
                                 ) -> None:
-        absolute_path = self.build_absolute_path(relative_path)
-        paths = glob.glob(absolute_path, recursive=True) if search_by_path else [absolute_path]
-        for path in paths:
-            with open(path, "rt") as file:
-                content = file.read()
-            content = re.sub(src, dst, content)
-            with open(path, "wt") as file:
-                file.write(content)
+        self.source_rewriter.add(self.build_absolute_path(relative_path), src, dst, search_by_path)
 
     def build_absolute_path(self, ending: str) -> str:
         return os.path.join(self.make_order_dir_path(), "Partisan-Telegram-Android", ending)
@@ -228,14 +224,6 @@ class BuildConfigurator:
             raise Exception("Invalid screen name")
 
     def replace_icons(self) -> None:
-        dpi_variants = dict(
-            xxxhdpi=(192, 192),
-            xxhdpi=(144, 144),
-            xhdpi=(96, 96),
-            hdpi=(72, 72),
-            mdpi=(48, 48)
-        )
-
         file_names = [
             'TMessagesProj/src/main/res/drawable-<dpi>/ic_launcher_dr.png',
             'TMessagesProj/src/main/res/mipmap-<dpi>/ic_launcher.png',
@@ -245,22 +233,26 @@ class BuildConfigurator:
             'TMessagesProj/src/main/res/drawable-<dpi>/notification.png',
         ]
 
-        with (Image.open(io.BytesIO(self.order.app_icon)) as icon,
-              Image.open(io.BytesIO(self.order.app_notification_icon)) as notification_icon):
-            for dpi_name, size in dpi_variants.items():
-                logging.info(f"Replacing icon {dpi_name}")
-                icon_copy = icon.resize(size, Resampling.LANCZOS)
-                notification_icon_copy = notification_icon.resize(size, Resampling.LANCZOS)
-                for file_name_template in file_names + notification_file_names:
-                    file_name = file_name_template.replace('<dpi>', dpi_name)
-                    out_path = self.build_absolute_path(file_name)
-                    if os.path.isfile(out_path) or Path(out_path).with_suffix('.webp').is_file():
-                        with open(out_path, 'wb') as f:
-                            if file_name_template in file_names:
-                                icon_copy.save(f)
-                            elif file_name_template in notification_file_names:
-                                notification_icon_copy.save(f)
-                        Path(out_path).with_suffix('.webp').unlink(missing_ok=True)
+        icon_set_cache = IconSetCache(config.ICON_CACHE_DIR, config.ICON_CACHE_TTL_SEC)
+        icon_set = icon_set_cache.get_icon_set(self.order.app_icon)
+        notification_icon_set = icon_set_cache.get_icon_set(self.order.app_notification_icon)
+        # Every res dir is listed once instead of checking both the .png and the .webp path of every icon.
+        dir_listings: dict[Path, set[str]] = {}
+        for dpi_name in DPI_SIZES:
+            logging.info(f"Replacing icon {dpi_name}")
+            for file_name_template in file_names + notification_file_names:
+                out_path = Path(self.build_absolute_path(file_name_template.replace('<dpi>', dpi_name)))
+                if out_path.parent not in dir_listings:
+                    dir_listings[out_path.parent] = set(os.listdir(out_path.parent)) if out_path.parent.is_dir() else set()
+                existing_files = dir_listings[out_path.parent]
+                webp_path = out_path.with_suffix('.webp')
+                if out_path.name in existing_files or webp_path.name in existing_files:
+                    with open(out_path, 'wb') as f:
+                        if file_name_template in file_names:
+                            f.write(icon_set[dpi_name])
+                        elif file_name_template in notification_file_names:
+                            f.write(notification_icon_set[dpi_name])
+                    webp_path.unlink(missing_ok=True)
         logging.info("Done replacing icons")
 
     def replace_keystore(self):
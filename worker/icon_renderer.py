@@ -0,0 +1,113 @@
+import hashlib
+import io
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from PIL.Image import Resampling
+
+# Launcher icon sizes of the Android densities.
+DPI_SIZES = dict(
+    xxxhdpi=192,
+    xxhdpi=144,
+    xhdpi=96,
+    hdpi=72,
+    mdpi=48,
+)
+# Rendered icon sets of less recently used icons are removed when a new one is rendered.
+MAX_CACHED_ICON_SETS = 200
+
+
+def render_icon_set(icon: bytes) -> dict[str, bytes]:
+    """Returns the icon encoded as PNG for every density.
+
+    Every size is resized from the source icon, so the filter is applied once, and the sizes are encoded in parallel.
+    """
+    with Image.open(io.BytesIO(icon)) as image:
+        image.load()
+        resized_icons = {dpi_name: image.resize((size, size), Resampling.LANCZOS)
+                         for dpi_name, size in DPI_SIZES.items()}
+    with ThreadPoolExecutor(max_workers=len(resized_icons)) as executor:
+        encoded_icons = executor.map(encode_png, resized_icons.values())
+        return dict(zip(resized_icons.keys(), encoded_icons))
+
+
+def encode_png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class IconSetCache:
+    """Rendered icon sets on disk by the hash of the source icon, so rebuilds with the same icon skip rendering.
+
+    The icons are user data, so a set is kept for `ttl_sec` after it was rendered. The modification time of a set
+    is its creation time and the access time is updated on every hit, like in the apk cache.
+    """
+
+    def __init__(self, cache_dir: str, ttl_sec: int):
+        self.cache_dir = cache_dir
+        self.ttl_sec = ttl_sec
+
+    def get_icon_set(self, icon: bytes) -> dict[str, bytes]:
+        icon_set_dir = os.path.join(self.cache_dir, hashlib.sha256(icon).hexdigest())
+        icon_set = self._read_icon_set(icon_set_dir)
+        if icon_set is not None:
+            try:
+                os.utime(icon_set_dir, (time.time(), os.path.getmtime(icon_set_dir)))
+                return icon_set
+            except FileNotFoundError:
+                pass # Removed by a concurrent build.
+        icon_set = render_icon_set(icon)
+        self._write_icon_set(icon_set_dir, icon_set)
+        self._evict()
+        return icon_set
+
+    def _read_icon_set(self, icon_set_dir: str):
+        try:
+            if time.time() - os.path.getmtime(icon_set_dir) >= self.ttl_sec:
+                return None
+            icon_set = {}
+            for dpi_name in DPI_SIZES:
+                with open(os.path.join(icon_set_dir, f"{dpi_name}.png"), "rb") as file:
+                    icon_set[dpi_name] = file.read()
+            return icon_set
+        except FileNotFoundError:
+            return None
+
+    def _write_icon_set(self, icon_set_dir: str, icon_set: dict[str, bytes]):
+        # The set is written to a temporary dir first, so a concurrent build never reads a partial set.
+        temp_dir = os.path.join(self.cache_dir, f"{uuid.uuid4().hex}.part")
+        os.makedirs(temp_dir)
+        for dpi_name, data in icon_set.items():
+            with open(os.path.join(temp_dir, f"{dpi_name}.png"), "wb") as file:
+                file.write(data)
+        # An expired set is replaced.
+        shutil.rmtree(icon_set_dir, ignore_errors=True)
+        try:
+            os.rename(temp_dir, icon_set_dir)
+        except OSError:
+            # Rendered by a concurrent build.
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _evict(self):
+        icon_set_dirs = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".part"):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue # Removed by a concurrent build.
+            if now - stat.st_mtime >= self.ttl_sec:
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                icon_set_dirs.append((stat.st_atime, path))
+        icon_set_dirs.sort(reverse=True)
+        for _, path in icon_set_dirs[MAX_CACHED_ICON_SETS:]:
+            shutil.rmtree(path, ignore_errors=True)
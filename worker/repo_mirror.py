@@ -0,0 +1,104 @@
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from os.path import abspath
+from typing import Optional
+
+import config
+
+REPO_DIR_NAME = "Partisan-Telegram-Android"
+FETCHED_REF = "origin/masking"
+FETCH_TIMEOUT_SEC = 30 * 60
+# A build waits for the first clone at most as long as the clone may take.
+COMMIT_WAIT_TIMEOUT_SEC = FETCH_TIMEOUT_SEC
+COMMIT_WAIT_STEP_SEC = 1
+
+
+class RepoMirror:
+    """Local clone of the upstream repo that is fetched in the background.
+
+    Builds are pinned to the last successfully fetched commit, so they don't wait for the network
+    (except for the first clone) and a failed fetch doesn't affect them.
+    """
+
+    def __init__(self, fetch_interval_sec: int):
+        self.fetch_interval_sec = fetch_interval_sec
+        self.commit: Optional[str] = None
+        self.commit_available = threading.Event()
+
+    def start(self):
+        commit = self.read_fetched_commit()
+        if commit is not None:
+            self.set_commit(commit)
+        threading.Thread(target=self.fetch_loop, daemon=True).start()
+
+    def get_commit(self, cancelled: threading.Event) -> Optional[str]:
+        """Returns the commit for a new build, or None if the build is cancelled meanwhile.
+
+        Waits only if the repo was never fetched. Raises TimeoutError if it isn't fetched in COMMIT_WAIT_TIMEOUT_SEC.
+        """
+        deadline = time.monotonic() + COMMIT_WAIT_TIMEOUT_SEC
+        while not cancelled.is_set():
+            commit = self.commit
+            if commit is not None:
+                return commit
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"The repo wasn't fetched in {COMMIT_WAIT_TIMEOUT_SEC} sec")
+            self.commit_available.wait(COMMIT_WAIT_STEP_SEC)
+        return None
+
+    def fetch_loop(self):
+        while True:
+            self.fetch()
+            time.sleep(self.fetch_interval_sec)
+
+    def fetch(self):
+        try:
+            subprocess.run(
+                ["/bin/sh", abspath(os.path.join("scripts", "fetch_repo.sh"))],
+                check=True,
+                capture_output=True,
+                cwd=abspath(config.DATA_DIR),
+                encoding="utf-8",
+                timeout=FETCH_TIMEOUT_SEC,
+            )
+        except subprocess.CalledProcessError as e:
+            logging.error(f"Failed to fetch the repo, builds use {self.commit}:\n{e.stderr}")
+            self.remove_if_broken()
+            return
+        except subprocess.TimeoutExpired:
+            logging.error(f"Fetching the repo timed out, builds use {self.commit}")
+            return
+        commit = self.read_fetched_commit()
+        if commit is None:
+            logging.error("The fetched repo has no commit to build")
+            self.remove_if_broken()
+        elif commit != self.commit:
+            logging.info(f"Builds use the repo commit {commit}")
+            self.set_commit(commit)
+
+    def set_commit(self, commit: str):
+        self.commit = commit
+        self.commit_available.set()
+
+    def read_fetched_commit(self) -> Optional[str]:
+        result = subprocess.run(
+            ["git", "-C", self.make_repo_path(), "rev-parse", "--verify", f"{FETCHED_REF}^{{commit}}"],
+            capture_output=True,
+            encoding="utf-8",
+        )
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    def remove_if_broken(self):
+        # The repo is cloned again on the next fetch only if it can't be used at all.
+        if self.read_fetched_commit() is None:
+            self.commit_available.clear()
+            self.commit = None
+            shutil.rmtree(self.make_repo_path(), ignore_errors=True)
+
+    @staticmethod
+    def make_repo_path() -> str:
+        return os.path.join(config.DATA_DIR, REPO_DIR_NAME)
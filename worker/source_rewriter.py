@@ -0,0 +1,39 @@
+import glob
+import os
+import re
+
+
+class SourceRewriter:
+    """Collects regex substitutions for the source files and applies them in one pass.
+
+    Every path pattern is resolved once, every file is read once and written only if it changed. The substitutions
+    of a file are applied in the order they were added.
+    """
+
+    def __init__(self):
+        self.substitutions: list[tuple[str, bool, re.Pattern, str]] = []
+
+    def add(self, path: str, src: str, dst: str, search_by_path: bool = False):
+        self.substitutions.append((path, search_by_path, re.compile(src), dst))
+
+    def apply(self):
+        resolved_paths: dict[tuple[str, bool], list[str]] = {}
+        file_substitutions: dict[str, list[tuple[re.Pattern, str]]] = {}
+        for path, search_by_path, pattern, dst in self.substitutions:
+            key = (path, search_by_path)
+            if key not in resolved_paths:
+                paths = glob.glob(path, recursive=True) if search_by_path else [path]
+                resolved_paths[key] = [os.path.normpath(p) for p in paths]
+            for file_path in resolved_paths[key]:
+                file_substitutions.setdefault(file_path, []).append((pattern, dst))
+
+        for file_path, substitutions in file_substitutions.items():
+            with open(file_path, "rt") as file:
+                content = file.read()
+            new_content = content
+            for pattern, dst in substitutions:
+                new_content = pattern.sub(dst, new_content)
+            if new_content != content:
+                with open(file_path, "wt") as file:
+                    file.write(new_content)
+        self.substitutions.clear()
@@ -1,8 +1,9 @@
 import logging
 import os
 import sys
+import time
 import traceback
-from typing import Optional
+from typing import Any, Callable, Optional
 
 import requests
 from requests import Response
@@ -11,9 +12,15 @@ from requests.adapters import HTTPAdapter, Retry
 import config
 from models import Order
 import utils
+from storage.sources_archiver import FileStamp, iter_sources_delta_zip, iter_sources_zip
 
 
 class WorkerControllerApi:
+    # Files are sent as raw request bodies, so the controller can stream them to the disk.
+    FILE_HEADERS = {"Content-Type": "application/octet-stream"}
+    UPLOAD_MAX_ATTEMPTS = 100
+    UPLOAD_MAX_RETRY_DELAY_SEC = 60
+
     def __init__(self, host: str):
         self.http_session = requests.Session()
         self.http_session.headers.update({"Authorization": "Bearer " + config.WORKER_JWT})
@@ -37,18 +44,44 @@ class WorkerControllerApi:
         else:
             logging.error(f"{prefix} {response.status_code}, {response.text}")
 
-    def send_keep_alive(self):
+    def post_upload(self, url: str, make_data: Callable[[], Any], params: Optional[dict[str, str]] = None) -> Response:
+        """Posts the data made by `make_data`, waiting while all upload slots of the controller are busy.
+
+        The controller answers 503 then, and the adapter doesn't retry POST requests.
+        """
+        for attempt in range(self.UPLOAD_MAX_ATTEMPTS):
+            response = self.http_session.post(url, data=make_data(), headers=self.FILE_HEADERS, params=params)
+            if response.status_code != 503:
+                break
+            delay_sec = min(2 ** attempt, self.UPLOAD_MAX_RETRY_DELAY_SEC)
+            logging.warning(f"Upload slots of the controller are busy, retrying in {delay_sec} sec")
+            time.sleep(delay_sec)
+        return response
+
+    def post_file(self, url: str, filepath: str, params: Optional[dict[str, str]] = None) -> Response:
+        with open(filepath, "rb") as file:
+            def rewind():
+                file.seek(0)
+                return file
+            return self.post_upload(url, rewind, params)
+
+    def send_keep_alive(self, order_ids: list[int]) -> list[int]:
+        """Returns the ids of the orders whose builds must be stopped."""
         try:
-            response = self.http_session.get(self.make_url("/keep-alive"))
-            if response.status_code != 204:
+            response = self.http_session.get(self.make_url("/keep-alive"), params={"order-id": order_ids})
+            if response.status_code == 200:
+                return response.json()["cancelled_order_ids"]
+            elif response.status_code != 204:
                 self.log_response("Keep alive:", response)
         except Exception as e:
             logging.error(f"During send_keep_alive the following exception occurred: {e}")
             traceback.print_exc()
+        return []
 
-    def receive_order(self) -> Optional[Order]:
+    def receive_order(self, repo_commit: Optional[str] = None) -> Optional[Order]:
         try:
-            response = self.http_session.get(self.make_url("/receive-order"))
+            params = {"repo-commit": repo_commit} if repo_commit is not None else None
+            response = self.http_session.get(self.make_url("/receive-order"), params=params)
             if response.status_code != 200:
                 self.log_response(f"Receive order:", response)
             if response.status_code == 400:
@@ -73,7 +106,23 @@ class WorkerControllerApi:
             traceback.print_exc()
             return None
 
-    def send_order_completed(self, order: Order):
+    def send_order_phase(self, order: Order, phase: str):
+        # Phases are informational, so a failed request doesn't stop the build.
+        try:
+            response = self.http_session.post(self.make_url("/order-phase"),
+                                              params={"order-id": order.id, "phase": phase})
+            if response.status_code != 204:
+                self.log_response("Order phase:", response)
+        except Exception as e:
+            logging.error(f"During send_order_phase the following exception occurred: {e}")
+            traceback.print_exc()
+
+    @staticmethod
+    def make_phase_duration_params(phase_durations: Optional[dict[str, float]]) -> dict[str, str]:
+        return {f"{phase}-sec": f"{duration:.1f}" for phase, duration in (phase_durations or {}).items()}
+
+    def send_order_completed(self, order: Order, phase_durations: Optional[dict[str, float]] = None,
+                             repo_commit: Optional[str] = None):
         filepath = os.path.join(
             utils.make_order_building_dir_path(order.id),
             "Partisan-Telegram-Android",
@@ -85,21 +134,57 @@ class WorkerControllerApi:
             "standalone",
             "app.apk",
         )
-        with open(filepath, "rb") as file:
-            response = self.http_session.post(self.make_url("/order-completed"), files={"file": file})
-            self.log_response(f"Order completed:", response)
+        params = self.make_phase_duration_params(phase_durations)
+        if repo_commit is not None:
+            params["repo-commit"] = repo_commit
+        response = self.post_file(self.make_url("/order-completed"), filepath, params)
+        self.log_response(f"Order completed:", response)
 
-    def send_order_failed(self, error_text = None):
+    def send_order_failed(self, error_text = None, phase_durations: Optional[dict[str, float]] = None):
         json = {"error_text": error_text} if error_text else None
-        response = self.http_session.post(self.make_url("/order-failed"), json=json)
+        response = self.http_session.post(self.make_url("/order-failed"), json=json,
+                                          params=self.make_phase_duration_params(phase_durations))
         self.log_response(f"Order failed:", response)
 
-    def send_sources_only_order_completed(self, order: Order):
-        filepath = os.path.join(
+    def send_sources_only_order_result(self, order: Order, repo_commit: Optional[str] = None,
+                                       base_archive_path: Optional[str] = None,
+                                       pristine_files: Optional[dict[str, FileStamp]] = None) -> bool:
+        """Streams the sources archive of the order, or the delta against the base of `repo_commit`.
+
+        The archive is compressed while it is sent with chunked transfer encoding, so it's never written to the disk.
+        Returns True if the controller has accepted it.
+        """
+        sources_dir = os.path.join(
             utils.make_order_building_dir_path(order.id),
-            "sources.zip",
+            "Partisan-Telegram-Android",
         )
-        with open(filepath, "rb") as file:
-            url = self.make_url(f"/sources-only-order-completed?order-id={order.id}")
-            response = self.http_session.post(url, files={"file": file})
-            self.log_response(f"Sources only order completed:", response)
+        url = self.make_url(f"/sources-only-order-result?order-id={order.id}")
+        if base_archive_path is None:
+            response = self.post_upload(url, lambda: iter_sources_zip(sources_dir))
+        else:
+            if not self.has_sources_base(repo_commit):
+                self.send_sources_base(repo_commit, base_archive_path)
+            for _ in range(2):
+                response = self.post_upload(url,
+                                            lambda: iter_sources_delta_zip(sources_dir, pristine_files, repo_commit),
+                                            {"repo-commit": repo_commit})
+                if response.status_code != 409:
+                    break
+                # The base was removed by the controller after the check.
+                self.send_sources_base(repo_commit, base_archive_path)
+        self.log_response(f"Sources only order result:", response)
+        return response.status_code == 204
+
+    def send_sources_only_order_completed(self, order: Order):
+        response = self.http_session.post(self.make_url("/sources-only-order-completed"), params={"order-id": order.id})
+        self.log_response(f"Sources only order completed:", response)
+
+    def has_sources_base(self, repo_commit: str) -> bool:
+        response = self.http_session.get(self.make_url("/sources-base"), params={"repo-commit": repo_commit})
+        if response.status_code not in (204, 404):
+            self.log_response("Has sources base:", response)
+        return response.status_code == 204
+
+    def send_sources_base(self, repo_commit: str, base_archive_path: str):
+        response = self.post_file(self.make_url("/sources-base"), base_archive_path, {"repo-commit": repo_commit})
+        self.log_response(f"Sources base:", response)